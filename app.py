@@ -4,8 +4,11 @@ import sys
 from PyQt5.QtWidgets import QApplication
 from gui import MarkdownManagerApp
 from config import ConfigManager
+from preview import register_preview_scheme
 
 if __name__ == "__main__":
+    # Custom URL schemes have to be known before the application starts
+    register_preview_scheme()
     app = QApplication(sys.argv)
 
     # Initialize config manager
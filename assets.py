@@ -23,6 +23,12 @@ SVG_ICON_CLEAR = """
 </svg>
 """
 
+SVG_ICON_STOP = """
+<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24" fill="#ff6b6b">
+  <path d="M7 7h10v10H7z"/>
+</svg>
+"""
+
 ICON_BUTTON_STYLE = """
     QPushButton {
         border: 1px solid transparent;
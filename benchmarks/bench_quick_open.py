@@ -0,0 +1,91 @@
+# benchmarks/bench_quick_open.py
+"""
+Benchmark Quick Open's path index on a large tree.
+
+Generates a reproducible tree of empty notes (100,000 by default, in about
+2,000 nested folders with dated and multi-word names), times
+PathIndex.build(), then times each query on its own and every keystroke
+while it is typed, as the palette runs them. Reports result counts and the
+slowest search per query.
+
+    python benchmarks/bench_quick_open.py
+    python benchmarks/bench_quick_open.py --files 20000 --corpus /tmp/paths
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from quick_open import PathIndex
+
+WORDS = ("render preview markdown note block cache image table code diagram latency stream index "
+         "search folder export print style theme editor runbook deploy rollback incident owner service "
+         "alert metric meeting project design review journal weekly daily plan roadmap api client server "
+         "database migration security auth billing payments infra oncall postmortem").split()
+QUERIES = ("rollback,rbk,dpl inc,incident-owner,theme/editor,runbookdeploy,metric-alert,2023-05,"
+           "postmortem db,pmdb,weekly plan,infra/oncall,oncall/post,secauth,roadmap 2024,xyzzy")
+
+def make_tree(root, file_count, seed=0):
+    """Create file_count empty notes in nested folders named after WORDS."""
+    rng = random.Random(seed)
+    folders = [""]
+    while len(folders) < max(2, file_count // 50):
+        parent = rng.choice(folders[:len(folders) // 2 + 1])
+        name = '-'.join(rng.sample(WORDS, rng.randint(1, 2)))
+        folder = os.path.join(parent, name) if parent else name
+        if folder not in folders:
+            folders.append(folder)
+    created = set()
+    while len(created) < file_count:
+        name = '-'.join(rng.sample(WORDS, rng.randint(1, 3)))
+        if rng.random() < 0.3:
+            name = f"{rng.randint(2019, 2025)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}-{name}"
+        path = os.path.join(root, rng.choice(folders[1:]), name + ".md")
+        if path not in created:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            open(path, 'w').close()
+            created.add(path)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--files', type=int, default=100_000, help="notes in the generated tree")
+    parser.add_argument('--corpus', help="reuse (or create) the tree in this folder")
+    parser.add_argument('--queries', default=QUERIES, help="comma separated queries")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_root:
+        root = args.corpus or os.path.join(temp_root, "docs")
+        if not os.path.isdir(root) or not os.listdir(root):
+            print(f"Generating {args.files} notes in {root} ...")
+            make_tree(root, args.files)
+        index = PathIndex(root)
+        start = time.perf_counter()
+        index.build()
+        print(f"Build: {time.perf_counter() - start:.2f} s\n")
+
+        print(f"{'query':<16} {'results':>7} {'alone ms':>9} {'typed p50 ms':>13} {'typed max ms':>13}")
+        slowest = 0
+        for query in [q for q in args.queries.split(',') if q]:
+            index.build()
+            start = time.perf_counter()
+            index.search(query)
+            alone = time.perf_counter() - start
+            index.build()
+            keystrokes = []
+            for length in range(1, len(query) + 1):
+                start = time.perf_counter()
+                results = index.search(query[:length])
+                keystrokes.append(time.perf_counter() - start)
+            slowest = max(slowest, alone, *keystrokes)
+            print(f"{query:<16} {len(results):>7} {alone * 1000:>9.2f} "
+                  f"{statistics.median(keystrokes) * 1000:>13.2f} {max(keystrokes) * 1000:>13.2f}")
+        print(f"\nSlowest search: {slowest * 1000:.2f} ms")
+
+if __name__ == '__main__':
+    main()
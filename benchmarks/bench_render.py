@@ -0,0 +1,305 @@
+# benchmarks/bench_render.py
+"""
+Render benchmark suite for the preview and print pipelines.
+
+Generates reproducible markdown corpora (prose, wide tables, fenced code,
+inline SVG, images and a mix of all of them) at sizes from 1 KB up to
+20 MB, and reports p50/p95/p99 latency, peak memory (tracemalloc) and the
+cost of each Markdown extension. Results are written as JSON so runs can
+be diffed between commits. Only the renderer is imported, so it runs
+headless without a display.
+
+    python benchmarks/bench_render.py                       # 1K..1M
+    python benchmarks/bench_render.py --full                # up to 20M
+    python benchmarks/bench_render.py --kinds code,svg --sizes 10K,100K
+    python benchmarks/bench_render.py --output bench.json
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import zlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import markdown
+import render
+from highlight_cache import CODEHILITE, FENCED_CODE, highlight_cache
+from resource_extension import image_resolver
+from thumbnail_cache import thumbnail_cache
+
+KINDS = ('prose', 'tables', 'code', 'svg', 'images', 'mixed')
+DEFAULT_SIZES = '1K,10K,100K,1M'
+FULL_SIZES = '1K,10K,100K,1M,5M,20M'
+IMAGE_COUNT = 300
+
+WORDS = ("render preview markdown note block cache image table code diagram "
+         "latency stream index search folder export print style theme editor "
+         "document section paragraph list quote link heading value result").split()
+LANGUAGES = ('python', 'javascript', 'bash', 'json', 'c', 'yaml')
+
+def parse_size(text):
+    """Parse sizes such as 512, 10K or 20M into bytes."""
+    text = text.strip().upper()
+    factor = {'K': 1024, 'M': 1024 * 1024}.get(text[-1:], 1)
+    return int(float(text.rstrip('KM')) * factor)
+
+def format_size(size):
+    for unit, factor in (('M', 1024 * 1024), ('K', 1024)):
+        if size >= factor and size % factor == 0:
+            return f"{size // factor}{unit}"
+    return str(size)
+
+def _sentence(rng, words=12):
+    text = ' '.join(rng.choice(WORDS) for _ in range(words))
+    return text[0].upper() + text[1:] + '.'
+
+def _prose(rng, i):
+    return (f"## Section {i}\n\n{_sentence(rng, 30)} *{rng.choice(WORDS)}* "
+            f"and **{rng.choice(WORDS)}** with `{rng.choice(WORDS)}` and "
+            f"[a link](https://example.com/{i}).\n\n- {_sentence(rng)}\n- {_sentence(rng)}\n")
+
+def _table(rng, i):
+    columns = 12
+    header = '| ' + ' | '.join(f"col {c}" for c in range(columns)) + ' |'
+    rule = '|' + '---|' * columns
+    rows = ['| ' + ' | '.join(rng.choice(WORDS) for _ in range(columns)) + ' |'
+            for _ in range(8)]
+    return f"### Table {i}\n\n" + '\n'.join([header, rule] + rows) + '\n'
+
+def _code(rng, i):
+    language = rng.choice(LANGUAGES)
+    lines = [f"value_{i}_{n} = compute('{rng.choice(WORDS)}', {rng.randint(0, 999)})  # {rng.choice(WORDS)}"
+             for n in range(rng.randint(10, 40))]
+    return f"Listing {i}:\n\n```{language}\n" + '\n'.join(lines) + "\n```\n"
+
+def _svg(rng, i):
+    return (f'<svg width="240" height="120" viewBox="0 0 240 120">'
+            f'<rect x="{rng.randint(0, 80)}" y="10" width="100" height="50" fill="#{rng.randint(0, 0xfff):03x}"/>'
+            f'<circle cx="180" cy="60" r="{rng.randint(5, 50)}"/><text x="10" y="110">Figure {i}</text></svg>\n\n'
+            f"{_sentence(rng)}\n")
+
+def _image(rng, i):
+    n = rng.randrange(IMAGE_COUNT)
+    src = f"/images/shot{n}.png" if rng.random() < 0.5 else f"shot{n}.png"
+    return f"![Screenshot {i}]({src})\n\n{_sentence(rng)}\n"
+
+GENERATORS = {
+    'prose': (_prose,),
+    'tables': (_table, _prose),
+    'code': (_code, _prose),
+    'svg': (_svg,),
+    'images': (_image,),
+    'mixed': (_prose, _table, _code, _svg, _image),
+}
+
+def make_corpus(kind, size, seed=0):
+    """Build a reproducible markdown document of about `size` bytes."""
+    rng = random.Random(f"{kind}-{size}-{seed}")
+    generators = GENERATORS[kind]
+    parts = [f"# {kind.title()} benchmark\n"]
+    length = len(parts[0])
+    i = 0
+    while length < size:
+        part = generators[i % len(generators)](rng, i)
+        parts.append(part)
+        length += len(part) + 1
+        i += 1
+    return '\n'.join(parts)
+
+def _png_chunk(kind, data):
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+# A valid 1x1 grey image, small enough that no display-sized copy is made
+PNG_IMAGE = (b'\x89PNG\r\n\x1a\n'
+             + _png_chunk(b'IHDR', struct.pack('>IIBBBBB', 1, 1, 8, 0, 0, 0, 0))
+             + _png_chunk(b'IDAT', zlib.compress(b'\x00\x80'))
+             + _png_chunk(b'IEND', b''))
+
+def make_image_tree(root):
+    """Create the note folder and the images the corpora refer to."""
+    notes = os.path.join(root, 'notes')
+    images = os.path.join(root, 'images')
+    os.makedirs(notes)
+    os.makedirs(images)
+    for n in range(IMAGE_COUNT):
+        for folder in (notes, images):
+            with open(os.path.join(folder, f"shot{n}.png"), 'wb') as f:
+                f.write(PNG_IMAGE)
+    return notes
+
+def warm_thumbnails(root):
+    """
+    Let the thumbnail cache look at every image before anything is timed,
+    so its background jobs don't run during the measurements.
+    """
+    paths = [os.path.join(root, folder, f"shot{n}.png")
+             for folder in ('notes', 'images') for n in range(IMAGE_COUNT)]
+    while any([thumbnail_cache.preview_url(path)[1] for path in paths]):
+        time.sleep(0.05)
+
+def clear_caches():
+    """Drop every render cache so a run measures a cold render."""
+    render._incremental_renderer.clear()
+    highlight_cache.clear()
+    image_resolver.clear()
+
+def percentiles(samples):
+    """Nearest-rank p50/p95/p99 plus min/max/mean of the samples (ms)."""
+    ordered = sorted(samples)
+
+    def rank(p):
+        return ordered[max(0, min(len(ordered) - 1, int(round(p / 100 * len(ordered) + 0.5)) - 1))]
+
+    return {
+        'p50': rank(50), 'p95': rank(95), 'p99': rank(99),
+        'min': ordered[0], 'max': ordered[-1], 'mean': sum(ordered) / len(ordered),
+        'runs': len(ordered),
+    }
+
+def time_runs(func, runs, setup=None):
+    samples = []
+    for run in range(runs):
+        if setup:
+            setup(run)
+        gc.collect()
+        start = time.perf_counter()
+        func(run)
+        samples.append((time.perf_counter() - start) * 1000)
+    return percentiles(samples)
+
+def peak_memory(func):
+    """Peak traced allocation (bytes) during one call of func."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def bench_document(doc, runs, notes_dir, project_root):
+    """Measure preview (cold and after a one-line edit) and print renders."""
+    preview = lambda text: render.markdown_to_html(text, base_dir=notes_dir, project_root=project_root)
+    printed = lambda text: render.markdown_to_html_for_browser_print(
+        text, "", os.path.join(notes_dir, 'bench.md'), project_root)
+
+    results = {
+        'preview_cold': time_runs(lambda run: preview(doc), runs, lambda run: clear_caches()),
+    }
+    # The preview caches the blocks of a fresh document once it is shown
+    render.warm_preview_cache(doc, notes_dir, project_root)
+    results.update({
+        'preview_edit': time_runs(lambda run: preview(f"{doc}\n\nEdit {run}.\n"), runs),
+        'print_cold': time_runs(lambda run: printed(doc), runs, lambda run: clear_caches()),
+    })
+    clear_caches()
+    results['preview_peak_bytes'] = peak_memory(lambda: preview(doc))
+    clear_caches()
+    results['print_peak_bytes'] = peak_memory(lambda: printed(doc))
+    return results
+
+def bench_extensions(doc, runs):
+    """
+    Cost of each preview extension on its own: median convert time of
+    plain Markdown plus that extension, minus plain Markdown. ('extra'
+    bundles several extensions, so leave-one-out would hide their cost.)
+    Extensions that only act on another one's output are measured on top
+    of it. Costs below the timing noise are reported as 0.
+    """
+    prerequisites = {CODEHILITE: [FENCED_CODE]}
+    labels = {CODEHILITE: 'codehilite', FENCED_CODE: 'fenced_code'}
+
+    def median_convert(names):
+        configs = {name: options for name, options in render.EXTENSION_CONFIGS.items() if name in names}
+        md = markdown.Markdown(extensions=names, extension_configs=configs)
+
+        def convert(run):
+            md.reset()
+            md.convert(doc)
+
+        # Highlighting is cached by content; clear it so codehilite pays its way
+        return time_runs(convert, runs, lambda run: highlight_cache.clear())['p50']
+
+    baselines = {(): median_convert([])}
+    costs = {'plain': baselines[()], 'all': median_convert(list(render.PREVIEW_EXTENSIONS))}
+    for name in render.PREVIEW_EXTENSIONS:
+        base = tuple(prerequisites.get(name, ()))
+        if base not in baselines:
+            baselines[base] = median_convert(list(base))
+        costs[labels.get(name, name)] = max(0.0, median_convert(list(base) + [name]) - baselines[base])
+    return costs
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--kinds', default=','.join(KINDS), help=f"corpora to run ({','.join(KINDS)})")
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help=f"document sizes (default {DEFAULT_SIZES})")
+    parser.add_argument('--full', action='store_true', help=f"use sizes {FULL_SIZES}")
+    parser.add_argument('--runs', type=int, default=20, help="runs per measurement for small documents")
+    parser.add_argument('--extension-size', default='100K', help="mixed corpus size for per-extension cost")
+    parser.add_argument('--output', help="write JSON results to this file")
+    args = parser.parse_args()
+
+    kinds = [kind.strip() for kind in args.kinds.split(',') if kind.strip()]
+    unknown = set(kinds) - set(KINDS)
+    if unknown:
+        parser.error(f"unknown corpus kind(s): {', '.join(sorted(unknown))}")
+    sizes = [parse_size(size) for size in (FULL_SIZES if args.full else args.sizes).split(',')]
+
+    report = {
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'markdown': markdown.__version__,
+        'platform': platform.platform(),
+        'documents': [],
+    }
+
+    with tempfile.TemporaryDirectory() as root:
+        notes_dir = make_image_tree(root)
+        warm_thumbnails(root)
+        print(f"{'corpus':<8} {'size':>5} {'runs':>4} {'cold p50':>9} {'p95':>9} {'p99':>9} "
+              f"{'edit p50':>9} {'print p50':>10} {'peak MB':>8}")
+        for kind in kinds:
+            for size in sizes:
+                doc = make_corpus(kind, size)
+                # Keep multi-megabyte documents to a few runs
+                runs = max(3, min(args.runs, int(args.runs * 100 * 1024 / size)))
+                result = bench_document(doc, runs, notes_dir, root)
+                report['documents'].append(
+                    {'kind': kind, 'size': size, 'bytes': len(doc.encode('utf-8')), **result}
+                )
+                cold = result['preview_cold']
+                print(f"{kind:<8} {format_size(size):>5} {runs:>4} {cold['p50']:>9.1f} {cold['p95']:>9.1f} "
+                      f"{cold['p99']:>9.1f} {result['preview_edit']['p50']:>9.1f} "
+                      f"{result['print_cold']['p50']:>10.1f} {result['preview_peak_bytes'] / 1e6:>8.1f}")
+
+        extension_doc = make_corpus('mixed', parse_size(args.extension_size))
+        report['extension_cost_ms'] = bench_extensions(extension_doc, max(3, args.runs // 2))
+        print(f"\nPer-extension cost on a {args.extension_size} mixed document (p50 ms):")
+        for name, cost in report['extension_cost_ms'].items():
+            print(f"  {name:<12} {cost:>8.1f}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"\nWrote {args.output}")
+
+if __name__ == '__main__':
+    main()
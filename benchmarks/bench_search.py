@@ -0,0 +1,113 @@
+# benchmarks/bench_search.py
+"""
+Benchmark the content scan behind the file filter on a large tree.
+
+Generates a reproducible corpus (50,000 notes by default, a few of them
+large) and compares the previous single-threaded scan, which decoded and
+lowercased every file, with file_search.iter_matches (batches on a
+thread pool, byte-level matching, mmap for large files, hit lines
+and snippets collected in the same pass). Reports wall time, throughput
+and peak Python allocations; both scans must return the same files.
+
+    python benchmarks/bench_search.py
+    python benchmarks/bench_search.py --files 10000 --corpus /tmp/corpus
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import file_search
+
+WORDS = ("render preview markdown note block cache image table code diagram "
+         "latency stream index search folder export print style theme editor "
+         "runbook deploy rollback incident owner service alert metric Über").split()
+
+def make_corpus(root, file_count, seed=0):
+    """Write file_count notes in nested folders; one in a thousand is 2 MB."""
+    rng = random.Random(seed)
+    for i in range(file_count):
+        folder = os.path.join(root, f"area{i % 40}", f"topic{i % 700}")
+        os.makedirs(folder, exist_ok=True)
+        words = 400_000 if i % 1000 == 999 else rng.randint(50, 900)
+        text = ' '.join(rng.choice(WORDS) for _ in range(words))
+        if i % 97 == 0:
+            text += f"\n\nTicket NEEDLE-{i} mentioned here.\n"
+        with open(os.path.join(folder, f"note{i}.md"), 'w', encoding='utf-8') as f:
+            f.write(text)
+
+def legacy_scan(root_path, term, case_sensitive=False):
+    """The previous SearchWorker scan: read, decode and lowercase every note."""
+    term = term if case_sensitive else term.lower()
+    matches = set()
+    for root, _, files in os.walk(root_path):
+        for filename in files:
+            file_path = os.path.join(root, filename)
+            if term in (filename if case_sensitive else filename.lower()):
+                matches.add(file_path)
+                continue
+            if filename.endswith(".md"):
+                try:
+                    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+                        content = f.read()
+                        if term in (content if case_sensitive else content.lower()):
+                            matches.add(file_path)
+                except (IOError, OSError):
+                    continue
+    return matches
+
+def measure(func):
+    """Time func, then run it again under tracemalloc for its peak allocations."""
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    try:
+        func()
+        return result, elapsed, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def corpus_bytes(root):
+    return sum(os.path.getsize(os.path.join(r, name)) for r, _, files in os.walk(root) for name in files)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--files', type=int, default=50_000, help="notes in the generated corpus")
+    parser.add_argument('--corpus', help="reuse (or create) the corpus in this folder")
+    parser.add_argument('--workers', type=int, help="scan threads (default: file_search's choice)")
+    parser.add_argument('--terms', default="needle-42,rollback owner,über,zzz-no-match",
+                        help="comma separated search terms")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_root:
+        root = args.corpus or os.path.join(temp_root, "docs")
+        if not os.path.isdir(root) or not os.listdir(root):
+            print(f"Generating {args.files} notes in {root} ...")
+            make_corpus(root, args.files)
+        size = corpus_bytes(root)
+        print(f"Corpus: {size / 1e6:.0f} MB\n")
+        # Warm the page cache so both scans read from memory
+        legacy_scan(root, "warm-up")
+
+        print(f"{'term':<16} {'case':>5} {'hits':>6} {'legacy s':>9} {'new s':>7} {'speedup':>8} "
+              f"{'new MB/s':>9} {'legacy peak MB':>15} {'new peak MB':>12}")
+        for term in [t for t in args.terms.split(',') if t]:
+            for case_sensitive in (False, True):
+                old, old_time, old_peak = measure(lambda: legacy_scan(root, term, case_sensitive))
+                new, new_time, new_peak = measure(lambda: {path for path, _, _ in file_search.iter_matches(
+                    root, term, case_sensitive, workers=args.workers)})
+                if old != new:
+                    print(f"MISMATCH for {term!r}: {len(old ^ new)} file(s) differ")
+                print(f"{term:<16} {str(case_sensitive):>5} {len(new):>6} {old_time:>9.2f} {new_time:>7.2f} "
+                      f"{old_time / new_time:>7.1f}x {size / 1e6 / new_time:>9.0f} "
+                      f"{old_peak / 1e6:>15.1f} {new_peak / 1e6:>12.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+# benchmarks/bench_svg.py
+"""
+Benchmark inline SVG protection on documents with hundreds of diagrams.
+
+Compares the single-pass protect/restore in render.py with the previous
+uuid placeholder + per-SVG str.replace approach, and times the full
+preview and print renders.
+
+    python benchmarks/bench_svg.py [--repeat N]
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import render
+
+def make_document(diagram_count):
+    """Build a note alternating prose, inline SVG diagrams and code."""
+    parts = ["# SVG benchmark\n"]
+    for i in range(diagram_count):
+        parts.append(f"## Diagram {i}\n\nSome text describing figure {i} with *emphasis*.\n")
+        parts.append(
+            f'<svg width="200" height="120" viewBox="0 0 200 120">'
+            f'<rect x="{i % 50}" y="10" width="80" height="40" fill="#{i % 4096:03x}"/>'
+            f'<circle cx="150" cy="60" r="{10 + i % 30}"/>'
+            f'<text x="10" y="100">Figure {i}</text></svg>\n'
+        )
+    return "\n".join(parts)
+
+def legacy_protect_restore(md_text):
+    """The previous approach: random placeholders and one replace per SVG."""
+    placeholders = {}
+
+    def extract_svg_callback(match):
+        placeholder = f"svg-placeholder-{uuid.uuid4()}"
+        placeholders[placeholder] = match.group(0)
+        return placeholder
+
+    html_content = re.sub(r'<svg.*?</svg>', extract_svg_callback, md_text,
+                          flags=re.DOTALL | re.IGNORECASE)
+    for placeholder, svg_block in placeholders.items():
+        p_placeholder = f"<p>{placeholder}</p>"
+        if p_placeholder in html_content:
+            html_content = html_content.replace(p_placeholder, svg_block)
+        else:
+            html_content = html_content.replace(placeholder, svg_block)
+    return html_content
+
+def single_pass_protect_restore(md_text):
+    md_text_clean, placeholders = render.protect_svg(md_text)
+    return render.restore_svg(md_text_clean, placeholders)
+
+def best_of(func, arg, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(arg)
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="runs per measurement (best is reported)")
+    args = parser.parse_args()
+
+    print(f"{'diagrams':>8} {'size KB':>8} {'legacy ms':>10} {'1-pass ms':>10} "
+          f"{'preview ms':>11} {'print ms':>9}")
+    for diagram_count in (100, 300, 1000):
+        doc = make_document(diagram_count)
+        legacy = best_of(legacy_protect_restore, doc, args.repeat)
+        single = best_of(single_pass_protect_restore, doc, args.repeat)
+        # Fresh edits each run so the block cache does not hide the SVG work
+        preview = best_of(lambda d: render.markdown_to_html(d + f"\n\n{time.time()}\n"), doc, args.repeat)
+        printed = best_of(render.markdown_to_html_for_browser_print, doc, args.repeat)
+        print(f"{diagram_count:>8} {len(doc) / 1024:>8.0f} {legacy:>10.2f} {single:>10.2f} "
+              f"{preview:>11.1f} {printed:>9.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,11 @@
 import os
 from datetime import datetime
 
+from style_cache import style_cache
+
+# CSS directories already checked by ensure_css_structure in this process
+_checked_css_dirs = set()
+
 class ConfigManager:
     def __init__(self):
         self.app_version = "1.0.0"
@@ -19,26 +24,30 @@ class ConfigManager:
     
     def ensure_css_structure(self):
         """Create user CSS directory and initialize with templates if needed"""
+        if self.user_css_dir in _checked_css_dirs:
+            return
         try:
             os.makedirs(self.user_css_dir, exist_ok=True)
             
             # Initialize print CSS if it doesn't exist
-            if not os.path.exists(self.print_css_file):
+            if not style_cache.exists(self.print_css_file):
                 print_template_content = self._load_css_from_file(self.print_template)
                 if print_template_content:
                     self._save_css_to_file(self.print_css_file, print_template_content)
             
             # Initialize preview CSS if it doesn't exist
-            if not os.path.exists(self.preview_css_file):
+            if not style_cache.exists(self.preview_css_file):
                 preview_template_content = self._load_css_from_file(self.preview_template)
                 if preview_template_content:
                     self._save_css_to_file(self.preview_css_file, preview_template_content)
             
             # Initialize GUI CSS if it doesn't exist
-            if not os.path.exists(self.gui_css_file):
+            if not style_cache.exists(self.gui_css_file):
                 gui_template_content = self._load_css_from_file(self.gui_template)
                 if gui_template_content:
                     self._save_css_to_file(self.gui_css_file, gui_template_content)
+
+            _checked_css_dirs.add(self.user_css_dir)
                     
         except Exception as e:
             print(f"Error creating CSS directory structure: {e}")
@@ -46,11 +55,12 @@ class ConfigManager:
     def _load_css_from_file(self, filepath):
         """Load CSS content from file with error handling"""
         try:
-            if os.path.exists(filepath):
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    content = f.read().strip()
-                    if content and len(content) > 10:
-                        return content
+            # Served from the shared in-memory cache once read
+            content = style_cache.read(filepath)
+            if content is not None:
+                content = content.strip()
+                if content and len(content) > 10:
+                    return content
         except Exception as e:
             print(f"Error loading CSS from {filepath}: {e}")
         return None
@@ -58,9 +68,7 @@ class ConfigManager:
     def _save_css_to_file(self, filepath, content):
         """Save CSS content to file with error handling"""
         try:
-            os.makedirs(os.path.dirname(filepath), exist_ok=True)
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(content)
+            style_cache.write(filepath, content)
             return True
         except Exception as e:
             print(f"Error saving CSS to {filepath}: {e}")
@@ -82,41 +90,33 @@ class ConfigManager:
     
     def load_print_css(self):
         """Load print CSS from template file with cache busting"""
-        import time
-        
         try:
             # First try to load from user print CSS file
-            if os.path.exists(self.print_css_file):
+            if style_cache.exists(self.print_css_file):
                 # Get file modification time to check if it's fresh
-                mod_time = os.path.getmtime(self.print_css_file)
-                current_time = time.time()
+                mod_time = style_cache.mtime(self.print_css_file)
                 
                 # If file is older than template, refresh it
                 template_path = os.path.join(os.path.dirname(__file__), 'templates', 'print.tpl')
-                if os.path.exists(template_path):
-                    template_mod_time = os.path.getmtime(template_path)
+                if style_cache.exists(template_path):
+                    template_mod_time = style_cache.mtime(template_path)
                     if template_mod_time > mod_time:
                         print(f"Template newer than user CSS, refreshing print CSS")
                         # Copy template to user file
-                        with open(template_path, 'r', encoding='utf-8') as f:
-                            template_content = f.read()
-                        with open(self.print_css_file, 'w', encoding='utf-8') as f:
-                            f.write(template_content)
+                        style_cache.write(self.print_css_file, style_cache.read(template_path))
                 
-                with open(self.print_css_file, 'r', encoding='utf-8') as f:
-                    content = f.read().strip()
-                    if content and len(content) > 10:
-                        return content
-                    else:
-                        print(f"WARNING: Loaded print CSS from user file: {self.print_css_file} is {len(content)} chars")
+                content = (style_cache.read(self.print_css_file) or "").strip()
+                if content and len(content) > 10:
+                    return content
+                else:
+                    print(f"WARNING: Loaded print CSS from user file: {self.print_css_file} is {len(content)} chars")
             
             # Fallback to template file in same directory as config.py
             template_path = os.path.join(os.path.dirname(__file__), 'templates', 'print.tpl')
-            if os.path.exists(template_path):
-                with open(template_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    print(f"Loaded print CSS from template: {len(content)} chars")
-                    return content
+            content = style_cache.read(template_path)
+            if content is not None:
+                print(f"Loaded print CSS from template: {len(content)} chars")
+                return content
             else:
                 print(f"Warning: print.tpl not found at {template_path}")
                 return ""
@@ -142,6 +142,7 @@ class ConfigManager:
         try:
             if os.path.exists(self.preview_css_file):
                 os.remove(self.preview_css_file)
+            style_cache.invalidate(self.preview_css_file)
             return True
         except Exception as e:
             print(f"Error resetting preview CSS: {e}")
@@ -152,6 +153,7 @@ class ConfigManager:
         try:
             if os.path.exists(self.gui_css_file):
                 os.remove(self.gui_css_file)
+            style_cache.invalidate(self.gui_css_file)
             return True
         except Exception as e:
             print(f"Error resetting GUI CSS: {e}")
@@ -162,6 +164,7 @@ class ConfigManager:
         try:
             if os.path.exists(self.print_css_file):
                 os.remove(self.print_css_file)
+            style_cache.invalidate(self.print_css_file)
             return True
         except Exception as e:
             print(f"Error resetting print CSS: {e}")
@@ -0,0 +1,292 @@
+# export_site.py
+"""
+Static-site export of the whole docs tree.
+
+Every .md file under the docs root is rendered to a standalone HTML page
+with the preview (or print) stylesheet. Pages and the images they use are
+written to the output folder in the same layout as the docs folder, and
+images link relative to their page, so the site works from any location.
+Nothing is written outside the output folder, so images from outside the
+docs folder are left out. Notes are rendered in a process pool, and a
+manifest of source hashes, the CSS version and the extension set lets a
+re-export skip every page that would come out the same.
+
+    python export_site.py docs site
+    python export_site.py docs site --style print --workers 4 --force
+"""
+
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import render
+from resource_extension import LocalResourceExtension
+
+MANIFEST_NAME = ".export_manifest.json"
+MANIFEST_VERSION = 2
+STYLES = ('preview', 'print')
+
+# Per-process converter, set up once by _init_worker
+_worker = {}
+
+def _hash_text(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+def get_site_css(style='preview'):
+    """Return the page stylesheet for the export style."""
+    if style == 'print':
+        config_manager = render.CSSManager().config_manager
+        print_css = config_manager.load_print_css() if config_manager else ""
+        return f"{print_css}\n{render.get_print_svg_css()}"
+    return render.get_preview_page_css()
+
+def extension_set():
+    """Names of the extensions a page is rendered with, recorded in the manifest."""
+    return list(render.PREVIEW_EXTENSIONS) + [f"{render.RESOURCE_EXTENSION}:relative_links"]
+
+def find_notes(docs_root):
+    """Return the absolute paths of all .md files under docs_root, sorted."""
+    notes = []
+    for root, dirs, files in os.walk(docs_root):
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+        notes.extend(os.path.join(root, name) for name in sorted(files) if name.endswith('.md'))
+    return [os.path.abspath(note) for note in notes]
+
+def _init_worker(project_root, page_css):
+    # One converter per process; only the note folder changes between pages
+    md = render.MarkdownConverterCache.build(*render._export_converter_args(project_root))
+    _worker['md'] = md
+    _worker['resources'] = next(ext for ext in md.registeredExtensions if isinstance(ext, LocalResourceExtension))
+    _worker['page_css'] = page_css
+
+def _render_note(md_text, source_path, output_path):
+    """
+    Render one note to output_path. Runs in a pool process and returns the
+    local files the page refers to.
+    """
+    md = _worker['md']
+    _worker['resources'].setConfig('base_dir', os.path.dirname(source_path))
+    md.reset()
+    html_body = render.convert_protecting_svg(md, md_text)
+
+    title = os.path.splitext(os.path.basename(source_path))[0]
+    h1_match = render._H1_TEXT_RE.search(html_body)
+    if h1_match:
+        title = h1_match.group(1).strip()
+
+    page = render.build_preview_page(html_body, _worker['page_css'], title=title)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write(page)
+    return sorted(md.local_resources)
+
+def load_manifest(output_dir):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('version') == MANIFEST_VERSION:
+            return manifest
+    except (IOError, OSError, ValueError) as e:
+        if os.path.exists(path):
+            print(f"Warning: Ignoring unreadable export manifest {path}: {e}")
+    return {}
+
+def save_manifest(output_dir, manifest):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(temp_path, path)
+
+def _output_path(output_dir, relative):
+    """relative joined to output_dir, or None if that resolves outside output_dir."""
+    path = os.path.realpath(os.path.join(output_dir, relative))
+    if os.path.commonpath([path, os.path.realpath(output_dir)]) != os.path.realpath(output_dir):
+        return None
+    return path
+
+def _copy_asset(source, target):
+    """Copy source to target unless an identical copy is already there."""
+    try:
+        src_stat = os.stat(source)
+        dst_stat = os.stat(target)
+        if src_stat.st_size == dst_stat.st_size and int(src_stat.st_mtime) == int(dst_stat.st_mtime):
+            return False
+    except OSError:
+        pass
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    shutil.copy2(source, target)
+    return True
+
+def export_site(docs_root, output_dir, project_root=None, style='preview', workers=None,
+                force=False, progress=None, should_cancel=None):
+    """
+    Export every note under docs_root to output_dir.
+
+    Output paths mirror the notes' paths relative to docs_root, and
+    root-relative image paths resolve against project_root (the parent of
+    docs_root by default). `progress(done, total, path)` is called
+    as notes finish and a true `should_cancel()` stops the export after the
+    notes in flight; finished pages are kept in the manifest. Returns a
+    summary dict with the rendered, skipped, removed and failed counts.
+    """
+    docs_root = os.path.abspath(docs_root)
+    output_dir = os.path.abspath(output_dir)
+    project_root = os.path.abspath(project_root or os.path.dirname(docs_root))
+    if style not in STYLES:
+        raise ValueError(f"Unknown export style: {style}")
+
+    start = time.perf_counter()
+    page_css = get_site_css(style)
+    old_manifest = {} if force else load_manifest(output_dir)
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'style': style,
+        'css_hash': _hash_text(page_css),
+        'extensions': extension_set(),
+        'files': {},
+    }
+    # A different stylesheet or extension set changes every page
+    settings = ('style', 'css_hash', 'extensions')
+    old_files = old_manifest.get('files', {}) if all(
+        old_manifest.get(key) == manifest[key] for key in settings) else {}
+
+    summary = {'total': 0, 'rendered': 0, 'skipped': 0, 'removed': 0, 'failed': [],
+               'assets': 0, 'cancelled': False}
+    jobs = []
+    for source_path in find_notes(docs_root):
+        relative = os.path.relpath(source_path, docs_root).replace(os.sep, '/')
+        try:
+            with open(source_path, 'r', encoding='utf-8') as f:
+                md_text = f.read()
+        except (IOError, OSError, UnicodeDecodeError) as e:
+            summary['failed'].append((relative, str(e)))
+            continue
+        entry = {
+            'source_hash': _hash_text(md_text),
+            'output': os.path.splitext(relative)[0] + '.html',
+            'assets': [],
+        }
+        if _output_path(output_dir, entry['output']) is None:
+            summary['failed'].append((relative, "its page would be written outside the output folder"))
+            continue
+        old_entry = old_files.get(relative)
+        if (old_entry and old_entry.get('source_hash') == entry['source_hash']
+                and os.path.exists(os.path.join(output_dir, old_entry['output']))):
+            manifest['files'][relative] = old_entry
+            summary['skipped'] += 1
+        else:
+            jobs.append((relative, source_path, md_text, entry))
+
+    summary['total'] = summary['skipped'] + len(jobs)
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Drop the pages of notes that were deleted or renamed
+    current = set(manifest['files']).union(job[0] for job in jobs)
+    for relative, old_entry in old_manifest.get('files', {}).items():
+        old_output = _output_path(output_dir, old_entry['output'])
+        if relative in current or old_output is None:
+            continue
+        try:
+            os.remove(old_output)
+            summary['removed'] += 1
+        except OSError:
+            pass
+
+    done = summary['skipped']
+    if progress:
+        progress(done, summary['total'], None)
+
+    if jobs:
+        workers = max(1, min(workers or os.cpu_count() or 1, len(jobs)))
+        # Spawned, not forked, so a pool started from the GUI does not inherit Qt's threads
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                       initializer=_init_worker, initargs=(project_root, page_css))
+        futures = {}
+        try:
+            futures = {
+                executor.submit(_render_note, md_text, source_path,
+                                os.path.join(output_dir, entry['output'])): (relative, entry)
+                for relative, source_path, md_text, entry in jobs
+            }
+            for future in as_completed(futures):
+                relative, entry = futures[future]
+                try:
+                    assets = future.result()
+                except Exception as e:
+                    summary['failed'].append((relative, str(e)))
+                else:
+                    entry['assets'] = [
+                        os.path.relpath(asset, docs_root).replace(os.sep, '/') for asset in assets
+                    ]
+                    manifest['files'][relative] = entry
+                    summary['rendered'] += 1
+                done += 1
+                if progress:
+                    progress(done, summary['total'], relative)
+                if should_cancel and should_cancel():
+                    summary['cancelled'] = True
+                    break
+        finally:
+            # Notes not started yet are dropped (shutdown's cancel_futures needs Python 3.9)
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+    # Images are copied once however many pages use them
+    copied = set()
+    for entry in manifest['files'].values():
+        for asset in entry['assets']:
+            if asset in copied:
+                continue
+            copied.add(asset)
+            target = _output_path(output_dir, asset)
+            if target is None:
+                print(f"Warning: Not exporting {asset}, it is outside the docs folder")
+                continue
+            try:
+                if _copy_asset(os.path.join(docs_root, asset), target):
+                    summary['assets'] += 1
+            except (IOError, OSError) as e:
+                print(f"Warning: Could not copy {asset}: {e}")
+
+    save_manifest(output_dir, manifest)
+    summary['elapsed'] = time.perf_counter() - start
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the docs tree as a static HTML site.")
+    parser.add_argument('docs_root', nargs='?', default='docs', help="folder of notes (default: docs)")
+    parser.add_argument('output_dir', nargs='?', default='site', help="output folder (default: site)")
+    parser.add_argument('--project-root', help="folder root-relative image paths resolve against "
+                                               "(default: parent of docs_root)")
+    parser.add_argument('--style', choices=STYLES, default='preview', help="stylesheet to use")
+    parser.add_argument('--workers', type=int, help="render processes (default: CPU count)")
+    parser.add_argument('--force', action='store_true', help="re-render every note")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.docs_root):
+        parser.error(f"not a folder: {args.docs_root}")
+
+    def report(done, total, path):
+        if path:
+            print(f"[{done}/{total}] {path}")
+
+    summary = export_site(args.docs_root, args.output_dir, args.project_root, args.style,
+                          args.workers, args.force, report)
+    for relative, error in summary['failed']:
+        print(f"Failed: {relative}: {error}")
+    print(f"Exported {summary['rendered']} page(s), skipped {summary['skipped']} unchanged, "
+          f"removed {summary['removed']}, copied {summary['assets']} image(s) "
+          f"in {summary['elapsed']:.1f}s")
+    return 1 if summary['failed'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
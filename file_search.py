@@ -0,0 +1,227 @@
+# file_search.py
+
+import mmap
+import os
+import re
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Files smaller than this are read in one call; mapping them costs more than it saves
+MMAP_MIN_BYTES = 64 * 1024
+# Mapped files are case-folded and searched one window at a time
+WINDOW_BYTES = 1024 * 1024
+# Paths handed to a worker at once, so small notes do not each pay for a task
+BATCH_SIZE = 64
+# Matching lines reported per file, and the longest snippet kept of each
+MAX_HIT_LINES = 50
+SNIPPET_BYTES = 160
+
+def compile_term(term, case_sensitive=False):
+    """
+    Compile a search term into a pattern over UTF-8 bytes. Without
+    case_sensitive every cased character matches its upper and lower case
+    forms, so file contents never have to be decoded or lowercased.
+    """
+    if case_sensitive:
+        return re.compile(re.escape(term.encode('utf-8')))
+    parts = []
+    for char in term:
+        variants = {char, char.lower(), char.upper()}
+        # Multi-character case mappings (e.g. 'ß'.upper()) are left to the original
+        variants = sorted({re.escape(v.encode('utf-8')) for v in variants if len(v) == 1})
+        parts.append(variants[0] if len(variants) == 1 else b'(?:' + b'|'.join(variants) + b')')
+    return re.compile(b''.join(parts))
+
+class TermMatcher:
+    """
+    Finds a search term in UTF-8 bytes (bytes or an mmap) without decoding
+    them.
+
+    Case-sensitive terms are a plain byte search. ASCII terms are matched
+    against ASCII-lowercased windows of the data, which is several times
+    faster than a case-insensitive regex; only terms with other cased
+    characters go through compile_term(). Data is searched one window at a
+    time and should_stop is checked between windows, so a cancelled search
+    never waits for a whole large file.
+    """
+
+    def __init__(self, term, case_sensitive=False):
+        self.fold = not case_sensitive and term.isascii()
+        self.pattern = None
+        if case_sensitive:
+            self.needle = term.encode('utf-8')
+        elif self.fold:
+            self.needle = term.lower().encode('ascii')
+        else:
+            self.needle = None
+            self.pattern = compile_term(term)
+        # Windows overlap so a match across a boundary is not missed;
+        # a case variant of a character is at most 4 bytes long
+        match_bytes = len(self.needle) if self.needle is not None else 4 * len(term)
+        self.overlap = max(match_bytes - 1, 0)
+        # Terms that can overlap themselves ("aa" in "aaa") are counted match
+        # by match, so the count can resume where the last one ended
+        self.counter = self.pattern
+        if self.needle and any(self.needle[:k] == self.needle[-k:] for k in range(1, len(self.needle))):
+            self.counter = re.compile(re.escape(self.needle))
+
+    def _find(self, window, start):
+        if self.pattern is None:
+            return window.find(self.needle, start)
+        match = self.pattern.search(window, start)
+        return match.start() if match else -1
+
+    def _count(self, window, start, limit):
+        """
+        Count the matches starting in window[start:limit], those in the
+        overlap belonging to the next window. Returns (count, skip), skip
+        being how far the last match reaches into the next window.
+        """
+        if self.counter is None:
+            # Matches can't overlap, so the next window is counted from its start
+            return window.count(self.needle, start, limit + len(self.needle) - 1), 0
+        count, end = 0, start
+        for match in self.counter.finditer(window, start):
+            if match.start() >= limit:
+                break
+            count += 1
+            end = match.end()
+        return count, max(end - limit, 0)
+
+    def scan(self, data, should_stop=None, max_lines=MAX_HIT_LINES):
+        """
+        Return (count, lines): how often the term occurs in data, and
+        (line_number, snippet, hits) for the first max_lines lines it occurs
+        on, with zero-based line numbers and hits counted like count.
+        Matching, counting and snippets all come from the same pass over data.
+        """
+        count = 0
+        lines = []
+        line_base = 0
+        last_line = -1
+        skip = 0
+        for start in range(0, len(data), WINDOW_BYTES):
+            if should_stop and should_stop():
+                return 0, []
+            original = data[start:start + WINDOW_BYTES + self.overlap]
+            window = original.lower() if self.fold else original
+            limit = min(WINDOW_BYTES, len(window))
+            resume = skip
+            found, skip = self._count(window, resume, limit)
+            if not found:
+                line_base += window.count(b'\n', 0, limit)
+                continue
+            count += found
+            # A full list still takes the hits of a last line running into this window
+            if len(lines) >= max_lines and last_line != line_base:
+                line_base += window.count(b'\n', 0, limit)
+                continue
+
+            newlines, counted_to = line_base, 0
+            position = self._find(window, 0)
+            while 0 <= position < limit:
+                newlines += window.count(b'\n', counted_to, position)
+                counted_to = position
+                if newlines != last_line and len(lines) >= max_lines:
+                    break
+                line_start = window.rfind(b'\n', 0, position) + 1
+                line_end = window.find(b'\n', position)
+                line_end = len(window) if line_end == -1 else line_end
+                hits, _ = self._count(window, max(position, resume), min(line_end, limit))
+                # One entry per line, also for lines crossing a window boundary
+                if newlines != last_line:
+                    lines.append((newlines, _snippet(original, line_start, line_end, position), hits))
+                    last_line = newlines
+                else:
+                    line, snippet, shown = lines[-1]
+                    lines[-1] = (line, snippet, shown + hits)
+                position = self._find(window, line_end + 1)
+            line_base += window.count(b'\n', 0, limit)
+        return count, lines
+
+def _snippet(data, line_start, line_end, position):
+    """The text of a matching line, cut around the match if the line is long."""
+    if line_end - line_start > SNIPPET_BYTES:
+        line_start = max(line_start, position - SNIPPET_BYTES // 3)
+        line_end = min(line_end, line_start + SNIPPET_BYTES)
+    return data[line_start:line_end].decode('utf-8', errors='ignore').strip()
+
+def scan_file(path, matcher, should_stop=None):
+    """
+    Run matcher.scan() over a file's bytes, mapping large files instead of
+    reading them. Returns (count, lines); unreadable files have no hits.
+    """
+    try:
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return 0, []
+            if size < MMAP_MIN_BYTES:
+                return matcher.scan(f.read(), should_stop)
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return matcher.scan(data, should_stop)
+    except (IOError, OSError, ValueError):
+        return 0, []
+
+def _scan_batch(batch, matcher, should_stop):
+    results = []
+    for path, name_matches in batch:
+        if should_stop and should_stop():
+            break
+        count, lines = scan_file(path, matcher, should_stop)
+        if count or name_matches:
+            results.append((path, count, lines))
+    return results
+
+def iter_matches(root_path, term, case_sensitive=False, workers=None, should_stop=None):
+    """
+    Yield (path, count, lines) for the files under root_path whose name
+    contains term, or whose content does for .md files. count and lines
+    are the hits in the file's content, as returned by TermMatcher.scan();
+    other files matching by name have none.
+
+    Contents are scanned in batches on a thread pool with only a few
+    batches queued per worker, so memory stays flat however large the tree
+    is. Matches are yielded as they are found, not in order. should_stop
+    is polled between files and inside large files, e.g. the is_set of a
+    threading.Event used as a cancellation token.
+    """
+    folded_term = term if case_sensitive else term.lower()
+    matcher = TermMatcher(term, case_sensitive)
+    workers = workers or min(16, (os.cpu_count() or 1) * 2)
+    max_pending = workers * 2
+    pending = set()
+    batch = []
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="file-search") as executor:
+        def collect(return_when):
+            done, _ = wait(pending, return_when=return_when)
+            for future in done:
+                pending.discard(future)
+                yield from future.result()
+
+        for root, _, files in os.walk(root_path):
+            if should_stop and should_stop():
+                break
+            for filename in files:
+                if should_stop and should_stop():
+                    break
+                file_path = os.path.join(root, filename)
+                name_matches = folded_term in (filename if case_sensitive else filename.lower())
+                if filename.endswith(".md"):
+                    batch.append((file_path, name_matches))
+                    if len(batch) >= BATCH_SIZE:
+                        pending.add(executor.submit(_scan_batch, batch, matcher, should_stop))
+                        batch = []
+                        if len(pending) >= max_pending:
+                            yield from collect(FIRST_COMPLETED)
+                elif name_matches:
+                    yield file_path, 0, []
+
+        if should_stop and should_stop():
+            for future in pending:
+                future.cancel()
+            return
+        if batch:
+            pending.add(executor.submit(_scan_batch, batch, matcher, should_stop))
+        while pending:
+            yield from collect(FIRST_COMPLETED)
@@ -3,16 +3,17 @@
 import os
 import platform
 import sys
+import threading
 import time
 from PyQt5.QtWidgets import (
     QMainWindow, QTreeWidget, QTreeWidgetItem, QSplitter, QWidget,
     QVBoxLayout, QPlainTextEdit, QMessageBox, QTabWidget, QPushButton, 
     QInputDialog, QShortcut, QMenu, QHBoxLayout, QLineEdit, QCheckBox,
-    QLabel, QStyle
+    QLabel, QStyle, QFileDialog, QProgressDialog
 )
 
 from PyQt5.QtWebEngineWidgets import QWebEngineView, QWebEnginePage
-from PyQt5.QtCore import Qt, pyqtSignal, QObject, QThread, QMimeData, QByteArray, QSize
+from PyQt5.QtCore import Qt, pyqtSignal, QObject, QThread, QMimeData, QByteArray, QSize, QTimer
 from PyQt5.QtGui import (QFont, QKeySequence, QDrag, QTextDocument,
                          QTextCursor, QIcon, QPixmap, QPainter)
 from PyQt5.QtSvg import QSvgRenderer
@@ -21,9 +22,18 @@ from PyQt5.QtPrintSupport import QPrintDialog, QPrinter
 
 from clipboard_handler import ClipboardImageHandler
 from assets import (SVG_ICON_CASE, SVG_ICON_SEARCH, SVG_ICON_CLEAR,
-                    ICON_BUTTON_STYLE)
+                    SVG_ICON_STOP, ICON_BUTTON_STYLE)
 import file_manager
+import file_search
 import render
+from export_site import export_site
+from outline import OutlinePanel
+from pdf_export import PDF_SUPPORT, PdfBatchExporter, print_css_mtime
+from print_cache import print_cache
+from quick_open import RECENT_FILE_NAME, PathIndex, QuickOpenDialog, RecentFiles
+from search_index import INDEX_FILE_NAME, RESYNC_INTERVAL, SearchIndex
+from search_results import SearchResultsPanel
+from preview import LivePreview, RenderScheduler
 
 def create_icon_from_svg(svg_data: str) -> QIcon:
     """Creates a QIcon from raw SVG data."""
@@ -43,59 +53,105 @@ def create_icon_from_svg(svg_data: str) -> QIcon:
 class SearchWorker(QObject):
     """
     Worker thread for performing file search without freezing the GUI.
+    Queries the search index once it is in sync with the tree and falls
+    back to scanning the files until then. Matches are sent in batches as
+    they are found rather than all at once at the end.
     """
-    # Signal with a list of matching file paths
-    results_ready = pyqtSignal(list)
+    # Signal with a batch of (path, hit count, [(line, snippet, hits)]) tuples
+    results_batch = pyqtSignal(list)
     finished = pyqtSignal()
 
-    def __init__(self, root_path, search_term, case_sensitive=False):
+    # A batch is sent once it holds this many paths or is this old
+    BATCH_SIZE = 200
+    BATCH_INTERVAL = 0.1
+
+    def __init__(self, root_path, search_term, case_sensitive=False, search_index=None):
         super().__init__()
         self.root_path = root_path
+        self.original_term = search_term
         # Store the search term, lowercasing it only if the search is insensitive.
         self.search_term = search_term if case_sensitive else search_term.lower()
         self.case_sensitive = case_sensitive
-        self.is_running = True
+        self.search_index = search_index
+        # Cancellation token, checked between files and inside large reads
+        self.cancelled = threading.Event()
+
+    @property
+    def is_running(self):
+        return not self.cancelled.is_set()
 
     def run(self):
         """
-        Walks the directory tree and searches file names and contents.
+        Searches file names and contents, emitting results_batch as matches
+        come in.
         """
-        matching_files = set()
+        batch = []
+        last_emit = time.monotonic()
         try:
-            for root, _, files in os.walk(self.root_path):
+            if self.search_index and self.search_index.ready:
+                matches = self._search_index()
+            else:
+                matches = self._scan_files()
+            for match in matches:
                 if not self.is_running:
                     break
-                for filename in files:
-                    if not self.is_running:
-                        break
-                    
-                    file_path = os.path.join(root, filename)
-                    
-                    # Prepare filename for comparison based on case sensitivity.
-                    search_in_filename = filename if self.case_sensitive else filename.lower()
-                    if self.search_term in search_in_filename:
-                        matching_files.add(file_path)
-                        continue  # Already matched, no need to check content
-
-                    # Search in content for .md files
-                    if filename.endswith(".md"):
-                        try:
-                            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                                content = f.read()
-                                # Prepare content for comparison based on case sensitivity.
-                                search_in_content = content if self.case_sensitive else content.lower()
-                                if self.search_term in search_in_content:
-                                    matching_files.add(file_path)
-                        except (IOError, OSError):
-                            # Ignore files we can't read
-                            continue
+                batch.append(match)
+                if len(batch) >= self.BATCH_SIZE or time.monotonic() - last_emit >= self.BATCH_INTERVAL:
+                    self.results_batch.emit(batch)
+                    batch = []
+                    last_emit = time.monotonic()
         except Exception as e:
             print(f"Error during search: {e}")
         finally:
-            if self.is_running:
-                self.results_ready.emit(sorted(list(matching_files)))
+            if self.is_running and batch:
+                self.results_batch.emit(batch)
             self.finished.emit()
 
+    def _search_index(self):
+        """Query the index; hit lines come from the text it stores, not from the files."""
+        matcher = file_search.TermMatcher(self.original_term, self.case_sensitive)
+        for path, content in self.search_index.iter_search(self.original_term, self.case_sensitive,
+                                                           should_stop=self.cancelled.is_set):
+            count, lines = matcher.scan(content.encode('utf-8'), self.cancelled.is_set)
+            yield path, count, lines
+
+    def _scan_files(self):
+        """Search file names and .md contents on disk, for when the index is not ready."""
+        return file_search.iter_matches(self.root_path, self.original_term, self.case_sensitive,
+                                        should_stop=self.cancelled.is_set)
+
+    def stop(self):
+        self.cancelled.set()
+
+class ExportWorker(QObject):
+    """
+    Runs a static-site export off the GUI thread. The rendering itself is
+    spread over a process pool by export_site.
+    """
+    progress = pyqtSignal(int, int, str)
+    finished = pyqtSignal(object)
+
+    def __init__(self, docs_root, output_dir, project_root):
+        super().__init__()
+        self.docs_root = docs_root
+        self.output_dir = output_dir
+        self.project_root = project_root
+        self.is_running = True
+
+    def run(self):
+        summary = None
+        try:
+            summary = export_site(
+                self.docs_root, self.output_dir, self.project_root,
+                progress=lambda done, total, path: self.progress.emit(done, total, path or ""),
+                should_cancel=lambda: not self.is_running
+            )
+        except Exception as e:
+            print(f"Error during site export: {e}")
+            summary = {'error': str(e)}
+        finally:
+            self.finished.emit(summary)
+
     def stop(self):
         self.is_running = False
 
@@ -132,6 +188,9 @@ class SearchWidget(QWidget):
 
 class MarkdownManagerApp(QMainWindow):
 
+    # Typing pause after which the filter runs
+    FILTER_DELAY_MS = 300
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Markdown Manager")
@@ -148,6 +207,17 @@ class MarkdownManagerApp(QMainWindow):
         self.is_filtered = False
         self.search_thread = None
         self.search_worker = None
+        self.search_active = False
+        # Cancelled searches whose threads are still winding down
+        self.retired_searches = []
+        self.filter_nodes = {}
+        self.filter_match_count = 0
+        self.filter_hit_count = 0
+        self.filter_term = ""
+        self.filter_case_sensitive = False
+        self.export_thread = None
+        self.export_worker = None
+        self.pdf_exporter = None
         self.root_path = "."  # Default root path
 
         # Create menu bar
@@ -170,7 +240,15 @@ class MarkdownManagerApp(QMainWindow):
 
         self.tree = MarkdownTreeWidget(self)
         self.tree.setHeaderHidden(True)
-        left_layout.addWidget(self.tree)
+
+        # Line-level hits of the filter, below the tree while a filter is shown
+        self.search_results = SearchResultsPanel(self.root_path)
+        self.search_results.hit_activated.connect(self.open_search_hit)
+        self.search_results.hide()
+        left_splitter = QSplitter(Qt.Vertical)
+        left_splitter.addWidget(self.tree)
+        left_splitter.addWidget(self.search_results)
+        left_layout.addWidget(left_splitter)
 
         # Connect the custom signal to refresh tree
         self.tree.tree_updated.connect(lambda: self.load_tree(self.root_path))
@@ -186,6 +264,9 @@ class MarkdownManagerApp(QMainWindow):
         search_shortcut = QShortcut(QKeySequence("Ctrl+F"), self)
         search_shortcut.activated.connect(self.toggle_search_widget)
 
+        quick_open_shortcut = QShortcut(QKeySequence("Ctrl+P"), self)
+        quick_open_shortcut.activated.connect(self.show_quick_open)
+
         splitter.addWidget(left_panel)
         
         # Determine and set up the default directory
@@ -209,6 +290,23 @@ class MarkdownManagerApp(QMainWindow):
         
         self.load_tree(self.root_path)
 
+        # Full-text index kept in the project root, caught up with the disk in the background
+        self.search_index = SearchIndex(self.root_path,
+                                        db_path=os.path.join(self.project_root, INDEX_FILE_NAME))
+        self.search_index.start_sync()
+        # and again every RESYNC_INTERVAL for files changed outside the app
+        self.index_sync_timer = QTimer(self)
+        self.index_sync_timer.timeout.connect(self.search_index.start_sync)
+        self.index_sync_timer.start(int(RESYNC_INTERVAL * 1000))
+
+        # Every note path for Quick Open (Ctrl+P), listed in the background
+        self.path_index = PathIndex(self.root_path)
+        self.path_index.start_build()
+        self.recent_files = RecentFiles(self.root_path,
+                                        file_path=os.path.join(self.project_root, RECENT_FILE_NAME))
+        self.quick_open = QuickOpenDialog(self.path_index, self.recent_files, self)
+        self.quick_open.file_selected.connect(self.open_quick_open_result)
+
         # Right panel - Tab widget and Search
         right_panel = QWidget()
         right_layout = QVBoxLayout()
@@ -233,8 +331,22 @@ class MarkdownManagerApp(QMainWindow):
         self.editor.setStyleSheet("font-family: 'Courier New', monospace;")
         self.tab_widget.addTab(self.editor, "Editor")
 
+        # Outline of the open note, kept up to date as it is edited
+        self.outline_panel = OutlinePanel(self.editor)
+        self.outline_panel.heading_activated.connect(self.jump_to_heading)
+        splitter.addWidget(self.outline_panel)
+
         # Preview tab
         self.render_html = QWebEngineView()
+        self.live_preview = LivePreview(self.render_html, self)
+        self.render_scheduler = RenderScheduler(self)
+        self.render_scheduler.rendered.connect(self.live_preview.update)
+        self.render_scheduler.failed.connect(self._show_render_error)
+        self.live_preview.displayed.connect(self._on_preview_displayed)
+
+        # Breakdown of the last preview render
+        self.render_status_label = QLabel()
+        self.statusBar().addPermanentWidget(self.render_status_label)
         self.tab_widget.addTab(self.render_html, "Preview")
 
         # Style tab
@@ -267,7 +379,7 @@ class MarkdownManagerApp(QMainWindow):
             self.handle_search_text_changed
         )
 
-        splitter.setSizes([250, 750])
+        splitter.setSizes([250, 750, 200])
         
         splitter.setChildrenCollapsible(True)
         left_panel.setMinimumSize(150, 0)
@@ -285,6 +397,12 @@ class MarkdownManagerApp(QMainWindow):
         self.filter_input.returnPressed.connect(self._start_search)
         filter_layout.addWidget(self.filter_input)
 
+        # Search as you type, once typing pauses; a newer query cancels the older one
+        self.filter_timer = QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.timeout.connect(self._start_search)
+        self.filter_input.textEdited.connect(lambda: self.filter_timer.start(self.FILTER_DELAY_MS))
+
         # Case sensitive search button
         self.case_sensitive_button = QPushButton()
         self.case_sensitive_button.setIcon(create_icon_from_svg(SVG_ICON_CASE))
@@ -293,6 +411,7 @@ class MarkdownManagerApp(QMainWindow):
         self.case_sensitive_button.setFixedSize(28, 28)
         self.case_sensitive_button.setToolTip("Match Case")
         self.case_sensitive_button.setStyleSheet(ICON_BUTTON_STYLE)
+        self.case_sensitive_button.toggled.connect(self._on_case_sensitive_toggled)
         filter_layout.addWidget(self.case_sensitive_button)
 
         # Find button
@@ -301,7 +420,7 @@ class MarkdownManagerApp(QMainWindow):
         self.find_button.setIconSize(QSize(20, 20))
         self.find_button.setFixedSize(28, 28)
         self.find_button.setToolTip("Find")
-        self.find_button.clicked.connect(self._start_search)
+        self.find_button.clicked.connect(self._on_find_button_clicked)
         self.find_button.setStyleSheet(ICON_BUTTON_STYLE)
         filter_layout.addWidget(self.find_button)
 
@@ -317,60 +436,112 @@ class MarkdownManagerApp(QMainWindow):
         
         parent_layout.addLayout(filter_layout)
 
+        # Live match count while a filter is shown
+        self.filter_status = QLabel()
+        self.filter_status.hide()
+        parent_layout.addWidget(self.filter_status)
+
+    def _on_find_button_clicked(self):
+        """The find button doubles as the stop control while a search runs."""
+        if self.search_active:
+            self._stop_search()
+        else:
+            self._start_search()
+
+    def _on_case_sensitive_toggled(self):
+        """Re-runs a shown filter with the new case setting."""
+        if self.is_filtered and self.filter_input.text():
+            self.filter_timer.start(self.FILTER_DELAY_MS)
+
+    def _stop_search(self):
+        """Stops the running search, keeping the matches found so far."""
+        if self.search_active:
+            self.search_worker.stop()
+            self._update_filter_status()
+
+    def _retire_search(self):
+        """
+        Cancels the running search without waiting for it. Its thread winds
+        down on its own; a reference is kept until it has finished.
+        """
+        if self.search_active:
+            self.search_worker.stop()
+            self.retired_searches.append((self.search_thread, self.search_worker))
+            self.search_active = False
+
+    def _set_find_button_stops(self, stops):
+        """Switches the find button between starting and stopping a search."""
+        if stops:
+            self.find_button.setIcon(create_icon_from_svg(SVG_ICON_STOP))
+            self.find_button.setToolTip("Stop search")
+        else:
+            self.find_button.setIcon(create_icon_from_svg(SVG_ICON_SEARCH))
+            self.find_button.setToolTip("Find")
+
     def _start_search(self):
         """Initiates the file search in a background thread."""
+        self.filter_timer.stop()
         search_term = self.filter_input.text()  # Removed .strip()
         if not search_term:
-            self._clear_filter()
+            if self.is_filtered:
+                self._clear_filter()
             return
 
-        # Stop previous search if it's still running
-        if self.search_thread and self.search_thread.isRunning():
-            self.search_worker.stop()
-            self.search_thread.quit()
-            self.search_thread.wait()
+        # Cancel a previous search that is still running
+        self._retire_search()
 
-        self.filter_input.setEnabled(False)
-        self.find_button.setEnabled(False)
-        self.case_sensitive_button.setEnabled(False)
-        self.clear_button.setEnabled(False)
+        self._set_find_button_stops(True)
         self.tree.clear()
+        self.is_filtered = True
+        self.search_active = True
+        self.filter_nodes = {}
+        self.filter_match_count = 0
+        self.filter_hit_count = 0
         loading_item = QTreeWidgetItem(["Searching..."])
         self.tree.addTopLevelItem(loading_item)
+        self.search_results.clear_results(self.root_path)
+        self.search_results.show()
 
         # Check case sensitivity state
         is_case_sensitive = self.case_sensitive_button.isChecked()
+        # Kept for selecting the term when a hit is opened
+        self.filter_term = search_term
+        self.filter_case_sensitive = is_case_sensitive
 
         # Setup and start the new search thread
         self.search_thread = QThread()
         self.search_worker = SearchWorker(
-            self.root_path, search_term, case_sensitive=is_case_sensitive
+            self.root_path, search_term, case_sensitive=is_case_sensitive,
+            search_index=self.search_index
         )
         self.search_worker.moveToThread(self.search_thread)
 
         self.search_thread.started.connect(self.search_worker.run)
-        self.search_worker.results_ready.connect(self._update_tree_with_filter)
+        self.search_worker.results_batch.connect(self._add_filter_results)
         self.search_worker.finished.connect(self.search_thread.quit)
         self.search_worker.finished.connect(self.search_worker.deleteLater)
         self.search_thread.finished.connect(self._on_search_complete)
 
         self.search_thread.start()
+        self._update_filter_status()
 
-    def _update_tree_with_filter(self, matching_files):
-        """Rebuilds the tree view to show only the search results."""
-        self.tree.clear()
-        self.is_filtered = True
-        
-        if not matching_files:
-            no_results_item = QTreeWidgetItem(["No matches found."])
-            self.tree.addTopLevelItem(no_results_item)
+    def _add_filter_results(self, matching_files):
+        """Merges a batch of search results into the filtered tree."""
+        if self.sender() is not self.search_worker or not self.is_filtered:
+            # A late batch from a search that has been replaced or cleared
             return
-
-        # A dictionary to keep track of created tree items by their path
-        nodes = {}
+        if not self.filter_nodes:
+            # Drop the "Searching..." placeholder
+            self.tree.clear()
+        self.filter_match_count += len(matching_files)
+        self.filter_hit_count += sum(count for _, count, _ in matching_files)
+        self.search_results.add_results(matching_files)
+
+        # Tree items created so far, keyed by their path
+        nodes = self.filter_nodes
         root_path_abs = os.path.abspath(self.root_path)
 
-        for path in matching_files:
+        for path, _, _ in matching_files:
             # Make path relative to the root for tree building
             relative_path = os.path.relpath(path, os.path.dirname(root_path_abs))
             
@@ -393,34 +564,75 @@ class MarkdownManagerApp(QMainWindow):
                 new_item = QTreeWidgetItem([display_name])
                 new_item.setData(0, Qt.UserRole, current_path_so_far)
                 nodes[current_path_so_far] = new_item
-                
-                if parent_item:
-                    parent_item.addChild(new_item)
-                else:
-                    self.tree.addTopLevelItem(new_item)
+                self._insert_filter_item(parent_item, new_item)
+                # Expand all items in the filtered view for clarity
+                new_item.setExpanded(True)
                 
                 parent_item = new_item
-        
-        # Expand all items in the filtered view for clarity
-        self.tree.expandAll()
+
+        self._update_filter_status()
+
+    def _insert_filter_item(self, parent_item, new_item):
+        """Inserts an item among its siblings in path order, as results arrive unordered."""
+        if parent_item:
+            count, child_at = parent_item.childCount(), parent_item.child
+        else:
+            count, child_at = self.tree.topLevelItemCount(), self.tree.topLevelItem
+        path = new_item.data(0, Qt.UserRole)
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            if child_at(middle).data(0, Qt.UserRole) < path:
+                low = middle + 1
+            else:
+                high = middle
+        if parent_item:
+            parent_item.insertChild(low, new_item)
+        else:
+            self.tree.insertTopLevelItem(low, new_item)
+
+    def _update_filter_status(self):
+        """Shows the number of matches and whether the search is still going."""
+        if not self.is_filtered:
+            self.filter_status.hide()
+            return
+        count, hits = self.filter_match_count, self.filter_hit_count
+        text = f"{count} file{'s' if count != 1 else ''}, {hits} hit{'s' if hits != 1 else ''}"
+        if self.search_active:
+            if not self.search_worker.is_running:
+                text = f"Stopping... {text}"
+            else:
+                text = f"Searching... {text}"
+        self.filter_status.setText(text)
+        self.filter_status.show()
 
     def _clear_filter(self):
         """Resets the filter and reloads the full directory tree."""
-        if self.search_thread and self.search_thread.isRunning():
-            self.search_worker.stop()
-            self.search_thread.quit()
-            self.search_thread.wait()
+        self.filter_timer.stop()
+        self._retire_search()
+        self._set_find_button_stops(False)
 
         self.filter_input.clear()
         self.is_filtered = False
+        self.filter_nodes = {}
+        self._update_filter_status()
+        self.search_results.clear_results()
+        self.search_results.hide()
         self.load_tree(self.root_path)
 
     def _on_search_complete(self):
-        """Re-enables UI elements after a search is complete."""
-        self.filter_input.setEnabled(True)
-        self.find_button.setEnabled(True)
-        self.case_sensitive_button.setEnabled(True)
-        self.clear_button.setEnabled(True)
+        """Turns the stop control back into the find button after a search ends."""
+        thread = self.sender()
+        self.retired_searches = [(t, w) for t, w in self.retired_searches if t is not thread]
+        if thread is not self.search_thread or not self.search_active:
+            # A cancelled search has wound down
+            return
+        self.search_active = False
+        self._set_find_button_stops(False)
+        if self.is_filtered and not self.filter_nodes:
+            self.tree.clear()
+            self.tree.addTopLevelItem(QTreeWidgetItem(["No matches found."]))
+        self._update_filter_status()
 
     # Events
     def handle_paste_event(self):
@@ -643,6 +855,9 @@ class MarkdownManagerApp(QMainWindow):
             expanded_paths = self.tree.get_expanded_paths()
             
             file_manager.rename_item(current_path, new_path)
+            self.search_index.rename_path(current_path, new_path)
+            self.path_index.rename_path(current_path, new_path)
+            self.recent_files.rename(current_path, new_path)
             
             if self.current_file == current_path:
                 self.current_file = new_path
@@ -704,20 +919,11 @@ class MarkdownManagerApp(QMainWindow):
             
             try:
                 print_css = self.config_manager.load_print_css()
-                import render
                 
-                # Pass project_root to the renderer
-                html_content = render.markdown_to_html_for_browser_print(md_text, print_css, self.current_file, project_root=self.project_root)
-                
-                file_dir = os.path.dirname(os.path.abspath(self.current_file))
-                filename_base = os.path.splitext(os.path.basename(self.current_file))[0]
-
-                html_filename = f"{filename_base}_print.html"
-                html_filepath = os.path.join(file_dir, html_filename)
-                
-                # Write HTML file
-                with open(html_filepath, 'w', encoding='utf-8') as f:
-                    f.write(html_content)
+                # Reuse the cached page when neither the note nor print.css changed
+                html_filepath, _ = print_cache.get_or_render(
+                    md_text, print_css, self.current_file, project_root=self.project_root
+                )
                 
                 # Open in default browser
                 import webbrowser
@@ -728,10 +934,9 @@ class MarkdownManagerApp(QMainWindow):
                 QMessageBox.information(
                     self, 
                     "Print File Created", 
-                    f"Print-ready HTML file created:\n{html_filename}\n\n"
-                    f"The file has been opened in your default browser.\n"
+                    f"The print-ready page has been opened in your default browser.\n"
                     f"Use Ctrl+P (or Cmd+P on Mac) to print from the browser.\n\n"
-                    f"The HTML file will remain in the same folder as your markdown file."
+                    f"Print pages are kept in {os.path.dirname(html_filepath)}."
                 )
                 
             except Exception as render_error:
@@ -984,7 +1189,9 @@ class MarkdownManagerApp(QMainWindow):
                     scroll_position = scroll_bar.value()
                     
                     # Create the file
-                    file_manager.create_new_file(target_path, sanitized_name)
+                    new_file_path = file_manager.create_new_file(target_path, sanitized_name)
+                    self.search_index.update_path(new_file_path)
+                    self.path_index.add_path(new_file_path)
                     
                     # Refresh and restore state
                     if self.tree.refresh_directory_node(target_path):
@@ -1127,6 +1334,7 @@ class MarkdownManagerApp(QMainWindow):
                 self.current_file = file_path
                 self.original_content = content
                 self.has_unsaved_changes = False
+                self.recent_files.add(file_path)
                 self.update_window_title()
                 self.update_rendered_view()
                 
@@ -1157,6 +1365,7 @@ class MarkdownManagerApp(QMainWindow):
         try:
             content = self.editor.toPlainText()
             file_manager.save_file(self.current_file, content)
+            self.search_index.update_path(self.current_file)
             self.original_content = content
             self.has_unsaved_changes = False
             self.update_window_title()
@@ -1263,6 +1472,8 @@ class MarkdownManagerApp(QMainWindow):
             else:
                 try:
                     file_manager.create_new_file(path, filename)
+                    self.search_index.update_path(new_file_path)
+                    self.path_index.add_path(new_file_path)
                     # Use selective refresh instead of full reload
                     if not self.tree.refresh_directory_node(path):
                         self.load_tree(".")  # Fallback to full refresh
@@ -1341,7 +1552,7 @@ class MarkdownManagerApp(QMainWindow):
                 ):
                     self.current_file = None
                     self.editor.clear()
-                    self.render_html.setHtml("")
+                    self.live_preview.clear()
                     self.original_content = ""
                     self.has_unsaved_changes = False
                     self.update_window_title()
@@ -1355,6 +1566,8 @@ class MarkdownManagerApp(QMainWindow):
                         self.tree.takeTopLevelItem(index)
                 
                 file_manager.delete_item(path)
+                self.search_index.remove_path(path)
+                self.path_index.remove_path(path)
                 
                 refresh_success = False
                 if os.path.isdir(parent_dir):
@@ -1385,6 +1598,9 @@ class MarkdownManagerApp(QMainWindow):
     # TREE
     def refresh_tree_preserve_state(self):
         """Refresh tree while preserving expanded state and selection."""
+        # Pick up files changed outside the app
+        self.search_index.start_sync()
+        self.path_index.start_build()
         try:
             expanded_paths = set()
             
@@ -1676,6 +1892,7 @@ class MarkdownManagerApp(QMainWindow):
             self.current_file = path
             self.original_content = content
             self.has_unsaved_changes = False
+            self.recent_files.add(path)
             self.update_window_title()
             self.update_rendered_view()
             # This line ensures the button resets to "Saved" on file load
@@ -1686,7 +1903,7 @@ class MarkdownManagerApp(QMainWindow):
                 self, "Error", f"Failed to load file:\n{str(e)}"
             )
             self.editor.clear()
-            self.render_html.setHtml("")
+            self.live_preview.clear()
             self.current_file = None
             self.original_content = ""
             self.has_unsaved_changes = False
@@ -1774,23 +1991,66 @@ class MarkdownManagerApp(QMainWindow):
         try:
             base_dir = os.path.dirname(os.path.abspath(self.current_file)) if self.current_file else os.path.abspath(".")
             
-            # Pass project_root to the renderer
-            temp_html_path = render.markdown_to_html(md_text, custom_css, save_temp_file=True, base_dir=base_dir, project_root=self.project_root)
-            
-            if temp_html_path and os.path.exists(temp_html_path):
-                from PyQt5.QtCore import QUrl
-                file_url = QUrl.fromLocalFile(os.path.abspath(temp_html_path))
-                
-                query = f"v={int(time.time() * 1000)}"
-                file_url.setQuery(query)
-                
-                self.render_html.setUrl(file_url)
-            else:
-                self.render_html.setHtml(temp_html_path or "")
+            # Rendering runs in the background; only the newest result is shown
+            self.render_scheduler.request(md_text, custom_css, base_dir, self.project_root, document_key=self.current_file)
                 
         except Exception as e:
-            error_html = f"<html><body><h3>Markdown Rendering Error</h3><p>{str(e)}</p></body></html>"
-            self.render_html.setHtml(error_html)
+            self._show_render_error(str(e))
+
+    def jump_to_heading(self, line, index):
+        """Move the editor to a heading's line and scroll the preview to it."""
+        block = self.editor.document().findBlockByNumber(line)
+        if block.isValid():
+            cursor = QTextCursor(block)
+            self.editor.setTextCursor(cursor)
+            self.editor.centerCursor()
+        self.live_preview.scroll_to_heading(index)
+
+    def show_quick_open(self):
+        """Show the Quick Open palette (Ctrl+P)."""
+        self.quick_open.show_palette()
+
+    def open_quick_open_result(self, path):
+        """Open the note picked in Quick Open in the editor."""
+        self.load_file_by_path(path)
+        if self.current_file != path:
+            return
+        self.update_save_button_style()
+        self.tab_widget.setCurrentIndex(0)
+        self.editor.setFocus()
+
+    def open_search_hit(self, path, line):
+        """Open a file from the search results at a hit line, selecting the match."""
+        if not self.current_file or os.path.abspath(path) != os.path.abspath(self.current_file):
+            self.load_file_by_path(path)
+            if self.current_file != path:
+                return
+            self.update_save_button_style()
+        self.tab_widget.setCurrentIndex(0)
+
+        block = self.editor.document().findBlockByNumber(line)
+        if not block.isValid():
+            return
+        cursor = QTextCursor(block)
+        text, term = block.text(), self.filter_term
+        column = text.find(term) if self.filter_case_sensitive else text.lower().find(term.lower())
+        if term and column >= 0:
+            cursor.setPosition(block.position() + column)
+            cursor.setPosition(block.position() + column + len(term), QTextCursor.KeepAnchor)
+        self.editor.setTextCursor(cursor)
+        self.editor.centerCursor()
+        self.editor.setFocus()
+
+    def _on_preview_displayed(self, timer, how):
+        """Show the last render's stage timings and append them to the timing log."""
+        self.render_status_label.setText(f"Render {timer.total:.0f} ms ({how}): {timer.summary()}")
+        # Progressive chunks carry no conversion stages of their own
+        if 'convert' in timer.stages:
+            render.log_render_timings(timer, result=how)
+
+    def _show_render_error(self, message):
+        error_html = f"<html><body><h3>Markdown Rendering Error</h3><p>{message}</p></body></html>"
+        self.live_preview.show_html(error_html)
 
     # Other
     def handle_tab_change(self, index):
@@ -1883,6 +2143,104 @@ class MarkdownManagerApp(QMainWindow):
             except Exception as e:
                 QMessageBox.critical(self, "Error", f"Failed to reset style:\n{str(e)}")
 
+    def export_site_dialog(self):
+        """Export the docs tree as a static HTML site in a background thread."""
+        if self.export_thread and self.export_thread.isRunning():
+            return
+        output_dir = QFileDialog.getExistingDirectory(self, "Export Site To", self.project_root)
+        if not output_dir:
+            return
+        if os.path.abspath(output_dir).startswith(os.path.abspath(self.root_path) + os.sep):
+            QMessageBox.warning(self, "Export Site", "Choose a folder outside the docs folder.")
+            return
+
+        self.export_progress = QProgressDialog("Exporting notes...", "Cancel", 0, 0, self)
+        self.export_progress.setWindowTitle("Export Site")
+        self.export_progress.setWindowModality(Qt.WindowModal)
+        self.export_progress.setMinimumDuration(0)
+
+        self.export_thread = QThread()
+        self.export_worker = ExportWorker(self.root_path, output_dir, self.project_root)
+        self.export_worker.moveToThread(self.export_thread)
+
+        self.export_thread.started.connect(self.export_worker.run)
+        self.export_worker.progress.connect(self._on_export_progress)
+        self.export_worker.finished.connect(self._on_export_finished)
+        self.export_worker.finished.connect(self.export_thread.quit)
+        self.export_worker.finished.connect(self.export_worker.deleteLater)
+        self.export_progress.canceled.connect(self.export_worker.stop)
+
+        self.export_thread.start()
+
+    def _on_export_progress(self, done, total, path):
+        self.export_progress.setMaximum(total)
+        self.export_progress.setValue(done)
+        if path:
+            self.export_progress.setLabelText(f"Exporting {path}")
+
+    def _on_export_finished(self, summary):
+        self.export_progress.close()
+        if not summary or 'error' in summary:
+            error = summary.get('error') if summary else "Unknown error"
+            QMessageBox.critical(self, "Export Site", f"Failed to export site:\n{error}")
+            return
+
+        message = (f"Exported {summary['rendered']} page(s), skipped {summary['skipped']} unchanged "
+                   f"and removed {summary['removed']} in {summary['elapsed']:.1f}s.")
+        if summary['cancelled']:
+            message = "Export cancelled.\n" + message
+        if summary['failed']:
+            failed = '\n'.join(f"{path}: {error}" for path, error in summary['failed'][:10])
+            QMessageBox.warning(self, "Export Site", f"{message}\n\nFailed:\n{failed}")
+        else:
+            QMessageBox.information(self, "Export Site", message)
+
+    def export_pdf_dialog(self):
+        """Print every note under a chosen folder to PDF with offscreen pages."""
+        if not PDF_SUPPORT:
+            QMessageBox.warning(self, "Export PDFs", "PDF export needs PyQtWebEngine.")
+            return
+        if self.pdf_exporter and self.pdf_exporter.is_running:
+            return
+        source_dir = QFileDialog.getExistingDirectory(self, "Folder to Export", self.root_path)
+        if not source_dir:
+            return
+        output_dir = QFileDialog.getExistingDirectory(self, "Save PDFs To", self.project_root)
+        if not output_dir:
+            return
+
+        self.pdf_progress = QProgressDialog("Exporting PDFs...", "Cancel", 0, 0, self)
+        self.pdf_progress.setWindowTitle("Export PDFs")
+        self.pdf_progress.setWindowModality(Qt.WindowModal)
+        self.pdf_progress.setMinimumDuration(0)
+
+        self.pdf_exporter = PdfBatchExporter(
+            source_dir, output_dir, self.config_manager.load_print_css(), self.project_root,
+            css_mtime=print_css_mtime(self.config_manager), parent=self
+        )
+        self.pdf_exporter.progress.connect(self._on_pdf_export_progress)
+        self.pdf_exporter.finished.connect(self._on_pdf_export_finished)
+        self.pdf_progress.canceled.connect(self.pdf_exporter.stop)
+        self.pdf_exporter.start()
+
+    def _on_pdf_export_progress(self, done, total, path):
+        self.pdf_progress.setMaximum(total)
+        self.pdf_progress.setValue(done)
+        if path:
+            self.pdf_progress.setLabelText(f"Exporting {path}")
+
+    def _on_pdf_export_finished(self, summary):
+        self.pdf_progress.close()
+        message = (f"Exported {summary['exported']} PDF(s) and skipped {summary['skipped']} "
+                   f"up to date in {summary['elapsed']:.1f}s.")
+        if summary['cancelled']:
+            message = "Export cancelled.\n" + message
+        if summary['failed']:
+            failed = '\n'.join(f"{path}: {error}" for path, error in summary['failed'][:10])
+            QMessageBox.warning(self, "Export PDFs", f"{message}\n\nFailed:\n{failed}")
+        else:
+            QMessageBox.information(self, "Export PDFs", message)
+
     def save_style_config(self):
         """Save style configuration and update preview"""
         try:
@@ -1898,6 +2256,14 @@ class MarkdownManagerApp(QMainWindow):
 
     def closeEvent(self, event):
         """Clean up temporary files on application close"""
+        self.render_scheduler.shutdown()
+        self._retire_search()
+        for thread, _ in self.retired_searches:
+            thread.wait()
+        if self.export_worker and self.export_thread.isRunning():
+            self.export_worker.stop()
+            self.export_thread.quit()
+            self.export_thread.wait()
         try:
             if self.current_file:
                 base_dir = os.path.dirname(os.path.abspath(self.current_file))
@@ -1957,6 +2323,9 @@ class MarkdownManagerApp(QMainWindow):
         print_action = document_menu.addAction("Print Preview")
         print_action.triggered.connect(self.print_preview)
 
+        export_pdf_action = document_menu.addAction("Export Folder to PDF...")
+        export_pdf_action.triggered.connect(self.export_pdf_dialog)
+
 
         # Utility Menu
         utility_menu = menu_bar.addMenu("&Utility")
@@ -1968,6 +2337,11 @@ class MarkdownManagerApp(QMainWindow):
         reset_style_action = utility_menu.addAction("Reset ALL Styles")
         reset_style_action.triggered.connect(self.reset_default_style)
 
+        utility_menu.addSeparator()
+
+        export_site_action = utility_menu.addAction("Export Site...")
+        export_site_action.triggered.connect(self.export_site_dialog)
+
         # Help Menu
         help_menu = menu_bar.addMenu("&Help")
 
@@ -2426,6 +2800,11 @@ class MarkdownTreeWidget(QTreeWidget):
             while main_window and not hasattr(main_window, 'load_tree'):
                 main_window = main_window.parent()
             
+            if main_window and hasattr(main_window, 'search_index'):
+                main_window.search_index.rename_path(source_path, new_path)
+                main_window.path_index.rename_path(source_path, new_path)
+                main_window.recent_files.rename(source_path, new_path)
+
             # Update current file reference if it was moved
             if main_window and hasattr(main_window, 'current_file') and main_window.current_file:
                 if main_window.current_file == source_path:
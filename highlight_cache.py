@@ -0,0 +1,223 @@
+# highlight_cache.py
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+from markdown.extensions import codehilite, fenced_code
+from markdown.extensions.attr_list import AttrListExtension, get_attrs_and_remainder
+
+# Names to load the cached extensions by, in place of 'codehilite' and
+# 'fenced_code' (their configs are given under these names too)
+CODEHILITE = 'highlight_cache:CachedCodeHiliteExtension'
+FENCED_CODE = 'highlight_cache:CachedFencedCodeExtension'
+
+class HighlightCache:
+    """
+    Content-addressed LRU cache of highlighted code blocks, bounded by the
+    total size of the cached HTML.
+    """
+
+    def __init__(self, max_bytes=16 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(code, language, formatter_options):
+        """Build a cache key from the language, a hash of the code and the formatter options."""
+        code_hash = hashlib.sha1(code.encode('utf-8')).hexdigest()
+        return (language, code_hash, formatter_options)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, html_content):
+        size = len(html_content.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+            self._entries[key] = (html_content, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        """Return a snapshot of the cache counters."""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hit_rate,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+highlight_cache = HighlightCache()
+
+class CachedCodeHilite(codehilite.CodeHilite):
+    """CodeHilite that looks up the highlighted HTML before running pygments."""
+
+    def hilite(self, shebang=True):
+        formatter_options = repr((
+            shebang, sorted(self.options.items()), self.pygments_formatter,
+            self.lang_prefix, self.use_pygments, self.guess_lang,
+        ))
+        key = HighlightCache.make_key(self.src.strip('\n'), self.lang, formatter_options)
+        html_content = highlight_cache.get(key)
+        if html_content is None:
+            html_content = super().hilite(shebang)
+            highlight_cache.put(key, html_content)
+        return html_content
+
+_BARE_AMPERSAND_RE = re.compile(r'&(?!(?:\#[0-9]+|\#x[0-9a-f]+|[0-9a-z]+);)', re.IGNORECASE)
+
+def _escape_attribute(value):
+    """Escape an attribute value like the fenced_code extension; non-strings pass through."""
+    if not isinstance(value, str):
+        return value
+    value = _BARE_AMPERSAND_RE.sub('&amp;', value)
+    return value.replace('<', '&lt;').replace('>', '&gt;').replace('"', '&quot;')
+
+class CachedHiliteTreeprocessor(codehilite.HiliteTreeprocessor):
+    """Highlights indented code blocks like the stock treeprocessor, through the cache."""
+
+    def run(self, root):
+        for block in root.iter('pre'):
+            if len(block) != 1 or block[0].tag != 'code' or block[0].text is None:
+                continue
+            local_config = self.config.copy()
+            code = CachedCodeHilite(
+                self.code_unescape(block[0].text),
+                tab_length=self.md.tab_length,
+                style=local_config.pop('pygments_style', 'default'),
+                **local_config
+            )
+            placeholder = self.md.htmlStash.store(code.hilite())
+            # Turned into a paragraph holding the placeholder, which is
+            # swapped for the stashed HTML at the end
+            block.clear()
+            block.tag = 'p'
+            block.text = placeholder
+
+class CachedFencedBlockPreprocessor(fenced_code.FencedBlockPreprocessor):
+    """
+    Stores fenced code blocks in the HTML stash like the stock
+    preprocessor, highlighting them through the cache. The output matches
+    the stock extension's, fence syntax and attributes included.
+    """
+
+    def run(self, lines):
+        if not self.checked_for_deps:
+            for ext in self.md.registeredExtensions:
+                if isinstance(ext, codehilite.CodeHiliteExtension):
+                    self.codehilite_conf = ext.getConfigs()
+                if isinstance(ext, AttrListExtension):
+                    self.use_attr_list = True
+            self.checked_for_deps = True
+
+        text = "\n".join(lines)
+        index = 0
+        while True:
+            match = self.FENCED_BLOCK_RE.search(text, index)
+            if not match:
+                break
+            lang, element_id, classes, config = None, '', [], {}
+            if match.group('attrs'):
+                attrs, remainder = get_attrs_and_remainder(match.group('attrs'))
+                if remainder:
+                    # Unbalanced braces, so this isn't a fence
+                    index = match.end('attrs')
+                    continue
+                element_id, classes, config = self.handle_attrs(attrs)
+                if classes:
+                    lang = classes.pop(0)
+            else:
+                lang = match.group('lang') or None
+                if match.group('hl_lines'):
+                    config['hl_lines'] = codehilite.parse_hl_lines(match.group('hl_lines'))
+
+            if (self.codehilite_conf and self.codehilite_conf['use_pygments']
+                    and config.get('use_pygments', True)):
+                code = self._highlight(match.group('code'), lang, classes, config)
+            else:
+                code = self._plain(match.group('code'), lang, element_id, classes, config)
+
+            placeholder = self.md.htmlStash.store(code)
+            text = f'{text[:match.start()]}\n{placeholder}\n{text[match.end():]}'
+            index = match.start() + 1 + len(placeholder)
+        return text.split("\n")
+
+    def _highlight(self, code, lang, classes, config):
+        """Highlighted HTML of a block, with the block's options over codehilite's."""
+        local_config = self.codehilite_conf.copy()
+        local_config.update(config)
+        # Pygments may add a suffix to the last class, so css_class goes last
+        if classes:
+            local_config['css_class'] = f"{' '.join(classes)} {local_config['css_class']}"
+        return CachedCodeHilite(
+            code, lang=lang, style=local_config.pop('pygments_style', 'default'), **local_config
+        ).hilite(shebang=False)
+
+    def _plain(self, code, lang, element_id, classes, config):
+        """Unhighlighted <pre><code> HTML of a block."""
+        lang_attr = class_attr = id_attr = kv_pairs = ''
+        if lang:
+            prefix = self.config.get('lang_prefix', 'language-')
+            lang_attr = f' class="{prefix}{_escape_attribute(lang)}"'
+        if classes:
+            class_attr = f' class="{_escape_attribute(" ".join(classes))}"'
+        if element_id:
+            id_attr = f' id="{_escape_attribute(element_id)}"'
+        if self.use_attr_list and config and not config.get('use_pygments', False):
+            # Other key/value attributes go on the code element
+            kv_pairs = ''.join(f' {key}="{_escape_attribute(value)}"'
+                               for key, value in config.items() if key != 'use_pygments')
+        return f'<pre{id_attr}{class_attr}><code{lang_attr}{kv_pairs}>{self._escape(code)}</code></pre>'
+
+class CachedCodeHiliteExtension(codehilite.CodeHiliteExtension):
+    """The codehilite extension, highlighting indented code through the cache."""
+
+    def extendMarkdown(self, md):
+        hiliter = CachedHiliteTreeprocessor(md)
+        hiliter.config = self.getConfigs()
+        md.treeprocessors.register(hiliter, 'hilite', 30)
+        md.registerExtension(self)
+
+class CachedFencedCodeExtension(fenced_code.FencedCodeExtension):
+    """
+    The fenced_code extension, highlighting through the cache. It replaces
+    the stock preprocessor, so it has to be loaded after 'extra'.
+    """
+
+    def extendMarkdown(self, md):
+        md.registerExtension(self)
+        md.preprocessors.register(CachedFencedBlockPreprocessor(md, self.getConfigs()), 'fenced_code_block', 25)
@@ -0,0 +1,290 @@
+# outline.py
+
+import html
+import re
+from functools import lru_cache
+
+import markdown
+from markdown.extensions.fenced_code import FencedBlockPreprocessor
+from markdown.util import BLOCK_LEVEL_ELEMENTS
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal
+from PyQt5.QtWidgets import QTreeWidget, QTreeWidgetItem
+
+_CHUNK_SPLIT_RE = re.compile(r'(\n(?:[ \t]*\n)+)')
+_ATX_RE = re.compile(r'(#{1,6})(.*?)#*[ \t]*$')
+_SETEXT_RE = re.compile(r'[=-]+[ \t]*$')
+_HR_RE = re.compile(r' {0,3}(?:(?:-+ {0,2}){3,}|(?:_+ {0,2}){3,}|(?:\*+ {0,2}){3,})$')
+_LIST_ITEM_RE = re.compile(r' {0,3}(?:[*+-]|\d+\.) +')
+_BLOCKQUOTE_RE = re.compile(r' {0,3}>')
+_DEFINITION_RE = re.compile(r' {0,3}: ')
+_REFERENCE_RE = re.compile(r' {0,3}\[[^\[\]]*\]:[ ]*\S+[ ]*(?:(["\']).*\1[ ]*|\(.*\)[ ]*)?$')
+_RAW_START_RE = re.compile(r' {0,3}<([a-zA-Z][a-zA-Z0-9]*)\b[^>]*?(/?)>')
+_HTML_HEADING_RE = re.compile(r'<h([1-6])\b[^>]*>(.*?)(?:</h\1>|$)', re.IGNORECASE)
+_FENCED_BLOCK_RE = FencedBlockPreprocessor.FENCED_BLOCK_RE
+_FENCE_MARKERS = ('```', '~~~')
+_ATTR_LIST_RE = re.compile(r'\s*\{[^}]*\}\s*$')
+_LINK_RE = re.compile(r'!?\[([^\]]*)\]\([^)]*\)')
+_EMPHASIS_RE = re.compile(r'(\*\*|__|\*|`)(?=[^\s*_`])(.+?)(?<=[^\s*_`])\1')
+_TAG_RE = re.compile(r'<[^>]+>')
+
+def _heading_text(raw):
+    """Plain text of a heading's source, as it reads in the rendered page."""
+    text = _ATTR_LIST_RE.sub('', raw.strip())
+    text = _LINK_RE.sub(r'\1', text)
+    text = _TAG_RE.sub('', _EMPHASIS_RE.sub(r'\2', text))
+    return html.unescape(text).strip()
+
+def _replace_fenced_code(md_text):
+    """
+    Replace fenced code blocks with a placeholder paragraph of as many
+    lines, as the fenced_code preprocessor takes them out before any block
+    is parsed. A fence that is never closed stays text.
+    """
+    parts = []
+    position = start = 0
+    # Next position of each marker, only searched again once passed
+    found = {marker: md_text.find(marker) for marker in _FENCE_MARKERS}
+    while True:
+        for marker, index in found.items():
+            if 0 <= index < start:
+                found[marker] = md_text.find(marker, start)
+        if all(index == -1 for index in found.values()):
+            break
+        index = min(index for index in found.values() if index != -1)
+        match = _FENCED_BLOCK_RE.match(md_text, index) if index == 0 or md_text[index - 1] == '\n' else None
+        if match:
+            parts.append(md_text[position:index])
+            newlines = match.group(0).count('\n')
+            parts.append('\n' if newlines == 1 else '\n' + markdown.util.STX + '\n' * (newlines - 1))
+            position = start = match.end()
+        else:
+            start = index + 1
+    if not parts:
+        return md_text
+    parts.append(md_text[position:])
+    return ''.join(parts)
+
+@lru_cache(maxsize=1)
+def _table_processor():
+    return markdown.Markdown(extensions=['tables']).parser.blockprocessors['table']
+
+@lru_cache(maxsize=256)
+def _tag_re(tag):
+    return re.compile(r'<(/?)%s\b[^>]*?(/?)>' % re.escape(tag), re.IGNORECASE)
+
+def _raw_depth(line, tag, depth):
+    """Nesting depth of a raw HTML block's tag after the tags on `line`."""
+    if tag == '!--':
+        return 0 if '-->' in line else depth
+    for closing, self_closing in _tag_re(tag).findall(line):
+        if closing:
+            depth -= 1
+        elif not self_closing:
+            depth += 1
+    return depth
+
+@lru_cache(maxsize=65536)
+def _chunk_headings(chunk, raw, in_list=False, comments_close=False):
+    """
+    Find the headings of one blank-line separated chunk, fenced code
+    already replaced.
+
+    `raw` is the (tag, depth) of the raw HTML block still open when the
+    chunk starts (or None) and `in_list` whether the page so far ends with
+    a list; `comments_close` tells whether an HTML comment opened in the
+    chunk is closed later on. Returns ((line, level, title), ...) with
+    lines relative to the chunk, the raw block left open at its end and
+    whether the chunk leaves a list last.
+    """
+    headings = []
+    lines = chunk.split('\n')
+    # Line where the current Markdown block starts; a setext underline only
+    # makes a heading of a block's first line, as in Python-Markdown.
+    start = 0 if raw is None else None
+    underline = None
+    # An indented chunk after a list goes into its last item, with any
+    # lazy lines following it
+    lazy = in_list and raw is None and chunk.startswith(('    ', '\t'))
+    if lazy:
+        start = None
+    # Start of the block found to be a list
+    list_start = None
+    # Start of the block found to be a list or blockquote, which keeps
+    # reference definitions in it from splitting it
+    nested = None
+    # Start of the block split off after a reference definition; rules and
+    # blockquotes in the whole block were found before that split
+    after_definition = None
+    # Start of the block split off after a rule or a reference definition,
+    # only reached once ATX headings have split the whole block
+    split = None
+    # Line of a definition whose indented lines are being skipped, and what
+    # the rest of the block belongs to: a 'table' up to the next ATX heading
+    # or a 'definition' up to the next heading or rule
+    definition = None
+    contained = None
+    for number, line in enumerate(lines):
+        if raw is not None:
+            depth = _raw_depth(line, *raw)
+            if depth > 0:
+                raw = (raw[0], depth)
+            else:
+                raw, start = None, number + 1
+            continue
+        if number == underline or (number == start and not line.strip()):
+            start = number + 1
+            continue
+        if definition is not None:
+            if line.startswith(('    ', '\t')):
+                continue
+            # The lines after the definition's indented ones are a new block
+            start = split = number
+            definition = None
+
+        raw_match = _RAW_START_RE.match(line)
+        # An unclosed comment stays text
+        if (line.lstrip(' ').startswith('<!--') and len(line) - len(line.lstrip(' ')) <= 3
+                and ('-->' in line or comments_close)):
+            if '-->' in line:
+                start = number + 1
+            else:
+                raw = ('!--', 1)
+        elif raw_match and raw_match.group(1).lower() in BLOCK_LEVEL_ELEMENTS:
+            # Raw HTML is passed through untouched up to its closing tag,
+            # blank lines included
+            tag = raw_match.group(1).lower()
+            match = _HTML_HEADING_RE.match(line.lstrip(' '))
+            if match:
+                headings.append((number, int(match.group(1)), _heading_text(match.group(2))))
+            depth = 0 if tag == 'hr' or raw_match.group(2) else _raw_depth(line, tag, 0)
+            if depth > 0:
+                raw = (tag, depth)
+            else:
+                start = number + 1
+        elif lazy:
+            continue
+        elif number == start and '|' in line and _table_processor().test(None, '\n'.join(lines[number:])):
+            # A table runs to the end of the chunk, or of its part of a split block
+            if start != split:
+                break
+            contained = 'table'
+        elif line.startswith('#'):
+            match = _ATX_RE.match(line)
+            headings.append((number, len(match.group(1)), _heading_text(match.group(2))))
+            start = number + 1
+            contained = None
+        elif contained == 'table' or (contained and not _HR_RE.match(line)):
+            continue
+        elif (number == start and number + 1 < len(lines) and not line.startswith(('    ', '\t'))
+              and _SETEXT_RE.match(lines[number + 1])
+              and not (number == after_definition and (_HR_RE.match(line) or _HR_RE.match(lines[number + 1])
+                                                       or _BLOCKQUOTE_RE.match(line)))):
+            level = 1 if lines[number + 1].startswith('=') else 2
+            headings.append((number, level, _heading_text(line)))
+            underline = number + 1
+        elif _HR_RE.match(line):
+            start = split = number + 1
+            contained = None
+        elif number == start and line.startswith(('    ', '\t')):
+            # An indented code block ends at the first unindented line
+            if after_definition == number:
+                after_definition = number + 1
+            if split == number:
+                split = number + 1
+            start = number + 1
+        elif start is not None and start < number and list_start != start and _DEFINITION_RE.match(line):
+            following = lines[number + 1] if number + 1 < len(lines) else ''
+            if following and not following.startswith(('    ', '\t')) and not following.lstrip(' ').startswith(':'):
+                # Unindented lines run on in the definition
+                contained = 'definition'
+            else:
+                definition = number
+        elif nested != start and _REFERENCE_RE.match(line):
+            # The definition is taken out and the lines after it are a new block
+            start = after_definition = split = number + 1
+        if number == start and _LIST_ITEM_RE.match(line):
+            nested = list_start = start
+        elif _BLOCKQUOTE_RE.match(line):
+            nested = start
+    return tuple(headings), raw, lazy or (start is not None and list_start == start)
+
+def document_outline(md_text):
+    """
+    Return the top-level headings of a note as [(line, level, title)] with
+    zero-based editor line numbers. Chunks are parsed through a cache, so
+    after an edit only the changed chunks are looked at again.
+    """
+    outline = []
+    raw = None
+    in_list = False
+    position = line = counted = 0
+    md_text = _replace_fenced_code(md_text)
+    last_comment_end = md_text.rfind('-->')
+    parts = _CHUNK_SPLIT_RE.split(md_text)
+    for index, part in enumerate(parts):
+        if index % 2 == 0:
+            comments_close = '<!--' in part and last_comment_end > position + part.rfind('<!--')
+            headings, raw, in_list = _chunk_headings(part, raw, in_list, comments_close)
+            if headings:
+                # Lines are only counted up to chunks that have headings
+                line += md_text.count('\n', counted, position)
+                counted = position
+                outline.extend((line + number, level, title) for number, level, title in headings)
+        position += len(part)
+    return outline
+
+class OutlinePanel(QTreeWidget):
+    """
+    Tree of the open note's headings. Follows the editor as it changes and
+    emits heading_activated(line, index) when one is clicked, index being
+    its position among the page's top-level headings.
+    """
+    heading_activated = pyqtSignal(int, int)
+
+    UPDATE_DELAY_MS = 100
+
+    def __init__(self, editor, parent=None):
+        super().__init__(parent)
+        self.editor = editor
+        self.setHeaderHidden(True)
+        self._headings = None
+        self._lines = []
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.refresh)
+        self.editor.textChanged.connect(lambda: self._timer.start(self.UPDATE_DELAY_MS))
+        self.itemClicked.connect(self._on_item_clicked)
+
+    def refresh(self):
+        """Re-read the outline, rebuilding the tree only if the headings changed."""
+        self._timer.stop()
+        outline = document_outline(self.editor.toPlainText())
+        self._lines = [line for line, _, _ in outline]
+        headings = [(level, title) for _, level, title in outline]
+        if headings == self._headings:
+            # Only line numbers moved
+            return
+        self._headings = headings
+
+        self.clear()
+        parents = []
+        for index, (level, title) in enumerate(headings):
+            item = QTreeWidgetItem([title or "(untitled)"])
+            item.setData(0, Qt.UserRole, index)
+            while parents and parents[-1][0] >= level:
+                parents.pop()
+            if parents:
+                parents[-1][1].addChild(item)
+            else:
+                self.addTopLevelItem(item)
+            parents.append((level, item))
+        self.expandAll()
+
+    def _on_item_clicked(self, item, column):
+        if self._timer.isActive():
+            # Pick up line numbers from edits made since the last refresh
+            self.refresh()
+        index = item.data(0, Qt.UserRole)
+        if index is not None and index < len(self._lines):
+            self.heading_activated.emit(self._lines[index], index)
@@ -0,0 +1,285 @@
+# pdf_export.py
+"""
+Batch export of notes to PDF.
+
+Each note is rendered with markdown_to_html_for_browser_print on a worker
+thread and printed by an offscreen QWebEnginePage, so no browser or print
+dialog is involved and the GUI stays responsive.
+A fixed number of pages print concurrently; PDFs newer than both their
+note and the print stylesheet are skipped.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from PyQt5.QtCore import QObject, QMarginsF, QThread, QUrl, pyqtSignal, pyqtSlot
+from PyQt5.QtGui import QPageLayout, QPageSize
+
+import render
+from export_site import find_notes
+
+try:
+    from PyQt5.QtWebEngineWidgets import QWebEnginePage
+    PDF_SUPPORT = True
+except ImportError:
+    QWebEnginePage = None
+    PDF_SUPPORT = False
+
+DEFAULT_CONCURRENCY = 3
+
+def pdf_path_for(note_path, source_dir, output_dir):
+    """Return where the PDF of a note goes, mirroring its place under source_dir."""
+    relative = os.path.relpath(note_path, source_dir)
+    return os.path.join(output_dir, os.path.splitext(relative)[0] + '.pdf')
+
+def print_css_mtime(config_manager):
+    """Modification time of the user's print stylesheet, or 0 if there is none."""
+    try:
+        return os.path.getmtime(config_manager.print_css_file)
+    except OSError:
+        return 0
+
+def is_up_to_date(note_path, pdf_path, css_mtime=0):
+    """True if the PDF exists and is newer than the note and the print stylesheet."""
+    try:
+        pdf_mtime = os.path.getmtime(pdf_path)
+        return pdf_mtime >= os.path.getmtime(note_path) and pdf_mtime >= css_mtime
+    except OSError:
+        return False
+
+class _PrintRenderWorker(QObject):
+    """
+    Renders notes to print HTML files on a background thread, so large
+    notes never block the GUI while the offscreen pages print.
+    """
+    rendered = pyqtSignal(object, str)
+
+    def __init__(self, print_css, project_root, svg_asset_dir, parent=None):
+        super().__init__(parent)
+        self.print_css = print_css
+        self.project_root = project_root
+        self.svg_asset_dir = svg_asset_dir
+
+    @pyqtSlot(object)
+    def render(self, job):
+        note_path, pdf_path, html_path = job
+        error = ""
+        try:
+            with open(note_path, 'r', encoding='utf-8') as f:
+                md_text = f.read()
+            html_content = render.markdown_to_html_for_browser_print(
+                md_text, self.print_css, note_path, project_root=self.project_root,
+                svg_asset_dir=self.svg_asset_dir)
+            # Loaded from a file, as setHtml is limited to 2 MB
+            with open(html_path, 'w', encoding='utf-8') as f:
+                f.write(html_content)
+        except Exception as e:
+            error = str(e)
+        self.rendered.emit(job, error)
+
+class PdfBatchExporter(QObject):
+    """
+    Prints every note under a folder to PDF through a small pool of
+    offscreen pages. Notes are rendered to HTML on a worker thread, a few
+    ahead of the pages, which only load the finished files. Emits
+    progress(done, total, note) as notes finish and finished(summary) once
+    the batch is complete or cancelled.
+    """
+    progress = pyqtSignal(int, int, str)
+    finished = pyqtSignal(object)
+    _render = pyqtSignal(object)
+
+    def __init__(self, source_dir, output_dir, print_css="", project_root=None, css_mtime=0,
+                 concurrency=DEFAULT_CONCURRENCY, force=False, parent=None):
+        super().__init__(parent)
+        self.source_dir = os.path.abspath(source_dir)
+        self.output_dir = os.path.abspath(output_dir)
+        self.print_css = print_css
+        self.project_root = project_root
+        self.css_mtime = css_mtime
+        self.concurrency = max(1, concurrency)
+        self.force = force
+        self.page_layout = QPageLayout(QPageSize(QPageSize.A4), QPageLayout.Portrait,
+                                       QMarginsF(15, 15, 15, 15), QPageLayout.Millimeter)
+        self.is_running = False
+        self._queue = []
+        self._ready = []
+        self._rendering = 0
+        self._pages = []
+        self._busy = {}
+        self._temp_dir = None
+        self._thread = None
+        self._worker = None
+        self._page_count = 0
+        self._summary = None
+        self._start_time = 0
+
+    def start(self):
+        """Collect the notes that need a PDF and start printing them."""
+        self.is_running = True
+        self._start_time = time.perf_counter()
+        notes = find_notes(self.source_dir)
+        self._summary = {'total': len(notes), 'exported': 0, 'skipped': 0, 'failed': [],
+                         'cancelled': False, 'elapsed': 0.0}
+        for note_path in notes:
+            pdf_path = pdf_path_for(note_path, self.source_dir, self.output_dir)
+            if not self.force and is_up_to_date(note_path, pdf_path, self.css_mtime):
+                self._summary['skipped'] += 1
+            else:
+                self._queue.append((note_path, pdf_path))
+        # Popped from the end, so keep the tree order
+        self._queue.reverse()
+        self.progress.emit(self._summary['skipped'], len(notes), "")
+
+        if not self._queue:
+            self._finish()
+            return
+        self._temp_dir = tempfile.mkdtemp(prefix="md_pdf_export_")
+        for _ in range(min(self.concurrency, len(self._queue))):
+            page = QWebEnginePage(self)
+            page.loadFinished.connect(lambda ok, page=page: self._on_load_finished(page, ok))
+            page.pdfPrintingFinished.connect(
+                lambda path, ok, page=page: self._on_pdf_finished(page, ok))
+            self._pages.append(page)
+
+        self._thread = QThread()
+        self._worker = _PrintRenderWorker(self.print_css, self.project_root,
+                                          os.path.join(self._temp_dir, "svg"))
+        self._worker.moveToThread(self._thread)
+        self._render.connect(self._worker.render)
+        self._worker.rendered.connect(self._on_rendered)
+        self._thread.start()
+        self._advance()
+
+    def stop(self):
+        """Cancel the batch; pages already printing are allowed to finish."""
+        if self.is_running:
+            self._summary['cancelled'] = True
+            self._queue.clear()
+            self._ready.clear()
+            self._advance()
+
+    def _advance(self):
+        """Start idle pages on rendered notes, keep the worker ahead and finish when done."""
+        for page in self._pages:
+            if not self._ready:
+                break
+            if page not in self._busy:
+                note_path, pdf_path, html_path = self._ready.pop(0)
+                self._busy[page] = (note_path, pdf_path)
+                page.load(QUrl.fromLocalFile(html_path))
+
+        while self._queue and self._rendering + len(self._ready) < self.concurrency:
+            note_path, pdf_path = self._queue.pop()
+            self._page_count += 1
+            html_path = os.path.join(self._temp_dir, f"page{self._page_count}.html")
+            self._rendering += 1
+            self._render.emit((note_path, pdf_path, html_path))
+
+        if not (self._queue or self._ready or self._rendering or self._busy):
+            self._finish()
+
+    def _on_rendered(self, job, error):
+        self._rendering -= 1
+        note_path, pdf_path, html_path = job
+        if error:
+            self._note_done(note_path, error)
+        elif not self._summary['cancelled']:
+            self._ready.append(job)
+        self._advance()
+
+    def _on_load_finished(self, page, ok):
+        if page not in self._busy:
+            return
+        note_path, pdf_path = self._busy[page]
+        if not ok:
+            del self._busy[page]
+            self._note_done(note_path, "page failed to load")
+            self._advance()
+            return
+        os.makedirs(os.path.dirname(pdf_path), exist_ok=True)
+        # Printed to a temporary name so an interrupted export leaves no truncated PDF
+        page.printToPdf(f"{pdf_path}.part", self.page_layout)
+
+    def _on_pdf_finished(self, page, ok):
+        note_path, pdf_path = self._busy.pop(page)
+        error = None
+        if ok:
+            try:
+                os.replace(f"{pdf_path}.part", pdf_path)
+            except OSError as e:
+                error = str(e)
+        else:
+            error = "printing failed"
+        self._note_done(note_path, error)
+        self._advance()
+
+    def _note_done(self, note_path, error=None):
+        relative = os.path.relpath(note_path, self.source_dir)
+        if error:
+            print(f"Error exporting {relative} to PDF: {error}")
+            self._summary['failed'].append((relative, error))
+        else:
+            self._summary['exported'] += 1
+        done = self._summary['skipped'] + self._summary['exported'] + len(self._summary['failed'])
+        self.progress.emit(done, self._summary['total'], relative)
+
+    def _finish(self):
+        if not self.is_running:
+            return
+        self.is_running = False
+        if self._thread is not None:
+            self._thread.quit()
+            self._thread.wait()
+            self._thread = None
+            self._worker = None
+        for page in self._pages:
+            page.deleteLater()
+        self._pages = []
+        if self._temp_dir:
+            shutil.rmtree(self._temp_dir, ignore_errors=True)
+            self._temp_dir = None
+        self._summary['elapsed'] = time.perf_counter() - self._start_time
+        self.finished.emit(self._summary)
+
+def main():
+    import argparse
+    from PyQt5.QtCore import QTimer
+    from PyQt5.QtWidgets import QApplication
+    from config import ConfigManager
+
+    parser = argparse.ArgumentParser(description="Export every note under a folder to PDF.")
+    parser.add_argument('source_dir', help="folder of notes")
+    parser.add_argument('output_dir', help="folder the PDFs are written to")
+    parser.add_argument('--project-root', help="folder root-relative image paths resolve against "
+                                               "(default: parent of source_dir)")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"pages printed at once (default: {DEFAULT_CONCURRENCY})")
+    parser.add_argument('--force', action='store_true', help="re-export up-to-date PDFs")
+    args = parser.parse_args()
+
+    if not PDF_SUPPORT:
+        parser.error("PDF export needs PyQtWebEngine")
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    app = QApplication(sys.argv[:1])
+
+    config_manager = ConfigManager()
+    project_root = args.project_root or os.path.dirname(os.path.abspath(args.source_dir))
+    exporter = PdfBatchExporter(
+        args.source_dir, args.output_dir, config_manager.load_print_css(), project_root,
+        css_mtime=print_css_mtime(config_manager),
+        concurrency=args.concurrency, force=args.force
+    )
+    exporter.progress.connect(lambda done, total, note: note and print(f"[{done}/{total}] {note}"))
+    exporter.finished.connect(lambda summary: app.exit(1 if summary['failed'] else 0))
+    exporter.finished.connect(lambda summary: print(
+        f"Exported {summary['exported']} PDF(s), skipped {summary['skipped']} up to date, "
+        f"{len(summary['failed'])} failed in {summary['elapsed']:.1f}s"))
+    QTimer.singleShot(0, exporter.start)
+    return app.exec_()
+
+if __name__ == '__main__':
+    sys.exit(main())
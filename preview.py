@@ -0,0 +1,424 @@
+# preview.py
+
+import json
+import mimetypes
+import os
+import time
+
+from PyQt5.QtCore import QObject, QThread, QTimer, QUrl, QBuffer, QIODevice, pyqtSignal, pyqtSlot
+
+import render
+from thumbnail_cache import thumbnail_cache
+
+try:
+    from PyQt5.QtWebEngineCore import (QWebEngineUrlScheme, QWebEngineUrlSchemeHandler,
+                                       QWebEngineUrlRequestJob)
+    SCHEME_SUPPORT = True
+except ImportError:
+    # Qt < 5.12 has no scheme registration; the preview falls back to a temp file
+    QWebEngineUrlSchemeHandler = QObject
+    SCHEME_SUPPORT = False
+
+PREVIEW_SCHEME = b"mdpreview"
+PREVIEW_PAGE_NAME = ".markdown_preview.html"
+_scheme_registered = False
+
+def register_preview_scheme():
+    """
+    Register the in-memory preview scheme. Must run before the
+    QApplication is created.
+    """
+    global _scheme_registered
+    if not SCHEME_SUPPORT or _scheme_registered:
+        return
+    scheme = QWebEngineUrlScheme(PREVIEW_SCHEME)
+    scheme.setSyntax(QWebEngineUrlScheme.Syntax.Path)
+    scheme.setFlags(QWebEngineUrlScheme.SecureScheme
+                    | QWebEngineUrlScheme.LocalScheme
+                    | QWebEngineUrlScheme.LocalAccessAllowed)
+    QWebEngineUrlScheme.registerScheme(scheme)
+    _scheme_registered = True
+
+def diff_fragments(old_fragments, new_fragments):
+    """
+    Compare two fragment lists by their common prefix and suffix.
+    Returns (start, delete_count, inserted) describing the splice that turns
+    the old list into the new one, or None when they are identical.
+    """
+    if old_fragments == new_fragments:
+        return None
+
+    start = 0
+    limit = min(len(old_fragments), len(new_fragments))
+    while start < limit and old_fragments[start] == new_fragments[start]:
+        start += 1
+
+    old_end = len(old_fragments)
+    new_end = len(new_fragments)
+    while (old_end > start and new_end > start
+           and old_fragments[old_end - 1] == new_fragments[new_end - 1]):
+        old_end -= 1
+        new_end -= 1
+
+    return start, old_end - start, new_fragments[start:new_end]
+
+class PreviewSchemeHandler(QWebEngineUrlSchemeHandler):
+    """
+    Serves preview pages from memory under mdpreview: URLs that mirror the
+    note's directory, so relative links still resolve to files next to it.
+    Anything not held in memory is read from that local path.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._pages = {}
+
+    @staticmethod
+    def page_url(base_dir):
+        url = QUrl.fromLocalFile(os.path.join(os.path.abspath(base_dir), PREVIEW_PAGE_NAME))
+        url.setScheme(PREVIEW_SCHEME.decode())
+        return url
+
+    @staticmethod
+    def local_path(url):
+        file_url = QUrl(url)
+        file_url.setScheme("file")
+        return os.path.normpath(file_url.toLocalFile())
+
+    def publish(self, html_page, base_dir):
+        """Hold the page for base_dir in memory and return the URL to load."""
+        url = self.page_url(base_dir)
+        # Only the page on screen is kept
+        self._pages = {self.local_path(url): html_page.encode('utf-8')}
+        return url
+
+    def requestStarted(self, job):
+        path = self.local_path(job.requestUrl())
+        data = self._pages.get(path)
+        content_type = "text/html"
+        if data is None:
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+            except (IOError, OSError):
+                job.fail(QWebEngineUrlRequestJob.UrlNotFound)
+                return
+            content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+        buffer = QBuffer(job)
+        buffer.setData(data)
+        buffer.open(QIODevice.ReadOnly)
+        job.reply(content_type.encode(), buffer)
+
+class LivePreview(QObject):
+    """
+    Keeps a QWebEngineView in sync with the editor. The page shell is loaded
+    once per document; later edits only replace the changed blocks in the
+    live DOM, so images stay loaded and the scroll position is kept.
+
+    `displayed` is emitted with the update's RenderTimer (its 'view' stage
+    filled in) and how the page changed: 'load', 'patch' or 'unchanged'.
+    """
+    displayed = pyqtSignal(object, str)
+
+    def __init__(self, view, parent=None):
+        super().__init__(parent)
+        self.view = view
+        self.view.loadFinished.connect(self._on_load_finished)
+        self.scheme_handler = None
+        if _scheme_registered:
+            self.scheme_handler = PreviewSchemeHandler(self)
+            self.view.page().profile().installUrlSchemeHandler(PREVIEW_SCHEME, self.scheme_handler)
+        self._reset()
+
+    def _reset(self):
+        self._fragments = None
+        self._page_css = None
+        self._base_dir = None
+        self._document_key = None
+        self._loading = False
+        self._pending = None
+        self._load_timing = None
+
+    def update(self, fragments, page_css, base_dir, document_key=None, timer=None):
+        """Show the given fragments, patching the current page when possible."""
+        timer = timer or render.RenderTimer()
+        if (self._fragments is None or document_key != self._document_key
+                or base_dir != self._base_dir):
+            self._document_key = document_key
+            self._load(fragments, page_css, base_dir, timer)
+        elif self._loading:
+            # Applied as soon as the page shell has finished loading
+            self._pending = (fragments, page_css, timer)
+        else:
+            self._patch(fragments, page_css, timer)
+
+    def show_html(self, html_content):
+        """Replace the preview with a standalone page, e.g. an error report."""
+        self._reset()
+        self.view.setHtml(html_content)
+
+    def clear(self):
+        self.show_html("")
+
+    def scroll_to_heading(self, index):
+        """Scroll to the index-th top-level heading of the page."""
+        if self._fragments is not None:
+            self.view.page().runJavaScript(f"mdScrollToHeading({int(index)});")
+
+    def _load(self, fragments, page_css, base_dir, timer):
+        with timer.stage('page'):
+            page = render.build_preview_page(
+                render.build_live_preview_body(fragments), page_css, live=True
+            )
+        self._fragments = list(fragments)
+        self._page_css = page_css
+        self._base_dir = base_dir
+        self._pending = None
+
+        if self.scheme_handler is not None:
+            page_url = self.scheme_handler.publish(page, base_dir)
+            page_url.setQuery(f"v={int(time.time() * 1000)}")
+            self._start_loading(timer)
+            self.view.setUrl(page_url)
+            return
+
+        try:
+            # Loaded from disk so relative resources resolve next to the note
+            with timer.stage('write'):
+                temp_html_path = render.write_preview_temp_file(page, base_dir)
+        except (IOError, OSError) as e:
+            print(f"Warning: Could not write preview file: {e}")
+            self._loading = False
+            self.view.setHtml(page, QUrl.fromLocalFile(base_dir + os.sep))
+            return
+
+        file_url = QUrl.fromLocalFile(os.path.abspath(temp_html_path))
+        file_url.setQuery(f"v={int(time.time() * 1000)}")
+        self._start_loading(timer)
+        self.view.setUrl(file_url)
+
+    def _start_loading(self, timer):
+        self._loading = True
+        self._load_timing = (timer, time.perf_counter())
+
+    def _patch(self, fragments, page_css, timer):
+        start_time = time.perf_counter()
+        if page_css != self._page_css:
+            self._page_css = page_css
+            self.view.page().runJavaScript(f"mdSetStyle({json.dumps(page_css)});")
+
+        change = diff_fragments(self._fragments, fragments)
+        if change is None:
+            timer.add('view', (time.perf_counter() - start_time) * 1000)
+            self.displayed.emit(timer, 'unchanged')
+            return
+
+        start, delete_count, inserted = change
+        self._fragments = list(fragments)
+        script = f"mdPatchBlocks({start}, {delete_count}, {json.dumps(inserted)});"
+        self.view.page().runJavaScript(
+            script, lambda result: self._on_patch_result(result, timer, start_time)
+        )
+
+    def _on_patch_result(self, result, timer, start_time):
+        # The page went out of sync (navigation, reload); rebuild it
+        if result is not True and self._fragments is not None and not self._loading:
+            self._load(self._fragments, self._page_css, self._base_dir, timer)
+            return
+        timer.add('view', (time.perf_counter() - start_time) * 1000)
+        self.displayed.emit(timer, 'patch')
+
+    def _on_load_finished(self, ok):
+        if not self._loading:
+            return
+        self._loading = False
+        if not ok:
+            self._fragments = None
+            return
+        timer, start_time = self._load_timing
+        timer.add('view', (time.perf_counter() - start_time) * 1000)
+        self.displayed.emit(timer, 'load')
+        if self._pending:
+            fragments, page_css, timer = self._pending
+            self._pending = None
+            self._patch(fragments, page_css, timer)
+
+class RenderWorker(QObject):
+    """
+    Renders preview fragments on a background thread so that slow
+    conversions never block typing in the editor.
+    """
+    finished = pyqtSignal(int, object, str, float)
+    partial = pyqtSignal(int, object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # Set by the scheduler; progressive renders stop once it moves on
+        self.latest_revision = 0
+
+    @pyqtSlot(object)
+    def render(self, job):
+        start = time.perf_counter()
+        result, error = None, ""
+        try:
+            timer = render.RenderTimer(document=job['document_key'], chars=len(job['md_text']))
+            with timer.stage('css'):
+                page_css = render.get_preview_page_css(job['custom_css'])
+            if not job['progressive'] or self._render_progressively(job, page_css):
+                fragments = render.render_preview_fragments(
+                    job['md_text'], base_dir=job['base_dir'], project_root=job['project_root'],
+                    timer=timer
+                )
+                result = (fragments, page_css, job['base_dir'], job['document_key'], timer)
+        except Exception as e:
+            error = str(e)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.finished.emit(job['revision'], result, error, elapsed_ms)
+        if result is not None:
+            self._warm(job)
+
+    def _warm(self, job):
+        """
+        Cache the blocks of a document that was converted in one go, so
+        the next edits render incrementally. Stops as soon as a newer
+        revision is requested; what was cached by then is kept.
+        """
+        try:
+            render.warm_preview_cache(
+                job['md_text'], base_dir=job['base_dir'], project_root=job['project_root'],
+                should_stop=lambda: self.latest_revision != job['revision']
+            )
+        except Exception as e:
+            print(f"Warning: Could not cache preview blocks: {e}")
+
+    def _render_progressively(self, job, page_css):
+        """
+        Emit the document chunk by chunk, the first screen first. Returns
+        False if a newer revision arrived in the meantime.
+        """
+        fragments = []
+        for chunk in render.iter_preview_chunks(
+                job['md_text'], base_dir=job['base_dir'], project_root=job['project_root']):
+            if self.latest_revision != job['revision']:
+                return False
+            fragments.extend(chunk)
+            self.partial.emit(job['revision'], (list(fragments), page_css, job['base_dir'],
+                                                job['document_key'], render.RenderTimer()))
+        return self.latest_revision == job['revision']
+
+class RenderScheduler(QObject):
+    """
+    Coalesces bursts of edits and renders them off the GUI thread.
+
+    Requests are debounced by a delay that follows the recent render time,
+    at most one render runs at a time, and results belonging to an older
+    revision than the latest request are dropped. The last request is
+    rendered again when the thumbnail cache finishes a display-sized copy
+    of one of its images.
+    """
+    rendered = pyqtSignal(object, str, str, object, object)
+    failed = pyqtSignal(str)
+    _submit = pyqtSignal(object)
+    _thumbnail_ready = pyqtSignal()
+
+    MIN_DELAY_MS = 30
+    MAX_DELAY_MS = 500
+    # Freshly opened documents above this size are shown progressively
+    PROGRESSIVE_CHARS = 1024 * 1024
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._revision = 0
+        self._pending = None
+        self._in_flight = None
+        self._document_key = None
+        self._last_request = None
+        self._avg_render_ms = 0.0
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._dispatch)
+
+        self._thread = QThread()
+        self._worker = RenderWorker()
+        self._worker.moveToThread(self._thread)
+        self._submit.connect(self._worker.render)
+        self._worker.partial.connect(self._on_partial)
+        self._worker.finished.connect(self._on_finished)
+        self._thread.start()
+
+        # Called from a thumbnail worker thread; the signal hops to this one
+        self._thumbnail_ready.connect(self.refresh)
+        thumbnail_cache.on_ready = lambda path: self._thumbnail_ready.emit()
+
+    def request(self, md_text, custom_css, base_dir, project_root, document_key=None):
+        """Schedule a render of the given editor state."""
+        self._last_request = (md_text, custom_css, base_dir, project_root, document_key)
+        self._revision += 1
+        self._worker.latest_revision = self._revision
+        opened = document_key != self._document_key
+        self._pending = {
+            'revision': self._revision,
+            'md_text': md_text,
+            'custom_css': custom_css,
+            'base_dir': base_dir,
+            'project_root': project_root,
+            'document_key': document_key,
+            'progressive': opened and len(md_text) > self.PROGRESSIVE_CHARS,
+        }
+        if opened:
+            # A freshly opened document is shown without waiting
+            self._document_key = document_key
+            self._timer.start(0)
+        else:
+            self._timer.start(self.debounce_delay())
+
+    def refresh(self):
+        """Render the last requested state again."""
+        if self._last_request is not None:
+            self.request(*self._last_request)
+
+    def debounce_delay(self):
+        """Wait roughly as long as a render takes, within sensible bounds."""
+        return int(min(self.MAX_DELAY_MS, max(self.MIN_DELAY_MS, self._avg_render_ms)))
+
+    def shutdown(self):
+        thumbnail_cache.on_ready = None
+        self._timer.stop()
+        self._pending = None
+        # Stops a progressive render at its next chunk instead of finishing it
+        self._revision += 1
+        self._worker.latest_revision = self._revision
+        self._thread.quit()
+        self._thread.wait()
+
+    def _dispatch(self):
+        if self._in_flight is not None or self._pending is None:
+            # Picked up again once the running render has finished
+            return
+        job, self._pending = self._pending, None
+        self._in_flight = job
+        self._submit.emit(job)
+
+    def _on_partial(self, revision, result):
+        if revision == self._revision:
+            self.rendered.emit(*result)
+
+    def _on_finished(self, revision, result, error, elapsed_ms):
+        job, self._in_flight = self._in_flight, None
+        # Exponential moving average keeps the debounce responsive to change;
+        # cold progressive loads of huge documents would only skew it
+        if not job['progressive']:
+            if self._avg_render_ms:
+                self._avg_render_ms = 0.7 * self._avg_render_ms + 0.3 * elapsed_ms
+            else:
+                self._avg_render_ms = elapsed_ms
+
+        if revision == self._revision:
+            if error:
+                self.failed.emit(error)
+            else:
+                self.rendered.emit(*result)
+        if self._pending is not None and not self._timer.isActive():
+            self._dispatch()
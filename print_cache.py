@@ -0,0 +1,164 @@
+# print_cache.py
+
+import hashlib
+import os
+import re
+import threading
+
+import render
+
+PRINT_CACHE_DIR = os.path.join("cache", "print")
+_SVG_ASSET_RE = re.compile(r'([0-9a-f]{40})\.svg')
+
+class PrintCache:
+    """
+    Directory of print-ready HTML pages keyed by the note's content and the
+    print stylesheet, so printing an unchanged note reuses its page.
+
+    Pages are named after a hash of (markdown, print CSS, note path,
+    project root); the paths are part of the key because images resolve
+    against them. Each hit touches the file's mtime and the least recently
+    used pages are removed once the directory grows past max_bytes.
+
+    Inline SVGs are written once per distinct diagram into an svg/ folder
+    beside the pages; they count towards max_bytes and are removed when no
+    remaining page refers to them.
+    """
+
+    def __init__(self, cache_dir=PRINT_CACHE_DIR, max_bytes=200 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.svg_dir = os.path.join(cache_dir, "svg")
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(md_text, print_css, source_file_path=None, project_root=None):
+        md_hash = hashlib.sha1(md_text.encode('utf-8')).hexdigest()
+        css_hash = hashlib.sha1(print_css.encode('utf-8')).hexdigest()
+        location = f"{os.path.abspath(source_file_path) if source_file_path else ''}\n{project_root or ''}"
+        return hashlib.sha1(f"{md_hash}\n{css_hash}\n{location}".encode('utf-8')).hexdigest()
+
+    def path_for(self, key):
+        return os.path.abspath(os.path.join(self.cache_dir, f"{key}.html"))
+
+    def get(self, key):
+        """Return the cached page path for key, or None."""
+        path = self.path_for(key)
+        try:
+            # Mark as recently used for eviction
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return path
+
+    def put(self, key, html_content, volatile=False):
+        """
+        Store a page and return its path. Volatile pages (ones that refer to
+        missing images) get a separate name that get() never returns, so
+        they are rebuilt on the next print.
+        """
+        path = self.path_for(key)
+        if volatile:
+            path = path[:-len(".html")] + ".volatile.html"
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(html_content)
+        os.replace(temp_path, path)
+        self.evict(keep=path)
+        return path
+
+    def get_or_render(self, md_text, print_css="", source_file_path=None, project_root=None):
+        """
+        Return (path, reused): the print page of a note, rendered with
+        markdown_to_html_for_browser_print only when no cached page matches.
+        """
+        key = self.make_key(md_text, print_css, source_file_path, project_root)
+        path = self.get(key)
+        if path:
+            return path, True
+        render_info = {}
+        html_content = render.markdown_to_html_for_browser_print(
+            md_text, print_css, source_file_path, project_root, render_info=render_info,
+            svg_asset_dir=self.svg_dir)
+        return self.put(key, html_content, render_info.get('volatile', True)), False
+
+    @staticmethod
+    def _scan(directory, suffix):
+        """Return [(mtime, size, path)] of the files in directory ending in suffix."""
+        entries = []
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    if entry.is_file() and entry.name.endswith(suffix):
+                        st = entry.stat()
+                        entries.append((st.st_mtime, st.st_size, entry.path))
+        except OSError:
+            pass
+        return entries
+
+    def evict(self, keep=None):
+        """Remove least recently used pages until the cache fits in max_bytes."""
+        with self._lock:
+            pages = self._scan(self.cache_dir, '.html')
+            svgs = self._scan(self.svg_dir, '.svg')
+            total = sum(size for _, size, _ in pages) + sum(size for _, size, _ in svgs)
+            if total <= self.max_bytes:
+                return
+            remaining = []
+            for mtime, size, path in sorted(pages):
+                if total <= self.max_bytes or (keep and os.path.abspath(path) == keep):
+                    remaining.append(path)
+                    continue
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError as e:
+                    print(f"Warning: Could not remove cached print page {path}: {e}")
+                    remaining.append(path)
+            self._remove_unused_svgs(svgs, remaining)
+
+    def _remove_unused_svgs(self, svgs, pages):
+        used = set()
+        for path in pages:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    used.update(_SVG_ASSET_RE.findall(f.read()))
+            except (IOError, OSError, UnicodeDecodeError):
+                # Keep everything rather than break a page we could not read
+                return
+        for _, _, path in svgs:
+            if os.path.basename(path)[:-len('.svg')] not in used:
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    print(f"Warning: Could not remove cached SVG {path}: {e}")
+
+    def stats(self):
+        """Return a snapshot of the cache counters."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+            }
+
+    def clear(self):
+        """Remove every cached page."""
+        max_bytes, self.max_bytes = self.max_bytes, -1
+        try:
+            self.evict()
+        finally:
+            self.max_bytes = max_bytes
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+print_cache = PrintCache()
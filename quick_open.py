@@ -0,0 +1,575 @@
+# quick_open.py
+
+import bisect
+import heapq
+import json
+import os
+import re
+import threading
+
+from PyQt5.QtCore import Qt, pyqtSignal
+from PyQt5.QtWidgets import QDialog, QLineEdit, QListWidget, QListWidgetItem, QVBoxLayout
+
+RECENT_FILE_NAME = ".recent_files.json"
+MAX_RESULTS = 50
+MAX_RECENT = 20
+# Matches scored per rank; past this a rank keeps the first ones in index order
+MAX_CANDIDATES = 1000
+# About how many bytes a regex scans in the time one name is checked on its own
+CHECK_BYTES = 200
+
+class PathIndex:
+    """
+    In-memory list of every .md file under root_path for Quick Open.
+
+    Paths are split into folder and file name, and each distinct folder
+    and name is stored once, lowercased with '/' separators, as a line of
+    a _Lines buffer that maps back to the files using it. A large tree has
+    few folders and many repeated names, so literal matches are found with
+    bytes.find and fuzzy ones with a regex over a few MB at most, both in
+    C; a bitmap per byte (_ByteSets) skips the names missing one of the
+    query's. At most MAX_CANDIDATES matches per rank are scored, so the
+    work per search is bounded and the results depend only on the index.
+
+    Removed files leave a hole (None in _paths) until the next build(),
+    so line numbers stay valid. build() walks the tree (start_build()
+    runs it in the background); add/remove/rename keep the index current
+    after changes made in the app, including during a build, which
+    replays them onto what it found.
+    """
+
+    def __init__(self, root_path):
+        self.root_path = os.path.abspath(root_path)
+        self.ready = False
+        self._lock = threading.Lock()
+        self._build_thread = None
+        # ("add", relative paths) and ("remove", relative path) made during build()
+        self._changes = None
+        self._set_paths([])
+
+    def _set_paths(self, paths):
+        self._paths = []
+        self._file_names = []
+        # Every byte used in a name or folder; queries with others match nothing
+        self._bytes = set()
+        self._names, self._name_ids, self._name_files = _Lines(), {}, []
+        self._folders, self._folder_ids, self._folder_files = _Lines(), {}, []
+        self._file_folders = []
+        # The names of each folder's files, as lines in _folder_files order
+        self._folder_listings = []
+        # Which names hold each byte, to pass over the others before fuzzy matching
+        self._name_bytes = _ByteSets()
+        self._forget_matches()
+        for path in paths:
+            self._append(path)
+
+    def _forget_matches(self):
+        # Fuzzy work kept for the next, usually longer, query; see search()
+        self._folder_reach = None
+
+    def _append(self, relative):
+        self._forget_matches()
+        lowered = relative.lower().replace(os.sep, "/")
+        self._bytes.update(lowered.encode('utf-8'))
+        folder, sep, name = lowered.rpartition("/")
+        name = name.encode('utf-8')
+        name_id = _intern(name, self._names, self._name_ids, self._name_files)
+        folder_id = _intern((folder + sep).encode('utf-8'), self._folders, self._folder_ids, self._folder_files)
+        if not self._name_files[name_id]:
+            self._name_bytes.add(name_id, name)
+        line = len(self._paths)
+        self._paths.append(relative)
+        self._file_names.append(name_id)
+        self._file_folders.append(folder_id)
+        self._name_files[name_id].append(line)
+        self._folder_files[folder_id].append(line)
+        if folder_id == len(self._folder_listings):
+            self._folder_listings.append(bytearray())
+        self._folder_listings[folder_id] += name + b"\n"
+
+    def build(self):
+        """Replace the index with the .md files found on disk."""
+        with self._lock:
+            self._changes = []
+        paths = []
+        for root, _, files in os.walk(self.root_path):
+            for filename in files:
+                if filename.endswith(".md"):
+                    paths.append(os.path.relpath(os.path.join(root, filename), self.root_path))
+        paths.sort()
+        fresh = PathIndex.__new__(PathIndex)
+        fresh._set_paths(paths)
+        with self._lock:
+            # The walk may have missed changes made since it started
+            fresh._replay(self._changes)
+            # Only the tables _set_paths() filled in
+            self.__dict__.update(vars(fresh))
+            self._changes = None
+        self.ready = True
+
+    def _replay(self, changes):
+        """Apply changes recorded during build(), skipping files already listed."""
+        live = set(self._paths)
+        for kind, value in changes:
+            if kind == "add":
+                for relative in value:
+                    if relative not in live:
+                        live.add(relative)
+                        self._append(relative)
+            else:
+                live.difference_update(self._remove(value))
+
+    def start_build(self):
+        """Run build() on a background thread unless one is already running."""
+        if self._build_thread and self._build_thread.is_alive():
+            return
+        self._build_thread = threading.Thread(target=self._run_build, name="path-index-build", daemon=True)
+        self._build_thread.start()
+
+    def _run_build(self):
+        try:
+            self.build()
+        except OSError as e:
+            with self._lock:
+                self._changes = None
+            print(f"Warning: Quick Open index could not be built: {e}")
+
+    def _relative(self, path):
+        return os.path.relpath(os.path.abspath(path), self.root_path)
+
+    def add_path(self, path):
+        """Add a new .md file, or every .md file under a new or moved folder."""
+        path = os.path.abspath(path)
+        if os.path.isdir(path):
+            added = [self._relative(os.path.join(root, filename))
+                     for root, _, files in os.walk(path) for filename in files if filename.endswith(".md")]
+        elif path.endswith(".md") and os.path.isfile(path):
+            added = [self._relative(path)]
+        else:
+            return
+        with self._lock:
+            for relative in added:
+                self._append(relative)
+            if self._changes is not None:
+                self._changes.append(("add", added))
+
+    def remove_path(self, path):
+        """Drop a deleted file, or everything under a deleted folder."""
+        relative = self._relative(path)
+        with self._lock:
+            self._remove(relative)
+            if self._changes is not None:
+                self._changes.append(("remove", relative))
+
+    def _remove(self, relative):
+        """Leave holes for relative and the paths under it, returning those paths."""
+        prefix = relative + os.sep
+        removed = []
+        for line, known in enumerate(self._paths):
+            if known is not None and (known == relative or known.startswith(prefix)):
+                self._paths[line] = None
+                removed.append(known)
+        return removed
+
+    def rename_path(self, old_path, new_path):
+        """Follow a rename or move of a file or folder."""
+        self.remove_path(old_path)
+        self.add_path(new_path)
+
+    def search(self, query, limit=MAX_RESULTS):
+        """
+        Return up to limit absolute paths matching query, best first.
+        Paths are ranked by how the query (without spaces) matches:
+
+        1. file name starts with it
+        2. file name contains it
+        3. path contains it
+        4. its characters appear in order in the file name
+        5. its characters appear in order in the path
+
+        Rank 4 puts names with the query's characters closer together
+        first, and rank 5 paths whose folder holds more of the query; then
+        shorter paths come first, and ties go by path. Each rank scores its
+        first MAX_CANDIDATES matches in index order and keeps the best with
+        a heap; ranks 4 and 5 are only looked for while fewer than limit
+        paths were found. How much of the query each folder holds is kept
+        for the next query: when it extends this one, as it does while
+        typing, that carries on from there instead of starting over.
+        """
+        needle = "".join(query.lower().split()).replace("\\", "/").encode('utf-8')
+        if not needle:
+            return []
+        wanted = MAX_CANDIDATES
+        # (score, length, path) for each match, so the order is total
+        ranks = [[] for _ in range(5)]
+        seen = set()
+
+        with self._lock:
+            if not self._bytes.issuperset(needle):
+                return []
+            paths, names, folders = self._paths, self._names, self._folders
+
+            def collect(rank, lines, score=0):
+                """Add the live, not yet ranked lines; True once the rank is full."""
+                for line in lines:
+                    if paths[line] is not None and line not in seen:
+                        seen.add(line)
+                        ranks[rank].append((score, len(paths[line]), paths[line]))
+                return len(ranks[rank]) >= wanted
+
+            for name_id in names.find_all(needle):
+                collect(0 if names.line(name_id).startswith(needle) else 1, self._name_files[name_id])
+                if len(ranks[0]) >= wanted or len(ranks[1]) >= wanted:
+                    break
+            if len(ranks[1]) >= wanted:
+                # Stopped early, so names starting with needle may be further on
+                for name_id in names.find_all(needle, at_start=True):
+                    if collect(0, self._name_files[name_id]):
+                        break
+            for folder_id in folders.find_all(needle):
+                if collect(2, self._folder_files[folder_id]):
+                    break
+            # Across the folder/name boundary a match splits just after a '/'
+            for split in range(1, len(needle)):
+                if needle[split - 1] != ord("/"):
+                    continue
+                head, rest = needle[:split], needle[split:]
+                for folder_id in folders.find_all(head + b"\n"):
+                    collect(2, [line for line in self._folder_files[folder_id]
+                                if names.line(self._file_names[line]).startswith(rest)])
+
+            if sum(len(found) for found in ranks) >= limit:
+                # Kept current while it is cheap, from the first character
+                # typed, for when exact matches run out
+                previous = self._folder_reach and self._folder_reach[0]
+                if len(needle) == 1 or previous and needle.startswith(previous):
+                    self._folder_reach_of(needle)
+            else:
+                if b"/" not in needle:
+                    self._fuzzy_names(needle, collect)
+                reach = self._folder_reach_of(needle)
+                if sum(len(found) for found in ranks) < limit:
+                    self._fuzzy_paths(needle, reach, collect, lambda: sum(len(found) for found in ranks) >= limit)
+
+        results = []
+        for found in ranks:
+            results.extend(relative for _, _, relative in heapq.nsmallest(limit - len(results), found))
+            if len(results) >= limit:
+                break
+        return [os.path.join(self.root_path, relative) for relative in results]
+
+    def _fuzzy_names(self, needle, collect):
+        """
+        Rank 4: file names containing needle's characters in order. The
+        names holding all of needle's bytes are checked one by one, or when
+        that is slower, the regex goes through all names.
+        """
+        pattern = _fuzzy_pattern(needle)
+        names = self._names
+        holding = self._name_bytes.holding(needle)
+        if holding.count("1") * CHECK_BYTES < len(names.data):
+            for name_id in _marked(holding):
+                match = pattern.search(names.data, names.starts[name_id], names.starts[name_id + 1])
+                if match and collect(3, self._name_files[name_id], match.end() - match.start()):
+                    return
+            return
+        previous = None
+        for match in pattern.finditer(names.data):
+            name_id = names.line_of(match.start())
+            if name_id != previous:
+                previous = name_id
+                if collect(3, self._name_files[name_id], match.end() - match.start()):
+                    return
+
+    def _folder_reach_of(self, needle):
+        """
+        How much of needle, in order, each folder holds, as (whole, ends,
+        partial): whole lists the folders holding all of it and ends where
+        in each that match ends; partial is (count, folders) for the others
+        holding needle[0], most first. Plain lists of ints, so tracking
+        every folder costs no objects.
+        """
+        folders = self._folders
+        previous, whole, ends, partial = self._folder_reach or (b"", [], [], [])
+        if previous and needle.startswith(previous):
+            # Only folders holding all of previous can hold more
+            still_whole, still_ends, stopped = [], [], {}
+            for folder_id, position in zip(whole, ends):
+                count, line_end = len(previous), folders.starts[folder_id + 1] - 1
+                while count < len(needle):
+                    found = folders.data.find(needle[count:count + 1], position, line_end)
+                    if found == -1:
+                        break
+                    count, position = count + 1, found + 1
+                if count == len(needle):
+                    still_whole.append(folder_id)
+                    still_ends.append(position)
+                else:
+                    stopped.setdefault(count, []).append(folder_id)
+            partial = sorted(stopped.items(), reverse=True) + partial
+            self._folder_reach = (needle, still_whole, still_ends, partial)
+            return still_whole, still_ends, partial
+
+        # Group i matches needle[i]; lastindex is how much a folder holds
+        first = re.escape(needle[:1])
+        taken = re.compile(b"(?m)^[^" + first + b"\\n]*" + first + b"".join(
+            b"(?:[^" + re.escape(needle[i:i + 1]) + b"\\n]*(" + re.escape(needle[i:i + 1]) + b")"
+            for i in range(1, len(needle))) + b")?" * (len(needle) - 1))
+        whole, ends, stopped = [], [], {}
+        for match in taken.finditer(folders.data):
+            count, folder_id = (match.lastindex or 0) + 1, folders.line_of(match.start())
+            if count == len(needle):
+                whole.append(folder_id)
+                ends.append(match.end())
+            else:
+                stopped.setdefault(count, []).append(folder_id)
+        partial = sorted(stopped.items(), reverse=True)
+        self._folder_reach = (needle, whole, ends, partial)
+        return whole, ends, partial
+
+    def _fuzzy_paths(self, needle, reach, collect, enough):
+        """
+        Rank 5: paths containing needle's characters in order. Matching
+        each character at its first chance is never worse, so a folder
+        takes as much of needle as it can and the file name must hold
+        the rest. Folders taking the most (see _folder_reach_of) are tried
+        first and score best, so once enough() paths are ranked the groups
+        after it cannot change the results. For each group, either the
+        names holding the rest's bytes or the folders' files are gone
+        through, whichever are fewer.
+        """
+        whole, _, partial = reach
+        for folder_id in whole:
+            if collect(4, self._folder_files[folder_id]):
+                return
+        if enough():
+            return
+        for count, folder_ids in partial:
+            rest = needle[count:]
+            pattern = _fuzzy_pattern(rest)
+            holding = self._name_bytes.holding(rest)
+            listed = sum(len(self._folder_listings[folder_id]) for folder_id in folder_ids)
+            if holding.count("1") * CHECK_BYTES < listed:
+                full = self._match_names(folder_ids, pattern, holding, collect, len(rest))
+            else:
+                full = self._match_listings(folder_ids, pattern, collect, len(rest))
+            if full or enough():
+                return
+
+    def _match_names(self, folder_ids, pattern, holding, collect, score):
+        """Collect the files in folder_ids of the names marked in holding that match pattern."""
+        names, name_files, file_folders = self._names, self._name_files, self._file_folders
+        group = set(folder_ids)
+        for name_id in _marked(holding):
+            lines = [line for line in name_files[name_id] if file_folders[line] in group]
+            if lines and pattern.search(names.data, names.starts[name_id], names.starts[name_id + 1]):
+                if collect(4, lines, score):
+                    return True
+        return False
+
+    def _match_listings(self, folder_ids, pattern, collect, score):
+        """Collect the files in folder_ids whose names match pattern, a folder at a time."""
+        for folder_id in folder_ids:
+            files, listing = self._folder_files[folder_id], self._folder_listings[folder_id]
+            lines, index, counted_to = [], 0, 0
+            for match in pattern.finditer(listing):
+                index += listing.count(b"\n", counted_to, match.start())
+                counted_to = match.start()
+                if not lines or lines[-1] != files[index]:
+                    lines.append(files[index])
+            if collect(4, lines, score):
+                return True
+        return False
+
+class _Lines:
+    """Newline-terminated lines in one growing buffer, with their start offsets."""
+
+    def __init__(self):
+        self.data = bytearray()
+        self.starts = [0]
+
+    def append(self, line):
+        """Append a line, returning its number."""
+        self.data += line + b"\n"
+        self.starts.append(len(self.data))
+        return len(self.starts) - 2
+
+    def line(self, number):
+        return self.data[self.starts[number]:self.starts[number + 1] - 1]
+
+    def line_of(self, position):
+        return bisect.bisect_right(self.starts, position) - 1
+
+    def find_all(self, needle, at_start=False):
+        """Yield the numbers of the lines containing needle (or starting with it)."""
+        data = self.data
+        if at_start:
+            if data.startswith(needle):
+                yield 0
+            # Searched with the preceding newline, so other lines are skipped in C
+            needle = b"\n" + needle
+        position = data.find(needle)
+        while position != -1:
+            line = self.line_of(position + at_start)
+            yield line
+            position = data.find(needle, self.starts[line + 1] - at_start)
+
+class _ByteSets:
+    """For each byte, a bitmap of the numbered lines holding it."""
+
+    def __init__(self):
+        self.bitmaps = {}
+
+    def add(self, number, line):
+        index, bit = divmod(number, 8)
+        for byte in set(line):
+            bitmap = self.bitmaps.setdefault(byte, bytearray())
+            if len(bitmap) <= index:
+                bitmap.extend(bytes(index + 1 - len(bitmap)))
+            bitmap[index] |= 1 << bit
+
+    def holding(self, needle):
+        """A str whose character n is "1" if line n holds every byte of needle ("0" or past the end if not)."""
+        common = -1
+        for byte in set(needle):
+            if byte not in self.bitmaps:
+                return ""
+            # Big ints AND whole bitmaps at once
+            common &= int.from_bytes(self.bitmaps[byte], 'little')
+        return bin(common)[:1:-1]
+
+def _marked(holding):
+    """Yield the line numbers marked "1" in a _ByteSets.holding() result, in order."""
+    number = holding.find("1")
+    while number != -1:
+        yield number
+        number = holding.find("1", number + 1)
+
+def _intern(key, lines, ids, files):
+    """The line number of key in lines, appending it (with no files yet) if new."""
+    line = ids.get(key)
+    if line is None:
+        line = ids[key] = lines.append(key)
+        files.append([])
+    return line
+
+def _fuzzy_pattern(needle):
+    """A pattern matching needle's bytes in order within one line."""
+    # Each byte is matched at its first occurrence after the previous one
+    return re.compile(re.escape(needle[:1]) + b"".join(
+        b"[^" + re.escape(needle[i:i + 1]) + b"\\n]*" + re.escape(needle[i:i + 1])
+        for i in range(1, len(needle))))
+
+class RecentFiles:
+    """Most recently opened notes, newest first, kept in a JSON file (by default inside the docs root)."""
+
+    def __init__(self, root_path, file_path=None):
+        self.file_path = file_path or os.path.join(os.path.abspath(root_path), RECENT_FILE_NAME)
+        self.paths = []
+        try:
+            with open(self.file_path, 'r', encoding='utf-8') as f:
+                self.paths = [p for p in json.load(f) if isinstance(p, str)][:MAX_RECENT]
+        except (OSError, ValueError):
+            pass
+
+    def add(self, path):
+        path = os.path.abspath(path)
+        self.paths = [path] + [p for p in self.paths if p != path][:MAX_RECENT - 1]
+        self._save()
+
+    def rename(self, old_path, new_path):
+        """Follow a renamed or moved file, or every recent file under a moved folder."""
+        old_path, new_path = os.path.abspath(old_path), os.path.abspath(new_path)
+        renamed = []
+        for path in self.paths:
+            if path == old_path or path.startswith(old_path + os.sep):
+                path = new_path + path[len(old_path):]
+            renamed.append(path)
+        self.paths = renamed
+        self._save()
+
+    def existing(self):
+        return [path for path in self.paths if os.path.isfile(path)]
+
+    def _save(self):
+        try:
+            with open(self.file_path, 'w', encoding='utf-8') as f:
+                json.dump(self.paths, f, indent=1)
+        except OSError as e:
+            print(f"Warning: Could not save recent files: {e}")
+
+class QuickOpenDialog(QDialog):
+    """
+    Ctrl+P palette: type to fuzzy-find a note by path, Enter to open it.
+    With an empty query it lists the recently opened notes. Emits
+    file_selected(path).
+    """
+    file_selected = pyqtSignal(str)
+
+    def __init__(self, path_index, recent_files, parent=None):
+        super().__init__(parent)
+        self.path_index = path_index
+        self.recent_files = recent_files
+        self.setWindowTitle("Quick Open")
+        self.resize(600, 400)
+
+        layout = QVBoxLayout(self)
+        self.query_input = QLineEdit()
+        self.query_input.setPlaceholderText("Go to note...")
+        self.query_input.textChanged.connect(self.update_results)
+        self.query_input.returnPressed.connect(self._open_current)
+        self.query_input.installEventFilter(self)
+        layout.addWidget(self.query_input)
+
+        self.results_list = QListWidget()
+        self.results_list.itemActivated.connect(self._open_item)
+        layout.addWidget(self.results_list)
+
+    def show_palette(self):
+        self.query_input.clear()
+        self.update_results()
+        self.show()
+        self.raise_()
+        self.activateWindow()
+        self.query_input.setFocus()
+
+    def update_results(self):
+        query = self.query_input.text()
+        if query.strip():
+            paths = self.path_index.search(query)
+            if not paths and not self.path_index.ready:
+                self.results_list.clear()
+                self.results_list.addItem("Indexing notes...")
+                return
+        else:
+            paths = self.recent_files.existing()
+
+        self.results_list.clear()
+        for path in paths:
+            relative = os.path.relpath(path, self.path_index.root_path)
+            item = QListWidgetItem(f"{os.path.basename(path)}    {os.path.dirname(relative)}")
+            item.setData(Qt.UserRole, path)
+            item.setToolTip(path)
+            self.results_list.addItem(item)
+        if self.results_list.count():
+            self.results_list.setCurrentRow(0)
+
+    def eventFilter(self, obj, event):
+        # Up/Down move through the results while typing
+        if obj is self.query_input and event.type() == event.KeyPress and event.key() in (Qt.Key_Up, Qt.Key_Down):
+            row = self.results_list.currentRow() + (1 if event.key() == Qt.Key_Down else -1)
+            if 0 <= row < self.results_list.count():
+                self.results_list.setCurrentRow(row)
+            return True
+        return super().eventFilter(obj, event)
+
+    def _open_current(self):
+        item = self.results_list.currentItem()
+        if item:
+            self._open_item(item)
+
+    def _open_item(self, item):
+        path = item.data(Qt.UserRole)
+        if path:
+            self.hide()
+            self.file_selected.emit(path)
@@ -1,152 +1,995 @@
 # render.py
 
 import markdown
+import bisect
+import json
+import logging
+import logging.handlers
 import os
 import sys
 import re
-import uuid
 import html
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from functools import lru_cache
+
+from markdown.extensions.fenced_code import FencedBlockPreprocessor
+
+import highlight_cache
+from resource_extension import image_resolver
+from style_cache import style_cache
+
+# Highlighted code blocks are looked up by content before running pygments.
+# The cached fenced_code comes after 'extra', which loads the stock one.
+PREVIEW_EXTENSIONS = (
+    'tables', 'sane_lists', highlight_cache.CODEHILITE,
+    'toc', 'extra', highlight_cache.FENCED_CODE, 'attr_list'
+)
+PRINT_EXTENSIONS = (
+    'extra', highlight_cache.CODEHILITE, 'toc', 'tables', highlight_cache.FENCED_CODE, 'attr_list'
+)
+EXTENSION_CONFIGS = {
+    highlight_cache.CODEHILITE: {'css_class': 'highlight', 'use_pygments': True}
+}
+
+class MarkdownConverterCache:
+    """
+    Pool of configured markdown.Markdown instances keyed by extension setup.
+
+    Building a converter imports and registers every extension, so instances
+    are kept around and reset between documents instead. A converter is only
+    ever handed to one caller at a time; concurrent callers (e.g. worker
+    threads) get their own instance for the same key.
+    """
+
+    def __init__(self, max_idle_per_key=4):
+        self.max_idle_per_key = max_idle_per_key
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(extensions, extension_configs=None, output_format='html5'):
+        """Build a hashable key from the extension list and its configs."""
+        configs = extension_configs or {}
+        config_key = repr(sorted(
+            (name, sorted(options.items())) for name, options in configs.items()
+        ))
+        return (tuple(extensions), config_key, output_format)
+
+    @contextmanager
+    def converter(self, extensions, extension_configs=None, output_format='html5'):
+        """Check out a reset converter for the duration of a with-block."""
+        key = self.make_key(extensions, extension_configs, output_format)
+        with self._lock:
+            idle = self._idle.get(key)
+            md = idle.pop() if idle else None
+
+        if md is None:
+            md = self.build(extensions, extension_configs, output_format)
+
+        try:
+            yield md
+        finally:
+            md.reset()
+            with self._lock:
+                idle = self._idle.setdefault(key, [])
+                if len(idle) < self.max_idle_per_key:
+                    idle.append(md)
+
+    @staticmethod
+    def build(extensions, extension_configs=None, output_format='html5'):
+        """Create a new converter, outside the pool."""
+        return markdown.Markdown(
+            extensions=list(extensions),
+            extension_configs=extension_configs or {},
+            output_format=output_format
+        )
+
+    def clear(self):
+        """Drop all pooled converters."""
+        with self._lock:
+            self._idle.clear()
+
+_converter_cache = MarkdownConverterCache()
+
+_FENCED_BLOCK_RE = FencedBlockPreprocessor.FENCED_BLOCK_RE
+_FENCE_MARKERS = ('```', '~~~')
+_BLANK_RUN_RE = re.compile(r'\n{2,}')
+_WHITESPACE_LINE_RE = re.compile(r'\n +(?=\n)')
+_LIST_ITEM_RE = re.compile(r'^ {0,3}(?:[*+-]|\d+\.) +', re.MULTILINE)
+_BLOCKQUOTE_RE = re.compile(r'^ {0,3}>', re.MULTILINE)
+_DEFLIST_RE = re.compile(r'^:', re.MULTILINE)
+_DEFINITION_RE = re.compile(r'^(?: {0,3}\[[^\]]*\]|\*\[[^\]]*\] ?):', re.MULTILINE)
+_HTML_LINE_RE = re.compile(r'^<', re.MULTILINE)
+_HTML_BLOCK_START_RE = re.compile(r'^<(?:(?P<comment>!--)|(?P<tag>[a-zA-Z][a-zA-Z0-9-]*))')
+_RAW_BLOCK_TAG_RE = re.compile(
+    r'</?(?:%s)(?![\w-])' % '|'.join(markdown.util.BLOCK_LEVEL_ELEMENTS), re.IGNORECASE
+)
+_MARKDOWN_ATTRIBUTE_RE = re.compile(r'<[a-zA-Z][^>]*\smarkdown\s*=', re.IGNORECASE)
+_TAG_START_RE = re.compile(r'</?[a-zA-Z!?]')
+_ELEMENT_ID_RE = re.compile(r'\sid="([^"]*)"')
+
+def _normalize_whitespace(md_text):
+    """Apply the same whitespace normalisation Python-Markdown does first."""
+    text = md_text.replace(markdown.util.STX, "").replace(markdown.util.ETX, "")
+    text = text.replace("\r\n", "\n").replace("\r", "\n") + "\n\n"
+    text = text.expandtabs(4)
+    # Same as Python-Markdown's (?<=\n) +\n, without a look-behind at every position
+    return _WHITESPACE_LINE_RE.sub('\n', text)
+
+def _strip_fenced_code(chunk):
+    """Remove fenced code so its lines are not mistaken for structure."""
+    if '```' in chunk or '~~~' in chunk:
+        return _FENCED_BLOCK_RE.sub('', chunk)
+    return chunk
+
+def _open_html_tag(line):
+    """Return the raw HTML element a line opens, or None for markdown lines."""
+    match = _HTML_BLOCK_START_RE.match(line)
+    if not match:
+        return None
+    if match.group('comment'):
+        return '!--'
+    tag = match.group('tag').lower()
+    if tag not in markdown.util.BLOCK_LEVEL_ELEMENTS or tag == 'hr':
+        return None
+    return tag
+
+def _html_is_closed(tag, text):
+    """Check whether every opened `tag` element in text has been closed."""
+    text = text.lower()
+    if tag == '!--':
+        return text.count('-->') >= text.count('<!--')
+    opened = len(re.findall(r'<%s[\s>/]' % re.escape(tag), text + ' '))
+    return text.count('</%s>' % tag) >= opened or text.rstrip().endswith('/>')
+
+def _scan_html(text, tag=None, html_text=''):
+    """
+    Track raw HTML elements across the lines of text.
+
+    Returns the element still open at the end (or None) and the HTML seen
+    since it was opened, so scanning can resume with the next chunk.
+    """
+    for line in text.split('\n'):
+        if tag is None:
+            tag = _open_html_tag(line)
+            html_text = ''
+            if tag is None:
+                continue
+        html_text = f"{html_text}\n{line}" if html_text else line
+        if _html_is_closed(tag, html_text):
+            tag = None
+    return tag, html_text
+
+def _has_raw_html(block):
+    """
+    Check whether a block holds HTML that Python-Markdown places using the
+    rest of the document: raw block-level tags, a comment or tag left open
+    or a markdown= attribute. Fenced code doesn't count.
+    """
+    if '<' not in block:
+        return False
+    text = _strip_fenced_code(block)
+    comment = text.rfind('<!--')
+    if comment != -1 and text.find('-->', comment + 4) == -1:
+        return True
+    last_tag = text.rfind('<')
+    if last_tag != -1 and _TAG_START_RE.match(text, last_tag) and text.find('>', last_tag) == -1:
+        return True
+    return bool(_RAW_BLOCK_TAG_RE.search(text) or _MARKDOWN_ATTRIBUTE_RE.search(text))
+
+@lru_cache(maxsize=65536)
+def _chunk_info(chunk):
+    """
+    Classify a blank-line separated chunk of normalised markdown.
+
+    Returns (lead, flags, html_state): how the chunk's first line can join
+    the block before it, which joinable structures the chunk contains, and
+    the raw HTML element left open at its end.
+    """
+    lead = (
+        not chunk.startswith(' '),
+        bool(_LIST_ITEM_RE.match(chunk)),
+        bool(_BLOCKQUOTE_RE.match(chunk)),
+        bool(_DEFINITION_RE.match(chunk)),
+        bool(_DEFLIST_RE.search(chunk)),
+    )
+    unfenced = _strip_fenced_code(chunk)
+    flags = (
+        bool(_LIST_ITEM_RE.search(unfenced)),
+        bool(_BLOCKQUOTE_RE.search(unfenced)),
+        bool(_DEFLIST_RE.search(unfenced)),
+    )
+    html_state = _scan_html(unfenced) if _HTML_LINE_RE.search(unfenced) else (None, '')
+    return lead, flags, html_state
+
+def _find_fence(text, start, end):
+    """Return the first fenced code block opening in text[start:end], or None."""
+    while True:
+        found = [index for index in (text.find(marker, start, end) for marker in _FENCE_MARKERS)
+                 if index != -1]
+        if not found:
+            return None
+        index = min(found)
+        if index == 0 or text[index - 1] == '\n':
+            match = _FENCED_BLOCK_RE.match(text, index)
+            if match:
+                return match
+        start = index + 1
+
+def _iter_chunks(text, position=0):
+    """
+    Yield (start, chunk) for the blank-line separated chunks of text from
+    position on. Blank lines inside fenced code never separate chunks.
+    """
+    start = scanned = fence_end = position
+    for run in _BLANK_RUN_RE.finditer(text, position):
+        if run.start() < fence_end:
+            continue
+        fence = _find_fence(text, scanned, run.start())
+        while fence is not None:
+            fence_end = scanned = fence.end()
+            if fence_end > run.start():
+                break
+            fence = _find_fence(text, scanned, run.start())
+        if run.start() < fence_end:
+            continue
+        yield start, text[start:run.start()]
+        start = scanned = run.end()
+    if start < len(text):
+        yield start, text[start:]
+
+def _iter_blocks(text, position=0):
+    """
+    Yield (start, block) for the top-level blocks of normalised text, from
+    position (the start of a block) on.
+
+    Text is cut at blank lines, except where Python-Markdown would join the
+    pieces back together: fenced code, indented continuations, adjacent
+    lists or blockquotes, definition lists, open raw HTML and
+    link/abbreviation definitions (which vanish from the output and let the
+    following block attach to the one before them). Blocks are produced
+    lazily, so a caller can stop once the rest is known.
+    """
+    block_start = block_end = None
+    has_list = has_quote = has_deflist = False
+    html_tag, html_text = None, ''
+
+    for start, chunk in _iter_chunks(text, position):
+        lead, flags, html_state = _chunk_info(chunk)
+
+        if html_tag is not None:
+            html_tag, html_text = _scan_html(_strip_fenced_code(chunk), html_tag, html_text)
+        else:
+            if block_start is not None:
+                starts_flush, lead_list, lead_quote, lead_definition, lead_deflist = lead
+                joins = ((has_list and lead_list) or (has_quote and lead_quote)
+                         or (has_deflist and lead_deflist) or lead_definition)
+                if starts_flush and not joins:
+                    yield block_start, text[block_start:block_end].rstrip('\n')
+                    block_start = None
+                    has_list = has_quote = has_deflist = False
+            html_tag, html_text = html_state
+
+        if block_start is None:
+            block_start = start
+        block_end = start + len(chunk)
+        has_list = has_list or flags[0]
+        has_quote = has_quote or flags[1]
+        has_deflist = has_deflist or flags[2]
+
+    if block_start is not None:
+        yield block_start, text[block_start:block_end].rstrip('\n')
+
+def split_markdown_blocks(md_text):
+    """
+    Split markdown source into top-level blocks that render independently.
+
+    See _iter_blocks for where the normalised source is cut. Chunk
+    classification is cached, so re-splitting an edited document only
+    inspects changed chunks.
+    """
+    text = _normalize_whitespace(md_text).lstrip('\n')
+    return [block for _, block in _iter_blocks(text)]
+
+def _common_prefix_length(a, b, step=4096):
+    """Length of the common prefix of two strings, compared a slice at a time."""
+    limit = min(len(a), len(b))
+    length = 0
+    while length + step <= limit and a[length:length + step] == b[length:length + step]:
+        length += step
+    high = min(length + step, limit)
+    while length < high:
+        middle = (length + high + 1) // 2
+        if a[length:middle] == b[length:middle]:
+            length = middle
+        else:
+            high = middle - 1
+    return length
+
+def _common_suffix_length(a, b, limit, step=4096):
+    """Length of the common suffix of two strings, at most limit."""
+    end_a, end_b = len(a), len(b)
+    length = 0
+    while (length + step <= limit
+           and a[end_a - length - step:end_a - length] == b[end_b - length - step:end_b - length]):
+        length += step
+    high = min(length + step, limit)
+    while length < high:
+        middle = (length + high + 1) // 2
+        if a[end_a - middle:end_a - length] == b[end_b - middle:end_b - length]:
+            length = middle
+        else:
+            high = middle - 1
+    return length
+
+class IncrementalRenderer:
+    """
+    Block-level markdown renderer with a per-block HTML cache.
+
+    The source is split into top-level blocks and each block's HTML is cached
+    by the block's content, so an edit only re-converts the blocks it touched.
+    The blocks of the last document are kept too: the next version is
+    compared with it and only split and looked up again around the edit, so
+    typing costs about the same in a long document as in a short one.
+    Reference links and abbreviations are shared context: the definitions
+    found in the document are injected into every block's converter, and
+    when they change every block is re-rendered.
+
+    A single full conversion is done instead whenever blocks could differ
+    from it: for footnotes, [TOC] markers, de-duplicated ids, redefined
+    references and raw HTML (block-level tags, open comments, markdown=
+    attributes), and when more than MAX_MISS_RATIO of the blocks aren't
+    cached, such as for a freshly opened document. warm() then fills the
+    cache in the background so the following edits are incremental.
+    """
+
+    _SENTINEL = "mdblocksentinel"
+    _HEAD = "<p>%s</p>\n" % _SENTINEL
+    _TAIL = "\n<p>%s</p>" % _SENTINEL
+
+    # Rendering blocks one by one costs about twice a full conversion
+    MAX_MISS_RATIO = 0.1
+
+    def __init__(self, converter_cache=None, max_blocks=32768):
+        self.converter_cache = converter_cache or _converter_cache
+        self.max_blocks = max_blocks
+        self.hits = 0
+        self.misses = 0
+        self._blocks = OrderedDict()
+        self._document = None
+        self._lock = threading.Lock()
+
+    def convert(self, md_text, extensions, extension_configs=None, max_miss_ratio=None):
+        """Convert markdown to HTML, re-using cached HTML for unchanged blocks."""
+        fragments = self.convert_fragments(md_text, extensions, extension_configs, max_miss_ratio)
+        return '\n'.join(fragments).strip()
+
+    def convert_fragments(self, md_text, extensions, extension_configs=None, max_miss_ratio=None):
+        """
+        Convert markdown to the list of non-empty HTML fragments, one per
+        block. Joined with newlines (and stripped) they form the full render;
+        when a full conversion was needed the list holds a single fragment.
+        max_miss_ratio overrides MAX_MISS_RATIO; 1.0 renders and caches
+        every missing block instead of converting the whole document.
+        """
+        if self._needs_full_render(md_text):
+            return [self._full_render(md_text, extensions, extension_configs)]
+        if max_miss_ratio is None:
+            max_miss_ratio = self.MAX_MISS_RATIO
+
+        config_key = self.converter_cache.make_key(extensions, extension_configs)
+        with self.converter_cache.converter(extensions, extension_configs) as md:
+            document = self._layout(md, config_key, md_text)
+            fragments = None
+            if document['context'] is not None:
+                fragments = self._render_blocks(md, document, max_miss_ratio)
+        self._document = document
+
+        if fragments is None:
+            return [self._full_render(md_text, extensions, extension_configs)]
+        return [fragment for fragment in fragments if fragment]
+
+    def warm(self, md_text, extensions, extension_configs=None, should_stop=None):
+        """
+        Render and cache the blocks of md_text that aren't cached yet, so
+        edits after a full conversion can be incremental. Checks
+        should_stop() between blocks; returns False when it cut warming short.
+        """
+        if self._needs_full_render(md_text):
+            return True
+
+        config_key = self.converter_cache.make_key(extensions, extension_configs)
+        with self.converter_cache.converter(extensions, extension_configs) as md:
+            document = self._layout(md, config_key, md_text)
+            context = document['context']
+            if context is None:
+                return True
+            for block in document['blocks']:
+                if should_stop is not None and should_stop():
+                    return False
+                key = (config_key, document['context_hash'], block)
+                with self._lock:
+                    if key in self._blocks:
+                        continue
+                fragment, cacheable = self._render_block(md, block, context)
+                if fragment is None:
+                    # Nothing to gain, the document is always converted whole
+                    return True
+                if cacheable:
+                    with self._lock:
+                        self._store({key: fragment})
+        return True
+
+    def _layout(self, md, config_key, md_text):
+        """
+        Split the document into blocks and gather what they define. Blocks,
+        their definitions and their rendered HTML are taken over from the
+        previous document where it is unchanged; the rest is left to
+        _render_blocks. The context is None when the document needs a full
+        conversion.
+        """
+        text = _normalize_whitespace(md_text).lstrip('\n')
+        previous = self._document
+        if previous is not None and previous['config_key'] != config_key:
+            previous = None
+        starts, blocks, head, tail = self._split(previous, text)
+
+        window = blocks[head:len(blocks) - tail]
+        info = [self._block_info(md, config_key, block) for block in window]
+        if previous is not None:
+            info = previous['info'][:head] + info + previous['info'][len(previous['info']) - tail:]
+
+        document = {
+            'config_key': config_key, 'text': text, 'starts': starts, 'blocks': blocks,
+            'info': info, 'context': None, 'context_hash': None,
+            'fragments': [None] * len(blocks), 'ids': [()] * len(blocks),
+        }
+        if any(raw_html for _, raw_html in info):
+            return document
+        context = self._merge_definitions(info)
+        if context is None:
+            return document
+        document['context'] = context
+        document['context_hash'] = hashlib.blake2b(repr(context).encode('utf-8'), digest_size=16).digest()
+
+        if (previous is not None and previous['context_hash'] == document['context_hash']
+                and previous['fragments'] is not None):
+            old_count = len(previous['blocks'])
+            for name in ('fragments', 'ids'):
+                document[name] = (previous[name][:head] + document[name][head:len(blocks) - tail]
+                                  + previous[name][old_count - tail:])
+        return document
+
+    def _split(self, previous, text):
+        """
+        Split normalised text into blocks, re-splitting only around the edit
+        when the previous document is given. Returns (starts, blocks, head,
+        tail), head and tail being the number of leading and trailing blocks
+        taken over from the previous document.
+        """
+        if previous is not None and previous['blocks']:
+            split = self._resplit(previous, text)
+            if split is not None:
+                return split
+        starts, blocks = [], []
+        for start, block in _iter_blocks(text):
+            starts.append(start)
+            blocks.append(block)
+        return starts, blocks, 0, 0
+
+    @staticmethod
+    def _resplit(previous, text):
+        """
+        Re-split text from the block before the edit until a block starts
+        where one started before in the unchanged tail. None when an edit
+        to a fence line could pair fences up differently anywhere.
+        """
+        old_text, old_starts, old_blocks = previous['text'], previous['starts'], previous['blocks']
+        if text == old_text:
+            return old_starts, old_blocks, len(old_blocks), 0
+
+        prefix = _common_prefix_length(old_text, text)
+        suffix = _common_suffix_length(old_text, text, min(len(old_text), len(text)) - prefix)
+        line_start = text.rfind('\n', 0, prefix) + 1
+        for source in (old_text, text):
+            line_end = source.find('\n', len(source) - suffix)
+            edited = source[line_start:line_end if line_end != -1 else len(source)]
+            if any(marker in edited for marker in _FENCE_MARKERS):
+                return None
+
+        # The edited block can join the one before it
+        head = max(0, bisect.bisect_right(old_starts, prefix) - 2)
+        starts, blocks = old_starts[:head], old_blocks[:head]
+        shift = len(text) - len(old_text)
+        edit_end = len(text) - suffix
+        for start, block in _iter_blocks(text, old_starts[head]):
+            if start >= edit_end:
+                index = bisect.bisect_left(old_starts, start - shift)
+                if index < len(old_starts) and old_starts[index] == start - shift:
+                    starts.extend(old_start + shift for old_start in old_starts[index:])
+                    blocks.extend(old_blocks[index:])
+                    return starts, blocks, head, len(old_starts) - index
+            starts.append(start)
+            blocks.append(block)
+        return starts, blocks, head, 0
+
+    def _block_info(self, md, config_key, block):
+        """
+        Return (definitions, raw_html) for a block: the (references,
+        abbreviations) it defines, or None if it looks like it defines
+        nothing, and whether it holds raw HTML blocks can't reproduce.
+        """
+        definitions = None
+        if _DEFINITION_RE.search(block):
+            definitions = self._cached(
+                (config_key, 'definitions', block),
+                lambda: self._block_definitions(md, block)
+            )
+        return definitions, _has_raw_html(block)
+
+    @staticmethod
+    def _merge_definitions(info):
+        """
+        Merge the reference and abbreviation definitions of all blocks.
+        Returns None when an id is defined by more than one block.
+        """
+        references = {}
+        abbreviations = {}
+        for definitions, _ in info:
+            if definitions is None:
+                continue
+            block_refs, block_abbrs = definitions
+            if references.keys() & block_refs.keys() or abbreviations.keys() & block_abbrs.keys():
+                return None
+            references.update(block_refs)
+            abbreviations.update(block_abbrs)
+        return (tuple(sorted(references.items())), tuple(sorted(abbreviations.items())))
+
+    def _render_blocks(self, md, document, max_miss_ratio):
+        """
+        Fill in the HTML of the document's blocks from the cache and render
+        the missing ones. Returns the fragments, or None when a full
+        conversion is needed instead.
+        """
+        config_key, context_hash = document['config_key'], document['context_hash']
+        blocks = document['blocks']
+        fragments, ids = list(document['fragments']), list(document['ids'])
+        missing = [index for index, fragment in enumerate(fragments) if fragment is None]
+
+        with self._lock:
+            for index in missing:
+                key = (config_key, context_hash, blocks[index])
+                fragment = self._blocks.get(key)
+                if fragment is not None:
+                    self._blocks.move_to_end(key)
+                    fragments[index] = fragment
+        uncached = [index for index in missing if fragments[index] is None]
+        if len(uncached) > 1 and len(uncached) > max_miss_ratio * len(blocks):
+            return None
+
+        rendered = {}
+        volatile = set()
+        for index in uncached:
+            fragment, cacheable = self._render_block(md, blocks[index], document['context'])
+            if fragment is None:
+                # Raw HTML left open or stashed past the block swallows or moves
+                # the framing, so the block has no stand-alone rendering.
+                return None
+            fragments[index] = fragment
+            if cacheable:
+                rendered[(config_key, context_hash, blocks[index])] = fragment
+            else:
+                volatile.add(index)
+
+        with self._lock:
+            self.hits += len(blocks) - len(uncached)
+            self.misses += len(uncached)
+            self._store(rendered)
+
+        for index in missing:
+            ids[index] = tuple(_ELEMENT_ID_RE.findall(fragments[index]))
+        # Volatile HTML is rendered again next time
+        stored = list(fragments)
+        for index in volatile:
+            stored[index] = None
+        document['fragments'], document['ids'] = stored, ids
+
+        # Duplicate ids get renumbered by the toc extension across the whole
+        # document, which block-local rendering cannot reproduce.
+        all_ids = [element_id for block_ids in ids for element_id in block_ids]
+        if len(all_ids) != len(set(all_ids)):
+            return None
+        return fragments
+
+    def _render_block(self, md, block, context):
+        """
+        Render one block framed by sentinel paragraphs to keep its exact
+        surrounding whitespace. Returns (html, cacheable); extensions mark
+        output that depends on more than the text by setting the
+        converter's `output_is_volatile` flag. The html is None when the
+        output isn't framed by exactly the two sentinels.
+        """
+        references, abbreviations = context
+        md.references.update(references)
+        abbrs = self._abbreviations(md)
+        if abbrs is not None:
+            abbrs.update(abbreviations)
+
+        try:
+            output = md.convert(f"{self._SENTINEL}\n\n{block}\n\n{self._SENTINEL}")
+            cacheable = not getattr(md, 'output_is_volatile', False)
+        finally:
+            md.reset()
+
+        if output == self._HEAD + self._TAIL.lstrip('\n'):
+            return "", cacheable
+        if (not output.startswith(self._HEAD) or not output.endswith(self._TAIL)
+                or output.count(self._SENTINEL) != 2):
+            return None, False
+        return output[len(self._HEAD):-len(self._TAIL)], cacheable
+
+    def _block_definitions(self, md, block):
+        """Return the (references, abbreviations) a block defines on its own."""
+        try:
+            md.convert(block)
+            abbrs = self._abbreviations(md)
+            return dict(md.references), dict(abbrs) if abbrs is not None else {}
+        finally:
+            md.reset()
+
+    @staticmethod
+    def _abbreviations(md):
+        """The abbreviation table of the converter's abbr extension, if loaded."""
+        return md.treeprocessors['abbr'].abbrs if 'abbr' in md.treeprocessors else None
+
+    def _cached(self, key, render):
+        """Return the cached value for key, rendering and storing it on a miss."""
+        with self._lock:
+            value = self._blocks.get(key)
+            if value is not None:
+                self._blocks.move_to_end(key)
+                self.hits += 1
+                return value
+
+        value = render()
+        with self._lock:
+            self.misses += 1
+            self._store({key: value})
+        return value
+
+    def _store(self, entries):
+        """Add entries to the cache and evict the least recently used. Caller holds the lock."""
+        self._blocks.update(entries)
+        while len(self._blocks) > self.max_blocks:
+            self._blocks.popitem(last=False)
+
+    def _full_render(self, md_text, extensions, extension_configs):
+        with self.converter_cache.converter(extensions, extension_configs) as md:
+            return md.convert(md_text)
+
+    @classmethod
+    def _needs_full_render(cls, md_text):
+        # A leading whitespace-only line survives normalisation as an empty
+        # indented code block, which only the full document can place.
+        first_line = md_text[:md_text.find('\n')] if '\n' in md_text else md_text
+        leading_whitespace = bool(first_line) and not first_line.strip()
+        return ('[^' in md_text or '[TOC]' in md_text
+                or cls._SENTINEL in md_text or leading_whitespace)
+
+    def clear(self):
+        """Drop all cached block HTML."""
+        with self._lock:
+            self._blocks.clear()
+            self._document = None
+            self.hits = 0
+            self.misses = 0
+
+_incremental_renderer = IncrementalRenderer()
+
+# Templates are expected to be in a 'templates' subdirectory
+_TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
 
 def _load_template(file_name):
-    """Loads a template file with error handling."""
-    try:
-        # Templates are expected to be in a 'templates' subdirectory
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        file_path = os.path.join(script_dir, "templates", file_name)
-        if os.path.exists(file_path):
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return f.read()
+    """Loads a template file (kept in the shared style cache) with error handling."""
+    file_path = os.path.join(_TEMPLATE_DIR, file_name)
+    content = style_cache.read(file_path)
+    if content is None:
         print(f"Warning: Template file not found at {file_path}")
-    except (IOError, OSError) as e:
-        print(f"Warning: Could not load template file {file_name}: {e}")
-    return ""  # Return empty string on failure
+        return ""  # Return empty string on failure
+    return content
 
-def process_svg_and_images(html_content, base_dir=None, project_root=None):
-    """Process SVG elements and image paths, resolving root-relative links."""
-    import re
-    
-    def fix_svg_element(match):
-        """A simplified processor for inline SVGs."""
-        svg_content = match.group(0)
-        
-        if 'xmlns=' not in svg_content:
-            svg_content = svg_content.replace(
-                '<svg', '<svg xmlns="http://www.w3.org/2000/svg"', 1
+_H1_TEXT_RE = re.compile(r'<h1[^>]*>([^<]+)</h1>')
+
+class RenderTimer:
+    """
+    Wall-clock time (ms) spent in each stage of one render. Keyword
+    arguments describe the render (document, size) for the timing log.
+    """
+
+    def __init__(self, **info):
+        self.info = info
+        self.stages = OrderedDict()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, (time.perf_counter() - start) * 1000)
+
+    def add(self, name, elapsed_ms):
+        self.stages[name] = self.stages.get(name, 0.0) + elapsed_ms
+
+    @property
+    def total(self):
+        return sum(self.stages.values())
+
+    def summary(self):
+        """Compact one-line breakdown, e.g. 'convert 12.1 | css 0.2'."""
+        return ' | '.join(f"{name} {elapsed:.1f}" for name, elapsed in self.stages.items())
+
+RENDER_LOG_FILE = os.path.join("logs", "render_timings.jsonl")
+_timing_logger = None
+
+def log_render_timings(timer, **extra):
+    """
+    Append one JSON line describing a render to the rolling timing log,
+    with the code highlighting cache's counters so far.
+    """
+    global _timing_logger
+    try:
+        if _timing_logger is None:
+            os.makedirs(os.path.dirname(RENDER_LOG_FILE), exist_ok=True)
+            handler = logging.handlers.RotatingFileHandler(
+                RENDER_LOG_FILE, maxBytes=1024 * 1024, backupCount=3, encoding='utf-8'
             )
-        
-        if 'style=' not in svg_content:
-            web_style = 'max-width: 100%; height: auto; display: block; margin: 1em auto;'
-            svg_content = svg_content.replace('<svg', f'<svg style="{web_style}"', 1)
-            
-        return svg_content
+            logger = logging.getLogger("markdown_manager.render_timings")
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            logger.addHandler(handler)
+            _timing_logger = logger
 
-    html_content = re.sub(
-        r'<svg[^>]*?>.*?</svg>', 
-        fix_svg_element, 
-        html_content, 
-        flags=re.DOTALL | re.IGNORECASE
-    )
-    
-    if base_dir and project_root:
-        def fix_image_path(match):
-            img_tag = match.group(0)
-            src_match = re.search(r'src="([^"]+)"', img_tag)
-            if not src_match: return img_tag
-            
-            original_src = src_match.group(1)
-            
-            if original_src.startswith(('http', 'data:', 'file:///')):
-                return img_tag
-            
-            absolute_path = None
-            if original_src.startswith('/'):
-                # It's a root-relative path, join with project_root
-                absolute_path = os.path.normpath(os.path.join(project_root, original_src[1:]))
-            else:
-                # It's a standard relative path, join with base_dir
-                absolute_path = os.path.normpath(os.path.join(base_dir, original_src))
+        record = {
+            'time': datetime.now().isoformat(timespec='seconds'),
+            **timer.info,
+            **extra,
+            'total_ms': round(timer.total, 2),
+            'stages': {name: round(elapsed, 2) for name, elapsed in timer.stages.items()},
+            'highlight_cache': highlight_cache.highlight_cache.stats(),
+        }
+        _timing_logger.info(json.dumps(record))
+    except (IOError, OSError) as e:
+        print(f"Warning: Could not write render timing log: {e}")
 
-            if absolute_path and os.path.exists(absolute_path):
-                file_url = f"file:///{absolute_path.replace(os.sep, '/')}"
-                return img_tag.replace(f'src="{original_src}"', f'src="{file_url}"')
-            
-            return img_tag
+# Image paths are resolved by resource_extension while the tree is built
+RESOURCE_EXTENSION = 'resource_extension'
+
+def _resource_configs(base_dir, project_root, thumbnails=False, relative_links=False):
+    """Extension configs with image resolution against the given directories."""
+    configs = dict(EXTENSION_CONFIGS)
+    configs[RESOURCE_EXTENSION] = {'base_dir': base_dir or '', 'project_root': project_root or '',
+                                   'thumbnails': thumbnails, 'relative_links': relative_links}
+    return configs
 
-        html_content = re.sub(r'<img[^>]+src="[^"]+"', fix_image_path, html_content)
+def fix_svg_element(svg_content):
+    """A simplified processor for inline SVGs."""
+    if 'xmlns=' not in svg_content:
+        svg_content = svg_content.replace(
+            '<svg', '<svg xmlns="http://www.w3.org/2000/svg"', 1
+        )
     
-    return html_content
+    if 'style=' not in svg_content:
+        web_style = 'max-width: 100%; height: auto; display: block; margin: 1em auto;'
+        svg_content = svg_content.replace('<svg', f'<svg style="{web_style}"', 1)
+        
+    return svg_content
 
 def get_svg_support_css():
     """Return CSS specifically for SVG support from a template file."""
     return _load_template("svg_support.tpl")
 
-def markdown_to_html(md_text, custom_css=None, save_temp_file=False, base_dir=None, project_root=None):
+PREVIEW_BLOCK_MARKER = "<!--md-block-->"
+_SVG_BLOCK_RE = re.compile(r'<svg.*?</svg>', re.DOTALL | re.IGNORECASE)
+_SVG_PLACEHOLDER_PREFIX = "svg-placeholder-"
+# The placeholder might be wrapped in <p> tags by the processor
+_SVG_PLACEHOLDER_RE = re.compile(
+    r'<p>(svg-placeholder-[0-9a-f]{16})</p>|(svg-placeholder-[0-9a-f]{16})'
+)
+
+def protect_svg(md_text):
     """
-    Converts markdown to HTML, safely protecting and re-inserting SVG blocks.
+    Replace inline SVG blocks with text placeholders so the Markdown
+    processor leaves them alone. Placeholders are derived from the SVG
+    content, so identical input always yields identical text (and cache
+    keys). Returns the cleaned text and the placeholder -> SVG mapping.
     """
-    css_manager = CSSManager()
-    
-    try:
-        # 1. Protect SVG by extracting it and leaving a unique text placeholder
-        placeholders = {}
-        def extract_svg_callback(match):
-            placeholder = f"svg-placeholder-{uuid.uuid4()}"
-            placeholders[placeholder] = match.group(0)
-            return placeholder
-        
-        md_text_clean = re.sub(
-            r'<svg.*?</svg>',
-            extract_svg_callback,
-            md_text,
-            flags=re.DOTALL | re.IGNORECASE
+    placeholders = {}
+
+    def extract_svg_callback(match):
+        svg_block = match.group(0)
+        digest = hashlib.sha1(svg_block.encode('utf-8')).hexdigest()[:16]
+        placeholder = f"{_SVG_PLACEHOLDER_PREFIX}{digest}"
+        placeholders[placeholder] = svg_block
+        return placeholder
+
+    if '<' not in md_text:
+        return md_text, placeholders
+    return _SVG_BLOCK_RE.sub(extract_svg_callback, md_text), placeholders
+
+def convert_protecting_svg(md, md_text):
+    """Convert markdown on a configured converter, keeping inline SVGs away from the Markdown processor."""
+    md_text_clean, placeholders = protect_svg(md_text)
+    return restore_svg(md.convert(md_text_clean), placeholders, fix_svg_element)
+
+def restore_svg(html_content, placeholders, transform=None):
+    """
+    Put the original SVG back in place of its placeholders in one pass.
+    `transform`, if given, is applied to each restored SVG block.
+    """
+    if not placeholders or _SVG_PLACEHOLDER_PREFIX not in html_content:
+        return html_content
+
+    def restore_callback(match):
+        placeholder = match.group(1) or match.group(2)
+        svg_block = placeholders.get(placeholder)
+        if svg_block is None:
+            return match.group(0)
+        return transform(svg_block) if transform else svg_block
+
+    return _SVG_PLACEHOLDER_RE.sub(restore_callback, html_content)
+
+def render_preview_fragments(md_text, base_dir=None, project_root=None, timer=None):
+    """
+    Render markdown to the list of top-level HTML fragments of the preview
+    body, with SVGs restored and image paths resolved. Joined with newlines
+    they form the body of the preview page. Stage timings are recorded on
+    `timer` (a RenderTimer) when given.
+    """
+    timer = timer or RenderTimer()
+
+    # 1. Protect SVG by extracting it and leaving a text placeholder
+    with timer.stage('svg_extract'):
+        md_text_clean, placeholders = protect_svg(md_text)
+
+    # 2. Run the Markdown processor, re-using HTML of unchanged blocks.
+    #    Image path resolution happens inside it and is reported separately.
+    images_before = image_resolver.thread_elapsed_ms()
+    with timer.stage('convert'):
+        fragments = _incremental_renderer.convert_fragments(
+            md_text_clean, *_preview_converter_args(base_dir, project_root)
         )
+    images_ms = image_resolver.thread_elapsed_ms() - images_before
+    timer.add('convert', -images_ms)
+    timer.add('images', images_ms)
 
-        # 2. Configure and run the Markdown processor
-        extensions = [
-            'tables', 'fenced_code', 'sane_lists', 'codehilite',
-            'toc', 'extra', 'attr_list'
-        ]
-        extension_configs = {
-            'codehilite': {'css_class': 'highlight', 'use_pygments': True}
-        }
-        md = markdown.Markdown(
-            extensions=extensions,
-            extension_configs=extension_configs,
-            output_format='html5'
+    # 3. Re-insert the original SVG content
+    with timer.stage('svg_restore'):
+        return [restore_svg(fragment, placeholders, fix_svg_element) for fragment in fragments]
+
+def warm_preview_cache(md_text, base_dir=None, project_root=None, should_stop=None):
+    """
+    Cache the block HTML of a preview that was converted in one go, so
+    the next edits to it render incrementally. Returns False when
+    should_stop() cut it short.
+    """
+    md_text_clean, _ = protect_svg(md_text)
+    return _incremental_renderer.warm(
+        md_text_clean, *_preview_converter_args(base_dir, project_root), should_stop=should_stop
+    )
+
+def iter_preview_chunks(md_text, base_dir=None, project_root=None,
+                        first_chunk_chars=4 * 1024, max_chunk_chars=256 * 1024):
+    """
+    Render the preview in chunks of whole blocks, yielding each chunk's
+    fragments as soon as it is done. The first chunk holds about a screen
+    of text and is cut from the head of the document before the rest is
+    split, so very large documents show up right away; later chunks double
+    in size up to max_chunk_chars. Definitions and whole-document features
+    only apply within a chunk, so the result is a preview of
+    render_preview_fragments, which should follow for the exact output.
+    Chunks are rendered block by block to fill the cache that call uses.
+    """
+    md_text_clean, placeholders = protect_svg(md_text)
+    extensions, extension_configs = _preview_converter_args(base_dir, project_root)
+
+    def render_chunk(chunk_text):
+        fragments = _incremental_renderer.convert_fragments(
+            chunk_text, extensions, extension_configs, max_miss_ratio=1.0
         )
-        html_content = md.convert(md_text_clean)
-
-        # 3. Re-insert the original SVG content
-        for placeholder, svg_block in placeholders.items():
-            # The placeholder might be wrapped in <p> tags by the processor
-            p_placeholder = f"<p>{placeholder}</p>"
-            if p_placeholder in html_content:
-                html_content = html_content.replace(p_placeholder, svg_block)
-            else:
-                html_content = html_content.replace(placeholder, svg_block)
+        return [restore_svg(fragment, placeholders, fix_svg_element) for fragment in fragments]
 
-        # 4. Post-process the final HTML to resolve image paths
-        html_content = process_svg_and_images(html_content, base_dir, project_root)
+    # Cut the first screen at a blank line
+    cut = md_text_clean.find('\n\n', first_chunk_chars)
+    if cut == -1:
+        yield render_chunk(md_text_clean)
+        return
+    yield render_chunk(md_text_clean[:cut])
 
-        # 5. Assemble the full HTML page
-        preview_css = css_manager.get_preview_css(custom_css)
-        svg_css = get_svg_support_css()
-        html_full_page = f"""<!DOCTYPE html>
+    chunk, chunk_size, limit = [], 0, first_chunk_chars * 4
+    blocks = split_markdown_blocks(md_text_clean[cut:])
+    for index, block in enumerate(blocks):
+        chunk.append(block)
+        chunk_size += len(block)
+        if chunk_size < limit and index < len(blocks) - 1:
+            continue
+        yield render_chunk('\n\n'.join(chunk))
+        chunk, chunk_size, limit = [], 0, min(limit * 2, max_chunk_chars)
+
+def _preview_converter_args(base_dir, project_root):
+    """Extensions and configs of the preview converter."""
+    # Image paths are only resolved when both directories are known
+    if not (base_dir and project_root):
+        base_dir = project_root = None
+    # The preview shows display-sized copies of oversized images
+    return PREVIEW_EXTENSIONS + (RESOURCE_EXTENSION,), _resource_configs(base_dir, project_root, True)
+
+def _export_converter_args(project_root):
+    """
+    Extensions and configs of the static-site export converter: the preview
+    setup, with images linked relative to the note. Each note's folder is
+    set as the resource extension's base_dir before it is converted.
+    """
+    return PREVIEW_EXTENSIONS + (RESOURCE_EXTENSION,), _resource_configs(None, project_root, relative_links=True)
+
+def get_preview_page_css(custom_css=None):
+    """Return the complete stylesheet of the preview page."""
+    preview_css = CSSManager().get_preview_css(custom_css)
+    svg_css = get_svg_support_css()
+    return f"{preview_css}\n{svg_css}"
+
+def build_preview_page(html_body, page_css, live=False, title="Markdown Preview"):
+    """
+    Assemble the full preview HTML page. A live page also carries the
+    script that lets the viewer patch changed blocks in place.
+    """
+    script = f"\n    <script>{_load_template('preview_patch.tpl')}</script>" if live else ""
+    return f"""<!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="utf-8">
-    <title>Markdown Preview</title>
-    <style>{preview_css}\n{svg_css}</style>
+    <title>{html.escape(title)}</title>
+    <style id="md-preview-style">{page_css}</style>{script}
 </head>
-<body>{html_content}</body>
+<body>{html_body}</body>
 </html>"""
 
+def build_live_preview_body(fragments):
+    """Join fragments with the block markers the live preview patches against."""
+    return ''.join(f"{PREVIEW_BLOCK_MARKER}{fragment}\n" for fragment in fragments)
+
+def write_preview_temp_file(html_page, base_dir):
+    """Save the page next to the note so relative resources resolve, returning its path."""
+    temp_file_path = os.path.join(base_dir, '.markdown_preview_temp.html')
+    with open(temp_file_path, 'w', encoding='utf-8') as f:
+        f.write(html_page)
+    return temp_file_path
+
+def markdown_to_html(md_text, custom_css=None, save_temp_file=False, base_dir=None, project_root=None,
+                     timer=None):
+    """
+    Converts markdown to HTML, safely protecting and re-inserting SVG blocks.
+    Pass a RenderTimer as `timer` to collect per-stage timings.
+    """
+    timer = timer or RenderTimer()
+    try:
+        fragments = render_preview_fragments(md_text, base_dir, project_root, timer)
+
+        # 5. Assemble the full HTML page
+        with timer.stage('css'):
+            page_css = get_preview_page_css(custom_css)
+        with timer.stage('page'):
+            html_full_page = build_preview_page('\n'.join(fragments).strip(), page_css)
+
         # 6. Save to temp file for the viewer
         if save_temp_file and base_dir:
-            temp_file_path = os.path.join(base_dir, '.markdown_preview_temp.html')
-            with open(temp_file_path, 'w', encoding='utf-8') as f:
-                f.write(html_full_page)
-            return temp_file_path
+            with timer.stage('write'):
+                return write_preview_temp_file(html_full_page, base_dir)
         
         return html_full_page
 
@@ -177,73 +1020,76 @@ def _generate_error_html(error_message):
 </body>
 </html>"""
 
-def markdown_to_html_for_browser_print(md_text, print_css="", source_file_path=None, project_root=None):
-    """Convert markdown to HTML for browser printing with SVG and image support"""
+_SVG_SIZE_RE = re.compile(r'<svg\b[^>]*\swidth=', re.IGNORECASE)
+
+def write_svg_asset(svg_content, asset_dir):
+    """
+    Store an SVG in asset_dir under the hash of its content, writing it only
+    if it is not there yet, and return its file:/// URL.
+    """
+    svg_content = fix_svg_element(svg_content)
+    digest = hashlib.sha1(svg_content.encode('utf-8')).hexdigest()
+    path = os.path.abspath(os.path.join(asset_dir, f"{digest}.svg"))
+    if not os.path.exists(path):
+        os.makedirs(asset_dir, exist_ok=True)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(svg_content)
+        os.replace(temp_path, path)
+    return f"file:///{path.replace(os.sep, '/')}"
+
+def markdown_to_html_for_browser_print(md_text, print_css="", source_file_path=None, project_root=None,
+                                       render_info=None, svg_asset_dir=None):
+    """
+    Convert markdown to HTML for browser printing with SVG and image support.
+    Pass a dict as `render_info` to learn whether the output refers to missing
+    images ('volatile'), in which case it should not be cached. With
+    `svg_asset_dir`, inline SVGs are stored there once per distinct diagram
+    and referenced as images instead of being embedded in the page.
+    """
     try:
-        import markdown
         import os
         
-        # 1. Protect SVG by extracting it and leaving a unique text placeholder
-        placeholders = {}
-        def extract_svg_callback(match):
-            placeholder = f"svg-placeholder-{uuid.uuid4()}"
-            placeholders[placeholder] = match.group(0)
-            return placeholder
-        
-        md_text_clean = re.sub(
-            r'<svg.*?</svg>',
-            extract_svg_callback,
-            md_text,
-            flags=re.DOTALL | re.IGNORECASE
-        )
+        # 1. Protect SVG by extracting it and leaving a text placeholder
+        md_text_clean, placeholders = protect_svg(md_text)
 
-        # 2. Configure and run the Markdown processor
-        extensions = [
-            'extra', 'codehilite', 'toc', 'tables', 'fenced_code', 'attr_list'
-        ]
-        extension_configs = {
-            'codehilite': {'css_class': 'highlight', 'use_pygments': True}
-        }
-        md = markdown.Markdown(
-            extensions=extensions,
-            extension_configs=extension_configs,
-            output_format='html5'
-        )
-        html_body = md.convert(md_text_clean)
-
-        # 3. Re-insert the original SVG content
-        for placeholder, svg_block in placeholders.items():
-            p_placeholder = f"<p>{placeholder}</p>"
-            if p_placeholder in html_body:
-                html_body = html_body.replace(p_placeholder, svg_block)
-            else:
-                html_body = html_body.replace(placeholder, svg_block)
+        # 2. Run the Markdown processor on a pooled converter, resolving images
+        #    against the note's folder (or the project root without one)
+        base_dir = os.path.dirname(os.path.abspath(source_file_path)) if source_file_path else project_root
+        with _converter_cache.converter(PRINT_EXTENSIONS + (RESOURCE_EXTENSION,),
+                                        _resource_configs(base_dir, project_root)) as md:
+            html_body = md.convert(md_text_clean)
+            if render_info is not None:
+                render_info['volatile'] = md.output_is_volatile
 
-        # 4. Wrap the final SVG in an Iframe to isolate it from print CSS
-        def wrap_svg_in_iframe(match):
-            svg_code = match.group(0)
+        # 3. Re-insert the original SVG, wrapped in an Iframe to isolate it from print CSS
+        def wrap_svg_in_iframe(svg_code):
             # Escape for use in the srcdoc attribute
             escaped_svg = html.escape(svg_code)
             # Use vh for a responsive height and a simple border
             style = "width: 100%; height: 80vh; border: 1px solid #eee; margin: 1em auto; display: block;"
             return f'<iframe style="{style}" srcdoc="{escaped_svg}"></iframe>'
 
-        html_body = re.sub(
-            r'<svg.*?</svg>', 
-            wrap_svg_in_iframe, 
-            html_body, 
-            flags=re.DOTALL | re.IGNORECASE
-        )
-        
-        # 5. Process standard images for print
-        html_body = process_svg_and_images_for_print(html_body, source_file_path, project_root)
+        # Repeated diagrams share one asset file
+        svg_assets = {}
+
+        def link_svg_asset(svg_code):
+            url = svg_assets.get(svg_code)
+            if url is None:
+                url = svg_assets[svg_code] = write_svg_asset(svg_code, svg_asset_dir)
+            # Without an explicit width the diagram would shrink to the 300px default
+            style = '' if _SVG_SIZE_RE.match(svg_code) else ' style="width: 100%"'
+            return f'<img class="svg-asset" src="{url}" alt=""{style}>'
+
+        html_body = restore_svg(html_body, placeholders,
+                                link_svg_asset if svg_asset_dir else wrap_svg_in_iframe)
         
         # Get title from first h1 or use filename
         title = "Markdown Document"
         if source_file_path:
             title = os.path.splitext(os.path.basename(source_file_path))[0]
         
-        h1_match = re.search(r'<h1[^>]*>([^<]+)</h1>', html_body)
+        h1_match = _H1_TEXT_RE.search(html_body)
         if h1_match:
             title = h1_match.group(1).strip()
         
@@ -267,58 +1113,17 @@ def markdown_to_html_for_browser_print(md_text, print_css="", source_file_path=N
         print(f"Error in markdown_to_html_for_browser_print: {str(e)}")
         return f"<html><body><h1>Error</h1><p>Failed to render markdown: {html.escape(str(e))}</p></body></html>"
 
-def process_svg_and_images_for_print(html_content, source_file_path=None, project_root=None):
-    """Process images for print, resolving root-relative links."""
-    import re
-    import os
-    
-    def fix_svg_for_print(match):
-        svg_content = match.group(0)
-        if 'xmlns=' not in svg_content:
-            svg_content = svg_content.replace('<svg', '<svg xmlns="http://www.w3.org/2000/svg"', 1)
-        return svg_content
-    
-    html_content = re.sub(r'<svg[^>]*>.*?</svg>', fix_svg_for_print, html_content, flags=re.DOTALL | re.IGNORECASE)
-    
-    def fix_image_for_print(match):
-        img_tag = match.group(0)
-        src_match = re.search(r'src="([^"]+)"', img_tag)
-        if not src_match: return img_tag
-        
-        original_src = src_match.group(1)
-        
-        if original_src.startswith(('http', 'https-:', 'data:', 'file:///')):
-            return img_tag
-        
-        absolute_path = None
-        base_dir = os.path.dirname(os.path.abspath(source_file_path)) if source_file_path else project_root
-        
-        if not base_dir: return img_tag
-
-        if original_src.startswith('/'):
-            # Root-relative path
-            if not project_root: return img_tag
-            absolute_path = os.path.normpath(os.path.join(project_root, original_src[1:]))
-        else:
-            # Standard relative path
-            absolute_path = os.path.normpath(os.path.join(base_dir, original_src))
-
-        if absolute_path and os.path.exists(absolute_path):
-            file_url = f"file:///{absolute_path.replace(os.sep, '/')}"
-            return img_tag.replace(f'src="{original_src}"', f'src="{file_url}"')
-        
-        return img_tag
-    
-    html_content = re.sub(r'<img[^>]+>', fix_image_for_print, html_content)
-    
-    return html_content
-
 def get_print_svg_css():
     """Return CSS specifically for SVG support in print output with better sizing control"""
     return _load_template("print_svg_support.tpl")
 
 class CSSManager:
     """Manages CSS loading with simple two-layer fallback system"""
+
+    # Shared by all instances; its files are served from the style cache
+    _shared_config_manager = None
+    # Last (style editor text, extracted preview CSS) pair
+    _last_extracted = (None, None)
     
     def __init__(self):
         self.config_manager = None
@@ -326,9 +1131,13 @@ class CSSManager:
     
     def _init_config_manager(self):
         """Initialize config manager with error handling"""
+        if CSSManager._shared_config_manager is not None:
+            self.config_manager = CSSManager._shared_config_manager
+            return
         try:
             from config import ConfigManager
             self.config_manager = ConfigManager()
+            CSSManager._shared_config_manager = self.config_manager
         except ImportError as e:
             print(f"Warning: Could not import ConfigManager: {e}")
     
@@ -377,7 +1186,10 @@ class CSSManager:
         """Get preview CSS with simple fallback chain"""
         
         if custom_css and custom_css.strip():
-            css_content = self.extract_css_from_config(custom_css, "Preview")
+            last_custom_css, css_content = CSSManager._last_extracted
+            if custom_css != last_custom_css:
+                css_content = self.extract_css_from_config(custom_css, "Preview")
+                CSSManager._last_extracted = (custom_css, css_content)
             if css_content:
                 return css_content
         
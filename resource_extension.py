@@ -0,0 +1,221 @@
+# resource_extension.py
+
+import os
+import re
+import threading
+import time
+
+from markdown.extensions import Extension
+from markdown.postprocessors import Postprocessor
+from markdown.treeprocessors import Treeprocessor
+
+from thumbnail_cache import thumbnail_cache
+
+_RAW_IMG_SRC_RE = re.compile(r'(<img[^>]+src=")([^"]+)(")')
+# Relative link to another note, e.g. "../guide.md#setup"
+_NOTE_LINK_RE = re.compile(r'^(?![a-zA-Z][a-zA-Z0-9+.-]*:|/|#)([^?#]*)\.md((?:#.*)?)$')
+
+def local_image_path(src, base_dir, project_root):
+    """
+    Return the local file an image src points to, or None for remote,
+    inline and already absolute sources.
+    """
+    if not base_dir or src.startswith(('http', 'data:', 'file:///')):
+        return None
+    if src.startswith('/'):
+        # It's a root-relative path, join with project_root
+        if not project_root:
+            return None
+        return os.path.normpath(os.path.join(project_root, src[1:]))
+    # It's a standard relative path, join with base_dir
+    return os.path.normpath(os.path.join(base_dir, src))
+
+class ImagePathResolver:
+    """
+    Cache of image path lookups keyed by (base_dir, project_root, src).
+
+    A cached answer stays valid while the mtime of the image's directory is
+    unchanged, since adding, removing or renaming a file updates it. Each
+    directory is stat'ed at most once per check_interval seconds, so a note
+    with hundreds of screenshots costs a handful of stat calls per render
+    instead of one per image.
+    """
+
+    def __init__(self, check_interval=1.0):
+        self.check_interval = check_interval
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._directories = {}
+        self._lock = threading.Lock()
+        self._thread_state = threading.local()
+
+    def thread_elapsed_ms(self):
+        """Total time the calling thread has spent in resolve(), for stage timings."""
+        return getattr(self._thread_state, 'elapsed_ms', 0.0)
+
+    def _directory_mtime(self, directory, now):
+        state = self._directories.get(directory)
+        if state is not None and now - state[1] < self.check_interval:
+            return state[0]
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+        except OSError:
+            mtime = None
+        self._directories[directory] = (mtime, now)
+        return mtime
+
+    def resolve(self, src, base_dir, project_root):
+        """
+        Return (url, missing): the file:/// URL for a local image that exists
+        (otherwise src unchanged) and whether it pointed at a missing file.
+        """
+        start = time.perf_counter()
+        try:
+            return self._resolve(src, base_dir, project_root)
+        finally:
+            self._thread_state.elapsed_ms = (
+                self.thread_elapsed_ms() + (time.perf_counter() - start) * 1000
+            )
+
+    def _resolve(self, src, base_dir, project_root):
+        path = local_image_path(src, base_dir, project_root)
+        if path is None:
+            return src, False
+
+        key = (base_dir, project_root, src)
+        directory = os.path.dirname(path)
+        now = time.monotonic()
+        with self._lock:
+            mtime = self._directory_mtime(directory, now)
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] == mtime:
+                self.hits += 1
+                return entry[0]
+
+        if os.path.exists(path):
+            result = (f"file:///{path.replace(os.sep, '/')}", False)
+        else:
+            result = (src, True)
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = (result, mtime)
+        return result
+
+    def stats(self):
+        """Return a snapshot of the cache counters."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._directories.clear()
+            self.hits = 0
+            self.misses = 0
+
+# Shared by the preview and print converters
+image_resolver = ImagePathResolver()
+
+class ImageSourceTreeprocessor(Treeprocessor):
+    """Point <img> elements at local files through file:/// URLs."""
+
+    def __init__(self, md, extension):
+        super().__init__(md)
+        self.extension = extension
+
+    def run(self, root):
+        for img in root.iter('img'):
+            src = img.get('src')
+            if src:
+                img.set('src', self.extension.resolve(src))
+        if self.extension.getConfig('relative_links'):
+            for link in root.iter('a'):
+                href = link.get('href')
+                if href:
+                    link.set('href', _NOTE_LINK_RE.sub(r'\1.html\2', href))
+
+class RawImagePostprocessor(Postprocessor):
+    """Apply the same rewrite to <img> tags written as raw HTML."""
+
+    def __init__(self, md, extension):
+        super().__init__(md)
+        self.extension = extension
+
+    def run(self, text):
+        blocks = self.md.htmlStash.rawHtmlBlocks
+        for index, block in enumerate(blocks):
+            if isinstance(block, str) and '<img' in block:
+                blocks[index] = _RAW_IMG_SRC_RE.sub(
+                    lambda m: m.group(1) + self.extension.resolve(m.group(2)) + m.group(3),
+                    block
+                )
+        return text
+
+class LocalResourceExtension(Extension):
+    """
+    Resolves image paths against the note's directory while the document
+    is converted. Relative paths resolve against base_dir and root-relative
+    ones (/images/...) against project_root; images whose file exists are
+    rewritten to file:/// URLs.
+
+    A missing file may appear later, so when one is met the converter's
+    `output_is_volatile` flag is set and callers should not cache the HTML.
+
+    With relative_links (used for exported sites that mirror the project
+    folder) images get paths relative to the note instead, links to other
+    notes point at their .html page, and the files used are collected in
+    the converter's `local_resources` set. With thumbnails (used by the
+    preview) oversized images are swapped for display-sized copies; the
+    output is volatile while a copy is still being made.
+    """
+
+    def __init__(self, **kwargs):
+        self.config = {
+            'base_dir': ['', 'Directory relative image paths resolve against'],
+            'project_root': ['', 'Directory root-relative image paths resolve against'],
+            'relative_links': [False, 'Link images relative to the note instead of file:/// URLs'],
+            'thumbnails': [False, 'Show display-sized copies of oversized images'],
+        }
+        super().__init__(**kwargs)
+
+    def extendMarkdown(self, md):
+        md.registerExtension(self)
+        self.md = md
+        self.reset()
+        # After unescaping, so attribute values are final
+        md.treeprocessors.register(ImageSourceTreeprocessor(md, self), 'local_images', -5)
+        # Before raw HTML is put back into the output
+        md.postprocessors.register(RawImagePostprocessor(md, self), 'local_raw_images', 35)
+
+    def reset(self):
+        self.md.output_is_volatile = False
+        self.md.local_resources = set()
+
+    def resolve(self, src):
+        base_dir = self.getConfig('base_dir')
+        project_root = self.getConfig('project_root')
+        url, missing = image_resolver.resolve(src, base_dir, project_root)
+        if missing:
+            self.md.output_is_volatile = True
+        elif url != src and self.getConfig('relative_links'):
+            path = local_image_path(src, base_dir, project_root)
+            self.md.local_resources.add(path)
+            return os.path.relpath(path, base_dir).replace(os.sep, '/')
+        elif url != src and self.getConfig('thumbnails'):
+            thumbnail_url, pending = thumbnail_cache.preview_url(
+                local_image_path(src, base_dir, project_root)
+            )
+            if pending:
+                self.md.output_is_volatile = True
+            return thumbnail_url or url
+        return url
+
+def makeExtension(**kwargs):
+    return LocalResourceExtension(**kwargs)
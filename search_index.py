@@ -0,0 +1,309 @@
+# search_index.py
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+INDEX_FILE_NAME = ".search_index.db"
+INDEX_VERSION = 1
+# Trigram tokens only accelerate terms of at least this many characters
+MIN_MATCH_CHARS = 3
+_SYNC_BATCH = 200
+# Seconds between the background syncs that pick up files changed outside
+# the app (see start_sync())
+RESYNC_INTERVAL = 30.0
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER);
+CREATE VIRTUAL TABLE IF NOT EXISTS notes USING fts5(name, content, tokenize='trigram');
+PRAGMA user_version = {INDEX_VERSION};
+"""
+
+class SearchIndex:
+    """
+    Persistent full-text index of the docs tree, stored in an SQLite file
+    (by default inside the docs root; its own files are never indexed).
+
+    Every file's name is indexed and the text of .md files as well, with
+    the FTS5 trigram tokenizer so queries keep the substring semantics of
+    the plain scan. Rows carry the file's mtime and size: sync() walks the
+    tree and re-reads only the files that differ, and the update/remove/
+    rename methods keep the index current after changes made in the app.
+    Those only queue the change for a writer thread, so the caller never
+    waits on a sync holding the database. Each call opens its own
+    connection, so any thread may use the index.
+    """
+
+    def __init__(self, root_path, db_path=None):
+        self.root_path = os.path.abspath(root_path)
+        self.db_path = os.path.abspath(db_path or os.path.join(self.root_path, INDEX_FILE_NAME))
+        self.available = False
+        self.ready = False
+        self._sync_thread = None
+        self._sync_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        # (method, paths) for the writer thread, in the order they were made
+        self._writes = queue.Queue()
+        self._write_thread = None
+        try:
+            with self._connect() as conn:
+                if conn.execute("PRAGMA user_version").fetchone()[0] != INDEX_VERSION:
+                    conn.executescript("DROP TABLE IF EXISTS files; DROP TABLE IF EXISTS notes;")
+                conn.executescript(_SCHEMA)
+            self.available = True
+        except sqlite3.Error as e:
+            # e.g. an SQLite build without FTS5 or the trigram tokenizer
+            print(f"Warning: Search index disabled, falling back to scanning files: {e}")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _is_index_file(self, path):
+        # The database with its -wal/-shm/-journal companions
+        return path.startswith(self.db_path)
+
+    def _relative(self, path):
+        return os.path.relpath(os.path.abspath(path), self.root_path)
+
+    @staticmethod
+    def _read_note(path):
+        try:
+            with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+                return f.read()
+        except (IOError, OSError):
+            return ""
+
+    def _store(self, conn, relative, path, st):
+        self._delete(conn, relative)
+        content = self._read_note(path) if path.endswith(".md") else ""
+        rowid = conn.execute(
+            "INSERT INTO files (path, mtime_ns, size) VALUES (?, ?, ?)",
+            (relative, st.st_mtime_ns, st.st_size)
+        ).lastrowid
+        conn.execute("INSERT INTO notes (rowid, name, content) VALUES (?, ?, ?)",
+                     (rowid, os.path.basename(path), content))
+
+    @staticmethod
+    def _delete(conn, relative, prefix=False):
+        where, args = "path = ?", (relative,)
+        if prefix:
+            # The path itself or anything inside it as a folder
+            where, args = "path = ? OR substr(path, 1, ?) = ?", (
+                relative, len(relative) + 1, relative + os.sep)
+        conn.execute(f"DELETE FROM notes WHERE rowid IN (SELECT rowid FROM files WHERE {where})", args)
+        conn.execute(f"DELETE FROM files WHERE {where}", args)
+
+    def sync(self, should_stop=None):
+        """
+        Bring the index in line with the files on disk: new and modified
+        files are (re)indexed and rows of files that are gone are dropped.
+        Returns the number of files that were updated or removed.
+        """
+        if not self.available:
+            return 0
+        with self._sync_lock:
+            return self._sync(should_stop)
+
+    def _sync(self, should_stop):
+        with self._connect() as conn:
+            known = {path: (mtime, size) for path, mtime, size in
+                     conn.execute("SELECT path, mtime_ns, size FROM files")}
+
+        changed = []
+        seen = set()
+        for root, dirs, files in os.walk(self.root_path):
+            if should_stop and should_stop():
+                return 0
+            for filename in files:
+                path = os.path.join(root, filename)
+                if self._is_index_file(path):
+                    continue
+                relative = self._relative(path)
+                seen.add(relative)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                if known.get(relative) != (st.st_mtime_ns, st.st_size):
+                    changed.append((relative, path, st))
+        removed = [relative for relative in known if relative not in seen]
+
+        # Written in batches so saves from the GUI never wait long for the lock
+        for start in range(0, max(len(changed), len(removed)), _SYNC_BATCH):
+            if should_stop and should_stop():
+                break
+            with self._write_lock, self._connect() as conn:
+                for relative, path, st in changed[start:start + _SYNC_BATCH]:
+                    self._store(conn, relative, path, st)
+                for relative in removed[start:start + _SYNC_BATCH]:
+                    self._delete(conn, relative)
+        else:
+            self.ready = True
+        return len(changed) + len(removed)
+
+    def start_sync(self):
+        """
+        Run sync() on a background thread unless one is already running.
+        Called every RESYNC_INTERVAL seconds, so searches never walk the tree.
+        """
+        if not self.available or (self._sync_thread and self._sync_thread.is_alive()):
+            return
+        self._sync_thread = threading.Thread(target=self._run_sync, name="search-index-sync", daemon=True)
+        self._sync_thread.start()
+
+    def _run_sync(self):
+        start = time.perf_counter()
+        try:
+            count = self.sync()
+            if count:
+                print(f"Search index: updated {count} file(s) in {time.perf_counter() - start:.1f}s")
+        except (sqlite3.Error, OSError) as e:
+            print(f"Warning: Search index sync failed: {e}")
+
+    def update_path(self, path):
+        """Re-index a file, or every file under a folder, after it was written or added."""
+        self._queue(self._update, path)
+
+    def remove_path(self, path):
+        """Drop a deleted file, or everything under a deleted folder."""
+        self._queue(self._remove, path)
+
+    def rename_path(self, old_path, new_path):
+        """Follow a rename or move of a file or folder."""
+        self._queue(self._rename, old_path, new_path)
+
+    def flush(self):
+        """Wait until the queued updates are written."""
+        self._writes.join()
+
+    def _queue(self, write, *paths):
+        if not self.available:
+            return
+        self._writes.put((write, [os.path.abspath(path) for path in paths]))
+        if not self._write_thread:
+            self._write_thread = threading.Thread(target=self._run_writes, name="search-index-writes", daemon=True)
+            self._write_thread.start()
+
+    def _run_writes(self):
+        while True:
+            write, paths = self._writes.get()
+            try:
+                with self._write_lock, self._connect() as conn:
+                    write(conn, *paths)
+            except (sqlite3.Error, OSError) as e:
+                print(f"Warning: Could not update search index for {paths[-1]}: {e}")
+                self._forget(paths)
+            finally:
+                self._writes.task_done()
+
+    def _forget(self, paths):
+        """Drop the rows of paths whose update failed, so sync() indexes them again."""
+        try:
+            with self._write_lock, self._connect() as conn:
+                for path in paths:
+                    self._delete(conn, self._relative(path), prefix=True)
+        except sqlite3.Error as e:
+            print(f"Warning: Could not update search index for {paths[-1]}: {e}")
+
+    def _update(self, conn, path):
+        if os.path.isdir(path):
+            self._delete(conn, self._relative(path), prefix=True)
+            for root, _, files in os.walk(path):
+                for filename in files:
+                    file_path = os.path.join(root, filename)
+                    if self._is_index_file(file_path):
+                        continue
+                    try:
+                        st = os.stat(file_path)
+                    except OSError:
+                        # Gone already; its row was dropped above
+                        continue
+                    self._store(conn, self._relative(file_path), file_path, st)
+        elif os.path.isfile(path):
+            self._store(conn, self._relative(path), path, os.stat(path))
+        else:
+            self._delete(conn, self._relative(path), prefix=True)
+
+    def _remove(self, conn, path):
+        self._delete(conn, self._relative(path), prefix=True)
+
+    def _rename(self, conn, old_path, new_path):
+        """Move the rows of old_path and anything under it to new_path without re-reading them."""
+        old, new = self._relative(old_path), self._relative(new_path)
+        if old_path.endswith(".md") != new_path.endswith(".md") and os.path.isfile(new_path):
+            # Its content is indexed now, or no longer
+            self._delete(conn, old)
+            self._update(conn, new_path)
+            return
+        self._delete(conn, new, prefix=True)
+        moved = conn.execute(
+            "UPDATE files SET path = ? || substr(path, ?) WHERE path = ? OR substr(path, 1, ?) = ?",
+            (new, len(old) + 1, old, len(old) + 1, old + os.sep)
+        ).rowcount
+        if not moved:
+            # Not indexed yet
+            self._update(conn, new_path)
+            return
+        # Names are indexed too; the files inside a folder keep theirs
+        conn.execute("UPDATE notes SET name = ? WHERE rowid IN (SELECT rowid FROM files WHERE path = ?)",
+                     (os.path.basename(new_path), new))
+
+    def search(self, term, case_sensitive=False, should_stop=None):
+        """
+        Return the sorted paths of files whose name, or whose content for
+        .md files, contains term. should_stop is polled while the query
+        runs; once it returns True the query is abandoned and [] returned.
+        """
+        return [path for path, _ in self.iter_search(term, case_sensitive, should_stop, with_content=False)]
+
+    def iter_search(self, term, case_sensitive=False, should_stop=None, with_content=True):
+        """
+        Like search(), but yield (path, content) in path order as rows are
+        read, content being the indexed text ("" for files other than .md,
+        or without with_content). Callers can find hit lines in it without
+        reading the file again.
+        """
+        if len(term) >= MIN_MATCH_CHARS:
+            where = "notes MATCH ?"
+            args = ['"' + term.replace('"', '""') + '"']
+            if case_sensitive:
+                # The trigram index is case-insensitive; it narrows, instr decides
+                where += " AND (instr(notes.name, ?) > 0 OR instr(notes.content, ?) > 0)"
+                args += [term, term]
+        elif case_sensitive:
+            where = "instr(notes.name, ?) > 0 OR instr(notes.content, ?) > 0"
+            args = [term, term]
+        else:
+            where = "folded_contains(notes.name, ?) OR folded_contains(notes.content, ?)"
+            args = [term.lower(), term.lower()]
+
+        content_column = "notes.content" if with_content else "''"
+
+        with self._connect() as conn:
+            conn.create_function("folded_contains", 2,
+                                 lambda text, folded: folded in text.lower(), deterministic=True)
+            if should_stop:
+                # A non-zero return interrupts the running statement
+                conn.set_progress_handler(should_stop, 10000)
+            try:
+                rows = conn.execute(
+                    f"SELECT files.path, {content_column} FROM notes JOIN files ON files.rowid = notes.rowid "
+                    f"WHERE {where} ORDER BY files.path",
+                    args
+                )
+                for relative, content in rows:
+                    yield os.path.join(self.root_path, relative), content
+            except sqlite3.OperationalError:
+                if should_stop and should_stop():
+                    return
+                raise
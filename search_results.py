@@ -0,0 +1,69 @@
+# search_results.py
+
+import os
+
+from PyQt5.QtCore import Qt, pyqtSignal
+from PyQt5.QtWidgets import QTreeWidget, QTreeWidgetItem
+
+# Files whose hits are shown expanded; later ones start collapsed
+EXPANDED_FILES = 200
+
+class SearchResultsPanel(QTreeWidget):
+    """
+    Files matched by the filter with their hit counts, each listing the
+    matching lines as "line: snippet". Results are added in batches as the
+    search finds them. Emits hit_activated(path, line) with a zero-based
+    line when a hit is clicked, or the file's first hit line for a file.
+    """
+    hit_activated = pyqtSignal(str, int)
+
+    def __init__(self, root_path, parent=None):
+        super().__init__(parent)
+        self.root_path = root_path
+        self.setHeaderHidden(True)
+        self.itemClicked.connect(self._on_item_clicked)
+
+    def clear_results(self, root_path=None):
+        self.clear()
+        if root_path:
+            self.root_path = root_path
+
+    def add_results(self, results):
+        """Add (path, count, lines) results, keeping files in path order."""
+        for path, count, lines in results:
+            label = os.path.relpath(path, self.root_path)
+            if count:
+                label += f" ({count} hit{'s' if count != 1 else ''})"
+            item = QTreeWidgetItem([label])
+            item.setToolTip(0, path)
+            item.setData(0, Qt.UserRole, (path, lines[0][0] if lines else 0))
+            for line, snippet, _ in lines:
+                child = QTreeWidgetItem([f"{line + 1}: {snippet}"])
+                child.setToolTip(0, snippet)
+                child.setData(0, Qt.UserRole, (path, line))
+                item.addChild(child)
+            # Hits on the lines past those listed
+            remaining = count - sum(hits for _, _, hits in lines)
+            if remaining > 0:
+                more = QTreeWidgetItem([f"... {remaining} more hit{'s' if remaining != 1 else ''}"])
+                more.setData(0, Qt.UserRole, (path, lines[-1][0] if lines else 0))
+                item.addChild(more)
+
+            self.insertTopLevelItem(self._insert_position(path), item)
+            if self.topLevelItemCount() <= EXPANDED_FILES:
+                item.setExpanded(True)
+
+    def _insert_position(self, path):
+        low, high = 0, self.topLevelItemCount()
+        while low < high:
+            middle = (low + high) // 2
+            if self.topLevelItem(middle).data(0, Qt.UserRole)[0] < path:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _on_item_clicked(self, item, column):
+        target = item.data(0, Qt.UserRole)
+        if target:
+            self.hit_activated.emit(*target)
@@ -0,0 +1,84 @@
+# style_cache.py
+
+import os
+import threading
+import time
+
+class StyleCache:
+    """
+    Process-wide in-memory cache of stylesheets and templates.
+
+    Files are read once and then served from memory. An entry is re-checked
+    against the file's mtime and size at most once per check_interval
+    seconds, so repeated renders do not touch the filesystem; writes made
+    through the cache (or an explicit invalidate) take effect immediately.
+    """
+
+    def __init__(self, check_interval=2.0):
+        self.check_interval = check_interval
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _stat(path):
+        try:
+            st = os.stat(path)
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def read(self, path):
+        """Return the text of path, or None if it does not exist or cannot be read."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and now - entry['checked'] < self.check_interval:
+                return entry['content']
+
+        signature = self._stat(path)
+        if entry is not None and entry['signature'] == signature:
+            with self._lock:
+                entry['checked'] = now
+            return entry['content']
+
+        content = None
+        if signature is not None:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    content = f.read()
+            except (IOError, OSError, UnicodeDecodeError) as e:
+                print(f"Warning: Could not read {path}: {e}")
+
+        with self._lock:
+            self._entries[path] = {'content': content, 'signature': signature, 'checked': now}
+        return content
+
+    def exists(self, path):
+        return self.read(path) is not None
+
+    def mtime(self, path):
+        """Return the modification time of path as of its cached read, or 0."""
+        self.read(path)
+        with self._lock:
+            signature = self._entries[path]['signature']
+        return signature[0] / 1e9 if signature else 0
+
+    def write(self, path, content):
+        """Write content to path and keep it as the cached text."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        # Re-read on next access to pick up the stored signature and text
+        self.invalidate(path)
+
+    def invalidate(self, path=None):
+        """Forget one cached file, or all of them."""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(path, None)
+
+style_cache = StyleCache()
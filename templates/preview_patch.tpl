@@ -0,0 +1,53 @@
+/* Live preview patching: blocks are separated by 'md-block' comment nodes */
+(function () {
+    function blockMarkers() {
+        var markers = [];
+        var nodes = document.body.childNodes;
+        for (var i = 0; i < nodes.length; i++) {
+            if (nodes[i].nodeType === Node.COMMENT_NODE && nodes[i].data === 'md-block') {
+                markers.push(nodes[i]);
+            }
+        }
+        return markers;
+    }
+
+    window.mdPatchBlocks = function (start, deleteCount, fragments) {
+        var markers = blockMarkers();
+        if (start > markers.length) {
+            return false;
+        }
+        var first = markers[start] || null;
+        var next = markers[start + deleteCount] || null;
+
+        // Remove the replaced blocks, leaving every other node untouched
+        var node = first;
+        while (node && node !== next) {
+            var following = node.nextSibling;
+            document.body.removeChild(node);
+            node = following;
+        }
+
+        var template = document.createElement('template');
+        template.innerHTML = fragments.map(function (fragment) {
+            // Split so the script never contains a literal comment opener
+            return '<!-' + '-md-block-' + '->' + fragment + '\n';
+        }).join('');
+        document.body.insertBefore(template.content, next);
+        return true;
+    };
+
+    window.mdScrollToHeading = function (index) {
+        var headings = document.querySelectorAll(
+            'body > h1, body > h2, body > h3, body > h4, body > h5, body > h6');
+        if (index < headings.length) {
+            headings[index].scrollIntoView();
+        }
+    };
+
+    window.mdSetStyle = function (css) {
+        var style = document.getElementById('md-preview-style');
+        if (style) {
+            style.textContent = css;
+        }
+    };
+})();
@@ -0,0 +1,47 @@
+# tests/test_file_search.py
+"""
+Regression tests for TermMatcher: counts must match a search of the whole
+data however the windows fall, also for terms that overlap themselves.
+
+    python -m pytest tests
+"""
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import file_search
+from file_search import TermMatcher
+
+class TermMatcherTest(unittest.TestCase):
+
+    def assertCount(self, data, term, expected, case_sensitive=False):
+        for window_bytes in range(1, len(data) + 2):
+            with mock.patch.object(file_search, 'WINDOW_BYTES', window_bytes):
+                count, _ = TermMatcher(term, case_sensitive).scan(data.encode('utf-8'))
+            self.assertEqual(count, expected, f"{term!r} in {data!r}, {window_bytes}-byte windows")
+
+    def test_self_overlapping_term(self):
+        self.assertCount("aaa", "aa", 1)
+        self.assertCount("aaaaa", "aa", 2, case_sensitive=True)
+        self.assertCount("x abab abababab", "abab", 3)
+
+    def test_case_folded_term(self):
+        self.assertCount("ÄäÄ äÄ", "ää", 2)
+        self.assertCount("Notes NOTES notes", "notes", 3)
+
+    def test_line_hits(self):
+        data = "aa aa\nb\naaaa aa\n\naa".encode('utf-8')
+        for window_bytes in range(1, len(data) + 2):
+            with mock.patch.object(file_search, 'WINDOW_BYTES', window_bytes):
+                count, lines = TermMatcher("aa").scan(data)
+                self.assertEqual(count, 6)
+                self.assertEqual([(line, hits) for line, _, hits in lines], [(0, 2), (2, 3), (4, 1)])
+                _, lines = TermMatcher("aa").scan(data, max_lines=2)
+                self.assertEqual([(line, hits) for line, _, hits in lines], [(0, 2), (2, 3)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+# tests/test_outline.py
+"""
+Regression tests for the note outline: it must list exactly the top-level
+headings Python-Markdown renders, since the preview scrolls to a heading by
+its position among them.
+
+    python -m pytest tests
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from outline import document_outline
+
+class DocumentOutlineTest(unittest.TestCase):
+
+    def assertOutline(self, md_text, expected):
+        self.assertEqual(document_outline(md_text), expected, repr(md_text))
+
+    def test_setext_heading(self):
+        self.assertOutline("Title\n=====\n\ntext\n", [(0, 1, 'Title')])
+        self.assertOutline("# Top\nSub\n---\n", [(0, 1, 'Top'), (1, 2, 'Sub')])
+        self.assertOutline("```\ncode\n```\nSub\n---\n", [(3, 2, 'Sub')])
+
+    def test_rule_after_paragraph(self):
+        self.assertOutline("line one\nline two\n---\n\n## Real\n", [(4, 2, 'Real')])
+        self.assertOutline("line one\nline two\n===\n", [])
+
+    def test_raw_html_block(self):
+        self.assertOutline("<div>\n# inside\n\n# still inside\n</div>\n\n# After\n", [(6, 1, 'After')])
+        self.assertOutline("text\n<div>x</div>\nSub\n---\n", [(2, 2, 'Sub')])
+        self.assertOutline("<h2>Raw</h2>\n\n<div>\n<h2>Nested</h2>\n</div>\n", [(0, 2, 'Raw')])
+
+    def test_indented_setext(self):
+        self.assertOutline("Title\n   ===\n", [])
+        self.assertOutline("  Title\n---\n", [(0, 2, 'Title')])
+        self.assertOutline("\n\nTitle\n=====\n", [(2, 1, 'Title')])
+        self.assertOutline("**Bold** and *em*\n===\n* item\n---\n", [(0, 1, 'Bold and em'), (2, 2, '* item')])
+
+    def test_lazy_continuation(self):
+        self.assertOutline("- item\nSub\n---\n", [])
+        self.assertOutline("> quote\nSub\n---\n", [])
+        self.assertOutline("> quote\n# Top\n", [(1, 1, 'Top')])
+        self.assertOutline("- item\n\n    # Inside\nlazy\n## Also inside\n\n# After\n", [(6, 1, 'After')])
+        self.assertOutline("- item\n\nSub\n---\n", [(2, 2, 'Sub')])
+        self.assertOutline("- item\n\n```\ncode\n```\n\n    indented\nSub\n===\n", [(7, 1, 'Sub')])
+
+    def test_fenced_code(self):
+        self.assertOutline("```\nopen\n\n# Shown\n", [(3, 1, 'Shown')])
+        self.assertOutline("```\ncode\n````\n# Hidden\n```\n", [])
+
+    def test_reference_definition(self):
+        self.assertOutline("text\n[ref]: http://x\nTitle\n===\n", [(2, 1, 'Title')])
+        self.assertOutline("text\n[ref]: http://x\nTitle\n---\n", [])
+        self.assertOutline("> quote\n[ref]: http://x\nTitle\n===\n", [])
+
+    def test_table(self):
+        self.assertOutline("| a | b |\n|---|---|\n## Row\n", [])
+        self.assertOutline("text\n***\n| a | b |\n|---|---|\n## Heading\n", [(4, 2, 'Heading')])
+
+    def test_comment(self):
+        self.assertOutline("<!--\n# hidden\n-->\n\n# Shown\n", [(4, 1, 'Shown')])
+        self.assertOutline("<!-- note -->\nTitle\n=====\n", [(1, 1, 'Title')])
+        self.assertOutline("<!--\nTitle\n---\n", [])
+
+if __name__ == '__main__':
+    unittest.main()
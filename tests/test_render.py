@@ -0,0 +1,108 @@
+# tests/test_render.py
+"""
+Regression tests for the incremental block renderer: its output has to match
+a full Markdown conversion of the same document, including documents that
+leave raw HTML blocks open and documents edited one change at a time.
+
+    python -m pytest tests
+"""
+
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import render
+from render import EXTENSION_CONFIGS, PREVIEW_EXTENSIONS, IncrementalRenderer
+
+PIECES = (
+    "intro", "# Heading", "## Sub heading", "hello world", "some *em* text",
+    "- a\n- b", "1. x\n2. y", "> quote", "```\ncode\n```", "    indented", "---",
+    "text\n---", "line one\nline two\n===", "| a | b |\n|---|---|\n| 1 | 2 |",
+    "[r]: http://example.com", "see [r]", "*[AB]: abbreviation", "AB word",
+    "<div>", "</div>", "<div>x</div> <br/>", "<details>\nsome text here",
+    "<hr> &amp;", "<!-- comment -->", "<p>raw</p>", "<span>a</span>", "&amp; x",
+)
+
+def full_render(md_text):
+    with render._converter_cache.converter(PREVIEW_EXTENSIONS, EXTENSION_CONFIGS) as md:
+        return md.convert(md_text)
+
+class IncrementalRendererTest(unittest.TestCase):
+
+    def setUp(self):
+        self.renderer = IncrementalRenderer()
+
+    def convert(self, md_text, max_miss_ratio=1.0):
+        # Render every block unless a case says otherwise, so blocks get compared
+        return self.renderer.convert(md_text, PREVIEW_EXTENSIONS, EXTENSION_CONFIGS, max_miss_ratio)
+
+    def assertMatchesFullRender(self, md_text):
+        self.assertEqual(self.convert(md_text), full_render(md_text), repr(md_text))
+
+    def test_unclosed_html(self):
+        self.assertMatchesFullRender("intro\n\n<div>\n\nhello world")
+        self.assertMatchesFullRender("intro\n\n<details>\nsome text here\n")
+        self.assertMatchesFullRender("<div>\n\n")
+
+    def test_html_stashed_past_block(self):
+        self.assertMatchesFullRender("AB word\n<div>x</div> <br/>\n")
+        self.assertMatchesFullRender("<hr> &amp;\n\n\nhello world\n")
+
+    def test_raw_html_needs_full_render(self):
+        documents = (
+            "text <!-- inline\n\n<p>raw</p>\n",
+            "intro\n\n<!-- comment\n\nhello world\n",
+            "<b\n\n<!-- c --> tail\n",
+            'intro\n\n<p markdown="1">\n*em* text\n</p>\n\nhello world\n',
+            'some *em* text <span markdown="1">x</span>\n\nhello world\n',
+            "intro\n\n<script>\nvar x;\n</div>\n\nhello world\n\n</script>\n\nafter\n",
+        )
+        for md_text in documents:
+            self.renderer.clear()
+            self.assertMatchesFullRender(md_text)
+            self.assertEqual(self.renderer.misses, 0, repr(md_text))
+
+    def test_fresh_document_is_converted_whole(self):
+        md_text = "\n\n".join(f"## Part {n}\n\nsome *em* text {n}" for n in range(40))
+        self.assertEqual(self.convert(md_text, max_miss_ratio=None), full_render(md_text))
+        self.assertEqual(self.renderer.misses, 0)
+
+        self.renderer.warm(md_text, PREVIEW_EXTENSIONS, EXTENSION_CONFIGS)
+        edited = md_text.replace("text 7", "text seven")
+        self.assertEqual(self.convert(edited, max_miss_ratio=None), full_render(edited))
+        self.assertEqual(self.renderer.misses, 1)
+
+    def test_edits(self):
+        rng = random.Random(4)
+        for _ in range(60):
+            self.renderer.clear()
+            md_text = "".join(rng.choice(PIECES) + "\n\n" for _ in range(rng.randint(5, 25)))
+            for _ in range(10):
+                position = rng.randint(0, len(md_text))
+                if rng.random() < 0.5:
+                    md_text = md_text[:position] + rng.choice(PIECES) + rng.choice(("\n", "\n\n")) + md_text[position:]
+                else:
+                    md_text = md_text[:position] + md_text[position + rng.randint(1, 20):]
+                self.assertMatchesFullRender(md_text)
+                document = self.renderer._document
+                if document is not None and document['text'] == render._normalize_whitespace(md_text).lstrip('\n'):
+                    self.assertEqual(document['blocks'], render.split_markdown_blocks(md_text))
+
+    def test_mismatched_blocks_are_not_cached(self):
+        md_text = "intro\n\n<div>\n\nhello world"
+        self.renderer.convert(md_text, PREVIEW_EXTENSIONS, EXTENSION_CONFIGS)
+        self.assertMatchesFullRender(md_text)
+        self.assertMatchesFullRender("intro\n\nhello world")
+
+    def test_random_documents(self):
+        rng = random.Random(2)
+        for _ in range(1500):
+            pieces = [rng.choice(PIECES) for _ in range(rng.randint(1, 6))]
+            self.assertMatchesFullRender(
+                "".join(piece + rng.choice(("\n", "\n\n", "\n\n\n")) for piece in pieces))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,242 @@
+# thumbnail_cache.py
+
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PIL import Image
+    THUMBNAIL_SUPPORT = True
+except ImportError:
+    Image = None
+    THUMBNAIL_SUPPORT = False
+
+THUMBNAIL_DIR = os.path.join("cache", "thumbnails")
+RASTER_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.webp')
+INDEX_NAME = "index.json"
+
+class ThumbnailCache:
+    """
+    Display-sized copies of oversized images for the preview.
+
+    The first time an image is seen a background thread reads its header
+    and, if it is wider than max_width, writes a scaled-down copy to the
+    cache folder (named by the image's path, mtime and size). Until then
+    the original is shown and the lookup reports it as pending; `on_ready`
+    is called from the worker thread whenever a new copy becomes available.
+    Like the path resolver, each image is re-stat'ed at most once per
+    check_interval seconds.
+
+    An index in the cache folder records the source of every copy. Copies
+    whose image changed or was deleted are removed (on first use, and as
+    soon as a change is seen), and like print_cache the least recently
+    used copies go once the folder grows past max_bytes.
+    """
+
+    def __init__(self, cache_dir=THUMBNAIL_DIR, max_width=1600, check_interval=1.0, workers=2,
+                 max_bytes=256 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_width = max_width
+        self.check_interval = check_interval
+        self.workers = workers
+        self.max_bytes = max_bytes
+        self.on_ready = None
+        self._entries = {}
+        # Images that could not be read are reported once per path
+        self._failed_paths = set()
+        self._index = None
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _thumbnail_path(self, path, signature):
+        digest = hashlib.sha1(f"{path}\n{signature}\n{self.max_width}".encode('utf-8')).hexdigest()
+        extension = os.path.splitext(path)[1].lower()
+        return os.path.abspath(os.path.join(self.cache_dir, f"{digest}{extension}"))
+
+    def preview_url(self, path):
+        """
+        Return (url, pending): the file:/// URL of the image's display-sized
+        copy, or None to show the original, and whether that may still change
+        once a background job finishes.
+        """
+        if not THUMBNAIL_SUPPORT or not path.lower().endswith(RASTER_EXTENSIONS):
+            return None, False
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and now - entry['checked'] < self.check_interval:
+                return entry['url'], entry['pending']
+
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None, False
+        signature = (st.st_mtime_ns, st.st_size)
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry['signature'] == signature:
+                entry['checked'] = now
+                return entry['url'], entry['pending']
+
+            executor = self._start_executor()
+            if entry is not None and entry['url']:
+                # The image changed, so its old copy is of no further use
+                executor.submit(self._remove, [self._thumbnail_path(path, entry['signature'])])
+
+            thumbnail_path = self._thumbnail_path(path, signature)
+            if os.path.exists(thumbnail_path):
+                entry = {'signature': signature, 'checked': now, 'pending': False,
+                         'url': f"file:///{thumbnail_path.replace(os.sep, '/')}"}
+                executor.submit(self._touch, thumbnail_path)
+            else:
+                entry = {'signature': signature, 'checked': now, 'pending': True, 'url': None}
+                executor.submit(self._make_thumbnail, path, signature, thumbnail_path)
+            self._entries[path] = entry
+            return entry['url'], entry['pending']
+
+    def _start_executor(self):
+        """Return the worker pool, tidying the cache folder as its first job. Caller holds the lock."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                thread_name_prefix="thumbnails")
+            self._executor.submit(self.prune)
+        return self._executor
+
+    def _make_thumbnail(self, path, signature, thumbnail_path):
+        url = None
+        try:
+            with Image.open(path) as image:
+                if image.width > self.max_width:
+                    image_format = image.format
+                    # Only the width is bounded; the height follows the aspect ratio
+                    image.thumbnail((self.max_width, image.height), Image.LANCZOS)
+                    os.makedirs(self.cache_dir, exist_ok=True)
+                    temp_path = f"{thumbnail_path}.tmp"
+                    options = {'quality': 90} if image_format == 'JPEG' else {}
+                    image.save(temp_path, format=image_format, **options)
+                    os.replace(temp_path, thumbnail_path)
+                    url = f"file:///{thumbnail_path.replace(os.sep, '/')}"
+        except (OSError, ValueError, Image.DecompressionBombError) as e:
+            with self._lock:
+                first_failure = path not in self._failed_paths
+                self._failed_paths.add(path)
+            if first_failure:
+                print(f"Warning: Could not make a preview copy of {path}: {e}")
+
+        if url:
+            with self._lock:
+                self._load_index()[os.path.basename(thumbnail_path)] = [path, *signature]
+                self._save_index()
+            self.evict(keep=thumbnail_path)
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry['signature'] == signature:
+                entry['url'] = url
+                entry['pending'] = False
+        if url and self.on_ready:
+            self.on_ready(path)
+
+    @staticmethod
+    def _touch(thumbnail_path):
+        try:
+            # Mark as recently used for eviction
+            os.utime(thumbnail_path)
+        except OSError:
+            pass
+
+    def _load_index(self):
+        """Thumbnail file name -> [image path, mtime_ns, size]. Caller holds the lock."""
+        if self._index is None:
+            try:
+                with open(os.path.join(self.cache_dir, INDEX_NAME), 'r', encoding='utf-8') as f:
+                    self._index = json.load(f)
+            except (IOError, OSError, ValueError):
+                self._index = {}
+        return self._index
+
+    def _save_index(self):
+        """Write the index back to the cache folder. Caller holds the lock."""
+        index_path = os.path.join(self.cache_dir, INDEX_NAME)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(f"{index_path}.tmp", 'w', encoding='utf-8') as f:
+                json.dump(self._index, f)
+            os.replace(f"{index_path}.tmp", index_path)
+        except (IOError, OSError) as e:
+            print(f"Warning: Could not save the thumbnail index: {e}")
+
+    def _scan(self):
+        """Return [(mtime, size, path)] of the copies in the cache folder."""
+        entries = []
+        try:
+            with os.scandir(self.cache_dir) as it:
+                for entry in it:
+                    if entry.is_file() and entry.name.lower().endswith(RASTER_EXTENSIONS):
+                        st = entry.stat()
+                        entries.append((st.st_mtime, st.st_size, entry.path))
+        except OSError:
+            pass
+        return entries
+
+    def _remove(self, paths):
+        """Delete copies and drop them from the index."""
+        with self._lock:
+            index = self._load_index()
+            for path in paths:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    print(f"Warning: Could not remove preview copy {path}: {e}")
+                    continue
+                index.pop(os.path.basename(path), None)
+            self._save_index()
+
+    def prune(self):
+        """Remove copies whose image changed or is gone, and files the index doesn't know."""
+        started = time.time()
+        with self._lock:
+            index = dict(self._load_index())
+        stale = []
+        for mtime, _, path in self._scan():
+            if mtime >= started - 1:
+                # Just made or used; it may not be in the index yet
+                continue
+            source = index.get(os.path.basename(path))
+            try:
+                st = os.stat(source[0]) if source else None
+            except OSError:
+                st = None
+            if st is None or [st.st_mtime_ns, st.st_size] != source[1:]:
+                stale.append(path)
+        if stale:
+            self._remove(stale)
+
+    def evict(self, keep=None):
+        """Remove least recently used copies until the cache folder fits in max_bytes."""
+        copies = self._scan()
+        total = sum(size for _, size, _ in copies)
+        removed = []
+        for mtime, size, path in sorted(copies):
+            if total <= self.max_bytes:
+                break
+            if keep and os.path.abspath(path) == keep:
+                continue
+            removed.append(path)
+            total -= size
+        if removed:
+            self._remove(removed)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+# Used by the preview converter only; print and export link the originals
+thumbnail_cache = ThumbnailCache()